@@ -1,20 +1,55 @@
 import os
 import sys
 import datetime
-from database import init_db
-from controllers import ClienteController, ProductoController, PedidoController
-from models import Cliente, Producto, Pedido, DetallePedido
+from database import backend_actual, init_db, migrar_db
+from controllers import ClienteController, ProductoController, PedidoController, ConflictoVersion
+from reintentos import BaseDeDatosOcupada
+from busqueda import IndiceTrigramas
+from cache import CacheConsultas
+from catalogo import CatalogoEnMemoria
+from mantenimiento import PlanificadorMantenimiento
+from paginacion import VistaPaginada
+from reservas import Carrito, disponibles
+import inventario
+from models import Cliente, Producto, Pedido, DetallePedido, ESTADOS_PEDIDO
+
+# Pedidos que se muestran en "pedidos por cliente" debajo del resumen
+PEDIDOS_RECIENTES = 20
+
+# Se muestra cuando una escritura agotó los reintentos (reintentos.BaseDeDatosOcupada)
+MENSAJE_BASE_OCUPADA = "La base de datos está ocupada por otros usuarios y no se guardaron los cambios. Intente de nuevo en unos segundos."
 
 class App:
     def __init__(self):
         # Inicializar la base de datos
-        if not os.path.exists('techlab.db'):
+        if not backend_actual().existe():
             print("Inicializando base de datos...")
             init_db()
+        else:
+            migrar_db()
+        
+        # Mantenimiento en segundo plano (también disponible como mantenimiento.py)
+        if os.environ.get('TECHLAB_MANTENIMIENTO') == '1':
+            PlanificadorMantenimiento().start()
+        
+        # Cache de listados y búsquedas compartido por los controladores
+        self.cache = CacheConsultas()
+        
+        # Índice de similitud para encontrar clientes aunque el nombre esté mal escrito
+        # (se construye en la primera búsqueda, no al arrancar)
+        self.cliente_controller = ClienteController(crear_indice=IndiceTrigramas.desde_db, cache=self.cache)
+        # Catálogo de productos en memoria (opcional): lecturas sin ir a la base
+        catalogo = CatalogoEnMemoria() if os.environ.get('TECHLAB_CATALOGO_MEMORIA') == '1' else None
+        self.producto_controller = ProductoController(cache=self.cache, catalogo=catalogo)
+        self.pedido_controller = PedidoController(cache=self.cache)
         
-        self.cliente_controller = ClienteController()
-        self.producto_controller = ProductoController()
-        self.pedido_controller = PedidoController()
+        # Avisar en pantalla cuando un pedido deja productos por reponer
+        inventario.suscribir(self.avisar_stock_bajo)
+    
+    def avisar_stock_bajo(self, productos):
+        """Muestra los productos que quedaron en su stock mínimo o por debajo."""
+        for producto in productos:
+            print(f"\n¡Atención! {producto.nombre} quedó con stock {producto.stock} (mínimo {producto.stock_minimo}).")
     
     def mostrar_menu_principal(self):
         """Muestra el menú principal de la aplicación."""
@@ -71,21 +106,15 @@ class App:
                 input("\nOpción no válida. Presione Enter para continuar...")
     
     def listar_clientes(self):
-        """Muestra todos los clientes."""
-        clientes = self.cliente_controller.listar_todos()
-        
-        os.system('cls' if os.name == 'nt' else 'clear')
-        print("\n===== LISTA DE CLIENTES =====\n")
-        
-        if not clientes:
-            print("No hay clientes registrados.")
-        else:
-            print(f"{'ID':<5} {'Nombre':<30} {'Email':<30} {'Teléfono':<15}")
-            print("-" * 80)
-            for cliente in clientes:
-                print(f"{cliente.id:<5} {cliente.nombre:<30} {cliente.email:<30} {cliente.telefono:<15}")
-        
-        input("\nPresione Enter para continuar...")
+        """Muestra los clientes de a una página."""
+        VistaPaginada(
+            "LISTA DE CLIENTES",
+            f"{'ID':<5} {'Nombre':<30} {'Email':<30} {'Teléfono':<15}",
+            lambda cliente: f"{cliente.id:<5} {cliente.nombre:<30} {cliente.email:<30} {cliente.telefono:<15}",
+            self.cliente_controller.listar_pagina,
+            self.cliente_controller.contar,
+            ayuda_filtro="nombre"
+        ).mostrar()
     
     def buscar_cliente(self):
         """Busca clientes por nombre, email o teléfono."""
@@ -184,16 +213,23 @@ class App:
         if direccion:
             cliente.direccion = direccion
         
-        # Verificar si el nuevo email ya existe (si se cambió)
-        if cliente.email != email_original and self.cliente_controller.obtener_por_email(cliente.email):
+        # Verificar si el nuevo email ya existe (si se cambió); cambiar solo
+        # mayúsculas o acentos del propio email está permitido
+        existente = self.cliente_controller.obtener_por_email(cliente.email) if cliente.email != email_original else None
+        if existente and existente.id != cliente.id:
             print("\nYa existe un cliente con ese email.")
             input("\nPresione Enter para continuar...")
             return
         
-        if self.cliente_controller.actualizar(cliente):
-            print("\nCliente actualizado correctamente.")
-        else:
-            print("\nError al actualizar el cliente.")
+        try:
+            if self.cliente_controller.actualizar(cliente):
+                print("\nCliente actualizado correctamente.")
+            else:
+                print("\nError al actualizar el cliente.")
+        except ConflictoVersion:
+            print("\nOtro usuario modificó el cliente mientras lo editaba. Vuelva a cargarlo para ver los cambios.")
+        except BaseDeDatosOcupada:
+            print(f"\n{MENSAJE_BASE_OCUPADA}")
         
         input("\nPresione Enter para continuar...")
     
@@ -243,6 +279,7 @@ class App:
             print("3. Agregar nuevo producto")
             print("4. Editar producto")
             print("5. Eliminar producto")
+            print("6. Productos a reponer")
             print("0. Volver al menú principal")
             
             opcion = input("\nSeleccione una opción: ")
@@ -257,25 +294,39 @@ class App:
                 self.editar_producto()
             elif opcion == "5":
                 self.eliminar_producto()
+            elif opcion == "6":
+                self.listar_productos_a_reponer()
             elif opcion == "0":
                 break
             else:
                 input("\nOpción no válida. Presione Enter para continuar...")
     
     def listar_productos(self):
-        """Muestra todos los productos."""
-        productos = self.producto_controller.listar_todos()
+        """Muestra los productos de a una página."""
+        VistaPaginada(
+            "LISTA DE PRODUCTOS",
+            f"{'ID':<5} {'Nombre':<30} {'Precio':<10} {'Stock':<10}",
+            lambda producto: f"{producto.id:<5} {producto.nombre:<30} ${producto.precio:<9.2f} {producto.stock:<10}",
+            self.producto_controller.listar_pagina,
+            self.producto_controller.contar,
+            ayuda_filtro="nombre"
+        ).mostrar()
+    
+    def listar_productos_a_reponer(self):
+        """Muestra los productos con stock en el mínimo o por debajo."""
+        productos = self.producto_controller.listar_a_reponer()
         
         os.system('cls' if os.name == 'nt' else 'clear')
-        print("\n===== LISTA DE PRODUCTOS =====\n")
+        print("\n===== PRODUCTOS A REPONER =====\n")
         
         if not productos:
-            print("No hay productos registrados.")
+            print("Todos los productos están por encima de su stock mínimo.")
         else:
-            print(f"{'ID':<5} {'Nombre':<30} {'Precio':<10} {'Stock':<10}")
-            print("-" * 60)
+            print(f"{'ID':<5} {'Nombre':<30} {'Stock':<10} {'Mínimo':<10} {'Faltante':<10}")
+            print("-" * 70)
             for producto in productos:
-                print(f"{producto.id:<5} {producto.nombre:<30} ${producto.precio:<9.2f} {producto.stock:<10}")
+                faltante = producto.stock_minimo - producto.stock
+                print(f"{producto.id:<5} {producto.nombre:<30} {producto.stock:<10} {producto.stock_minimo:<10} {faltante:<10}")
         
         input("\nPresione Enter para continuar...")
     
@@ -332,7 +383,16 @@ class App:
             input("\nPresione Enter para continuar...")
             return
         
-        producto = Producto(nombre=nombre, descripcion=descripcion, precio=precio, stock=stock)
+        try:
+            stock_minimo = int(input("Stock mínimo para reponer [0]: ") or 0)
+            if stock_minimo < 0:
+                raise ValueError
+        except ValueError:
+            print("\nStock mínimo inválido.")
+            input("\nPresione Enter para continuar...")
+            return
+        
+        producto = Producto(nombre=nombre, descripcion=descripcion, precio=precio, stock=stock, stock_minimo=stock_minimo)
         if self.producto_controller.crear(producto):
             print("\nProducto agregado correctamente.")
         else:
@@ -392,10 +452,25 @@ class App:
             except ValueError:
                 print("\nStock inválido. Se mantendrá el valor anterior.")
         
-        if self.producto_controller.actualizar(producto):
-            print("\nProducto actualizado correctamente.")
-        else:
-            print("\nError al actualizar el producto.")
+        stock_minimo_str = input(f"Stock mínimo [{producto.stock_minimo}]: ")
+        if stock_minimo_str:
+            try:
+                stock_minimo = int(stock_minimo_str)
+                if stock_minimo < 0:
+                    raise ValueError
+                producto.stock_minimo = stock_minimo
+            except ValueError:
+                print("\nStock mínimo inválido. Se mantendrá el valor anterior.")
+        
+        try:
+            if self.producto_controller.actualizar(producto):
+                print("\nProducto actualizado correctamente.")
+            else:
+                print("\nError al actualizar el producto.")
+        except ConflictoVersion:
+            print("\nOtro usuario modificó el producto (o su stock) mientras lo editaba. Vuelva a cargarlo para ver los cambios.")
+        except BaseDeDatosOcupada:
+            print(f"\n{MENSAJE_BASE_OCUPADA}")
         
         input("\nPresione Enter para continuar...")
     
@@ -446,6 +521,7 @@ class App:
             print("4. Crear nuevo pedido")
             print("5. Cambiar estado de pedido")
             print("6. Eliminar pedido")
+            print("7. Pedidos por período")
             print("0. Volver al menú principal")
             
             opcion = input("\nSeleccione una opción: ")
@@ -462,27 +538,23 @@ class App:
                 self.cambiar_estado_pedido()
             elif opcion == "6":
                 self.eliminar_pedido()
+            elif opcion == "7":
+                self.listar_pedidos_por_periodo()
             elif opcion == "0":
                 break
             else:
                 input("\nOpción no válida. Presione Enter para continuar...")
     
     def listar_pedidos(self):
-        """Muestra todos los pedidos."""
-        pedidos = self.pedido_controller.listar_todos()
-        
-        os.system('cls' if os.name == 'nt' else 'clear')
-        print("\n===== LISTA DE PEDIDOS =====\n")
-        
-        if not pedidos:
-            print("No hay pedidos registrados.")
-        else:
-            print(f"{'ID':<5} {'Cliente':<30} {'Fecha':<15} {'Estado':<15} {'Total':<10}")
-            print("-" * 80)
-            for pedido in pedidos:
-                print(f"{pedido.id:<5} {pedido.cliente.nombre:<30} {pedido.fecha:<15} {pedido.estado:<15} ${pedido.total:<9.2f}")
-        
-        input("\nPresione Enter para continuar...")
+        """Muestra los pedidos de a una página, del más reciente al más antiguo."""
+        VistaPaginada(
+            "LISTA DE PEDIDOS",
+            f"{'ID':<5} {'Cliente':<30} {'Fecha':<15} {'Estado':<15} {'Total':<10}",
+            lambda pedido: f"{pedido.id:<5} {pedido.cliente.nombre:<30} {pedido.fecha:<15} {pedido.estado:<15} ${pedido.total:<9.2f}",
+            self.pedido_controller.listar_pagina,
+            self.pedido_controller.contar,
+            ayuda_filtro="estado"
+        ).mostrar()
     
     def listar_pedidos_por_cliente(self):
         """Muestra los pedidos de un cliente específico."""
@@ -494,7 +566,7 @@ class App:
         if not termino:
             return
         
-        clientes = self.cliente_controller.buscar(termino)
+        clientes = self.cliente_controller.buscar_similares(termino)
         
         if not clientes:
             print("\nNo se encontraron clientes con ese criterio.")
@@ -526,19 +598,82 @@ class App:
         else:
             cliente = clientes[0]
         
-        # Mostrar pedidos del cliente
-        pedidos = self.pedido_controller.listar_por_cliente(cliente.id)
+        # Mostrar el resumen y los pedidos más recientes del cliente
+        resumen = self.cliente_controller.obtener_resumen(cliente.id)
         
         os.system('cls' if os.name == 'nt' else 'clear')
         print(f"\n===== PEDIDOS DEL CLIENTE: {cliente.nombre} =====\n")
         
-        if not pedidos:
+        if not resumen or resumen.cantidad_pedidos == 0:
             print("Este cliente no tiene pedidos registrados.")
         else:
-            print(f"{'ID':<5} {'Fecha':<15} {'Estado':<15} {'Total':<10}")
-            print("-" * 50)
-            for pedido in pedidos:
-                print(f"{pedido.id:<5} {pedido.fecha:<15} {pedido.estado:<15} ${pedido.total:<9.2f}")
+            print(f"Pedidos: {resumen.cantidad_pedidos} (cancelados: {resumen.pedidos_cancelados})")
+            print(f"Total gastado: ${resumen.total_gastado:.2f}")
+            print(f"Primer pedido: {resumen.primer_pedido}   Último pedido: {resumen.ultimo_pedido}\n")
+            
+            pedidos = self.pedido_controller.listar_resumen(cliente_id=cliente.id, limite=PEDIDOS_RECIENTES)
+            if resumen.cantidad_pedidos > len(pedidos):
+                print(f"Últimos {len(pedidos)} pedidos:\n")
+            self.mostrar_pedidos_resumidos(pedidos)
+        
+        input("\nPresione Enter para continuar...")
+    
+    def mostrar_pedidos_resumidos(self, pedidos, con_cliente=False):
+        """Imprime una tabla de pedidos con la cantidad de productos y unidades de cada uno."""
+        columna_cliente = f"{'Cliente':<30} " if con_cliente else ""
+        encabezado = f"{'ID':<5} {columna_cliente}{'Fecha':<15} {'Estado':<15} {'Productos':<10} {'Unidades':<10} {'Total':<10}"
+        print(encabezado)
+        print("-" * len(encabezado))
+        for pedido in pedidos:
+            columna_cliente = f"{pedido.cliente.nombre:<30} " if con_cliente else ""
+            print(f"{pedido.id:<5} {columna_cliente}{pedido.fecha:<15} {pedido.estado:<15} "
+                  f"{pedido.productos_distintos:<10} {pedido.cantidad_unidades:<10} ${pedido.total:<9.2f}")
+    
+    def listar_pedidos_por_periodo(self):
+        """Muestra los pedidos de un rango de fechas, opcionalmente de un solo estado."""
+        os.system('cls' if os.name == 'nt' else 'clear')
+        print("\n===== PEDIDOS POR PERÍODO =====\n")
+        
+        try:
+            desde = input("Desde (YYYY-MM-DD, vacío para no limitar): ").strip() or None
+            hasta = input("Hasta (YYYY-MM-DD, inclusive, vacío para no limitar): ").strip() or None
+            if desde:
+                datetime.date.fromisoformat(desde)
+            if hasta:
+                # El controlador toma el límite superior como exclusivo
+                hasta = (datetime.date.fromisoformat(hasta) + datetime.timedelta(days=1)).isoformat()
+        except ValueError:
+            print("\nFecha inválida.")
+            input("\nPresione Enter para continuar...")
+            return
+        
+        print("\nEstado (vacío para todos):")
+        for i, estado in enumerate(ESTADOS_PEDIDO):
+            print(f"{i+1}. {estado}")
+        opcion = input("\nSeleccione un estado: ").strip()
+        estados = None
+        if opcion:
+            try:
+                indice = int(opcion) - 1
+                if indice < 0 or indice >= len(ESTADOS_PEDIDO):
+                    raise ValueError
+                estados = [ESTADOS_PEDIDO[indice]]
+            except ValueError:
+                print("\nOpción inválida.")
+                input("\nPresione Enter para continuar...")
+                return
+        
+        pedidos = self.pedido_controller.listar_resumen(desde=desde, hasta=hasta, estados=estados)
+        
+        os.system('cls' if os.name == 'nt' else 'clear')
+        print("\n===== PEDIDOS POR PERÍODO =====\n")
+        if not pedidos:
+            print("No hay pedidos en ese período.")
+        else:
+            self.mostrar_pedidos_resumidos(pedidos, con_cliente=True)
+            total = sum(pedido.total for pedido in pedidos if pedido.estado != "Cancelado")
+            unidades = sum(pedido.cantidad_unidades for pedido in pedidos if pedido.estado != "Cancelado")
+            print(f"\n{len(pedidos)} pedidos, {unidades} unidades, total ${total:.2f} (sin cancelados)")
         
         input("\nPresione Enter para continuar...")
     
@@ -595,7 +730,7 @@ class App:
         if not termino:
             return
         
-        clientes = self.cliente_controller.buscar(termino)
+        clientes = self.cliente_controller.buscar_similares(termino)
         
         if not clientes:
             print("\nNo se encontraron clientes con ese criterio.")
@@ -627,9 +762,11 @@ class App:
         else:
             cliente = clientes[0]
         
-        # Paso 2: Agregar productos al pedido
+        # Paso 2: Agregar productos al pedido. Las unidades agregadas quedan
+        # reservadas para este pedido hasta confirmarlo o cancelarlo
         detalles = []
         total_pedido = 0.0
+        carrito = Carrito()
         
         while True:
             os.system('cls' if os.name == 'nt' else 'clear')
@@ -657,7 +794,7 @@ class App:
             opcion = input("\nSeleccione una opción: ")
             
             if opcion == "1":
-                self._agregar_producto_a_pedido(detalles, total_pedido)
+                self._agregar_producto_a_pedido(detalles, carrito)
                 # Recalcular el total
                 total_pedido = sum(detalle.cantidad * detalle.precio_unitario for detalle in detalles)
             elif opcion == "2":
@@ -682,7 +819,8 @@ class App:
                     indice = int(seleccion) - 1
                     if indice < 0 or indice >= len(detalles):
                         raise ValueError
-                    detalles.pop(indice)
+                    eliminado = detalles.pop(indice)
+                    carrito.liberar(eliminado.producto.id)
                     # Recalcular el total
                     total_pedido = sum(detalle.cantidad * detalle.precio_unitario for detalle in detalles)
                     print("\nProducto eliminado del pedido.")
@@ -696,12 +834,13 @@ class App:
                     continue
                 
                 # Crear el pedido
-                fecha = datetime.datetime.now().strftime("%Y-%m-%d")
+                ahora = datetime.datetime.now()
                 pedido = Pedido(
                     cliente_id=cliente.id,  # Cambiado de cliente=cliente a cliente_id=cliente.id
-                    fecha=fecha,
+                    fecha=ahora.strftime("%Y-%m-%d"),
                     estado="Pendiente",
-                    total=total_pedido
+                    total=total_pedido,
+                    creado=int(ahora.timestamp())
                 )
                 
                 # Mantener los detalles como objetos DetallePedido
@@ -709,24 +848,26 @@ class App:
                 for detalle in detalles:
                     detalle.producto_id = detalle.producto.id
                 
-                if self.pedido_controller.crear(pedido, detalles):
+                # La clave del carrito también evita crear el pedido dos veces
+                if self.pedido_controller.crear(pedido, detalles, clave_idempotencia=carrito.clave, carrito=carrito.clave):
                     print("\nPedido creado correctamente.")
                     input("\nPresione Enter para continuar...")
                     return
                 else:
-                    print("\nError al crear el pedido.")
+                    print("\nError al crear el pedido. Si alguna reserva venció, revise las cantidades.")
                     input("\nPresione Enter para continuar...")
             elif opcion == "0":
                 confirmacion = input("\n¿Está seguro de cancelar el pedido? (s/n): ")
                 if confirmacion.lower() == "s":
+                    carrito.cancelar()
                     print("\nPedido cancelado.")
                     input("\nPresione Enter para continuar...")
                     return
             else:
                 input("\nOpción no válida. Presione Enter para continuar...")
     
-    def _agregar_producto_a_pedido(self, detalles, total_pedido):
-        """Agrega un producto al pedido actual."""
+    def _agregar_producto_a_pedido(self, detalles, carrito):
+        """Agrega un producto al pedido actual y reserva las unidades en el carrito."""
         os.system('cls' if os.name == 'nt' else 'clear')
         print("\n===== AGREGAR PRODUCTO AL PEDIDO =====\n")
         
@@ -742,14 +883,17 @@ class App:
             input("\nPresione Enter para continuar...")
             return
         
+        # Stock sin contar lo reservado por otros pedidos en preparación
+        disponible = disponibles([producto.id for producto in productos], carrito.clave)
+        
         # Si hay más de un producto, mostrar lista para seleccionar
         if len(productos) > 1:
             print("\nSe encontraron varios productos. Seleccione uno:\n")
-            print(f"{'#':<3} {'Nombre':<30} {'Precio':<10} {'Stock':<10}")
+            print(f"{'#':<3} {'Nombre':<30} {'Precio':<10} {'Disponible':<10}")
             print("-" * 55)
             
             for i, producto in enumerate(productos):
-                print(f"{i+1:<3} {producto.nombre:<30} ${producto.precio:<9.2f} {producto.stock:<10}")
+                print(f"{i+1:<3} {producto.nombre:<30} ${producto.precio:<9.2f} {disponible.get(producto.id, 0):<10}")
             
             seleccion = input("\nSeleccione un producto (número) o 0 para cancelar: ")
             if not seleccion or seleccion == "0":
@@ -768,35 +912,35 @@ class App:
             producto = productos[0]
         
         # Verificar stock
-        if producto.stock <= 0:
+        en_pedido = sum(detalle.cantidad for detalle in detalles if detalle.producto.id == producto.id)
+        libre = disponible.get(producto.id, 0) - en_pedido
+        if libre <= 0:
             print("\nEste producto no tiene stock disponible.")
             input("\nPresione Enter para continuar...")
             return
         
         # Solicitar cantidad
         try:
-            cantidad = int(input(f"\nCantidad (stock disponible: {producto.stock}): "))
+            cantidad = int(input(f"\nCantidad (stock disponible: {libre}): "))
             if cantidad <= 0:
                 raise ValueError
-            if cantidad > producto.stock:
-                print("\nLa cantidad solicitada excede el stock disponible.")
-                input("\nPresione Enter para continuar...")
-                return
         except ValueError:
             print("\nCantidad inválida.")
             input("\nPresione Enter para continuar...")
             return
         
+        # Reservar el total del producto en el pedido; falla si otro pedido
+        # reservó o vendió esas unidades desde que se mostró el disponible
+        if not carrito.reservar(producto.id, en_pedido + cantidad):
+            print("\nLa cantidad solicitada excede el stock disponible.")
+            input("\nPresione Enter para continuar...")
+            return
+        
         # Verificar si el producto ya está en el pedido
         for detalle in detalles:
             if detalle.producto.id == producto.id:
                 # Actualizar cantidad si ya existe
-                nueva_cantidad = detalle.cantidad + cantidad
-                if nueva_cantidad > producto.stock:
-                    print("\nLa cantidad total excede el stock disponible.")
-                    input("\nPresione Enter para continuar...")
-                    return
-                detalle.cantidad = nueva_cantidad
+                detalle.cantidad += cantidad
                 print(f"\nSe actualizó la cantidad del producto {producto.nombre}.")
                 input("\nPresione Enter para continuar...")
                 return
@@ -863,10 +1007,15 @@ class App:
         nuevo_estado = estados[opcion]
         pedido.estado = nuevo_estado
         
-        if self.pedido_controller.actualizar(pedido):
-            print(f"\nEstado del pedido actualizado a: {nuevo_estado}")
-        else:
-            print("\nError al actualizar el estado del pedido.")
+        try:
+            if self.pedido_controller.actualizar(pedido):
+                print(f"\nEstado del pedido actualizado a: {nuevo_estado}")
+            else:
+                print("\nError al actualizar el estado del pedido.")
+        except ConflictoVersion:
+            print("\nOtro usuario modificó el pedido mientras lo editaba. Vuelva a cargarlo para ver los cambios.")
+        except BaseDeDatosOcupada:
+            print(f"\n{MENSAJE_BASE_OCUPADA}")
         
         input("\nPresione Enter para continuar...")
 
@@ -914,6 +1063,10 @@ if __name__ == "__main__":
         except KeyboardInterrupt:
             print("\n\nPrograma terminado por el usuario.")
             break
+        except BaseDeDatosOcupada:
+            # Las demás escrituras (altas, bajas, pedidos) vuelven al menú
+            print(f"\n{MENSAJE_BASE_OCUPADA}")
+            input("\nPresione Enter para continuar...")
         except Exception as e:
             print(f"\nError inesperado: {e}")
             input("\nPresione Enter para continuar...")
\ No newline at end of file
@@ -0,0 +1,149 @@
+import re
+import heapq
+from array import array
+from collections import Counter
+
+from database import get_db_connection
+from texto import normalizar
+
+_PALABRA = re.compile(r'\w+')
+
+
+def trigramas(texto):
+    """Retorna el conjunto de trigramas de un texto normalizado.
+
+    Cada palabra se rellena con dos espacios al inicio y uno al final, de
+    modo que el comienzo de las palabras pesa más que su interior.
+    """
+    resultado = set()
+    for palabra in _PALABRA.findall(normalizar(texto)):
+        relleno = f"  {palabra} "
+        for i in range(len(relleno) - 2):
+            resultado.add(relleno[i:i + 3])
+    return resultado
+
+
+class IndiceTrigramas:
+    """Índice en memoria de similitud por trigramas sobre los clientes.
+
+    Indexa nombre, email y teléfono de cada cliente. Las listas de
+    ocurrencias se guardan en arrays de enteros (4 bytes por entrada) y
+    solo crecen: al actualizar o eliminar un cliente, sus entradas viejas
+    quedan obsoletas y se descartan al reordenar los candidatos, que
+    siempre se puntúan contra el texto vigente. Cuando las entradas
+    obsoletas superan una fracción del total, el índice se compacta.
+    """
+
+    def __init__(self, presupuesto=300000, limite_reordenar=1000, fraccion_compactar=0.25):
+        self.presupuesto = presupuesto
+        self.limite_reordenar = limite_reordenar
+        self.fraccion_compactar = fraccion_compactar
+        self._ocurrencias = {}  # trigrama -> array de IDs de cliente
+        self._textos = {}  # ID de cliente -> texto indexado vigente
+        self._total_entradas = 0
+        self._obsoletas = 0
+
+    @classmethod
+    def desde_db(cls, **opciones):
+        """Construye el índice con todos los clientes de la base de datos."""
+        indice = cls(**opciones)
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, nombre, email, telefono FROM clientes')
+        for row in cursor:
+            indice._indexar(row['id'], cls._texto_cliente(row['nombre'], row['email'], row['telefono']))
+        conn.close()
+        return indice
+
+    @staticmethod
+    def _texto_cliente(nombre, email, telefono):
+        return " ".join(campo for campo in (nombre, email, telefono) if campo)
+
+    def __len__(self):
+        return len(self._textos)
+
+    def _indexar(self, id, texto):
+        self._textos[id] = texto
+        for trigrama in trigramas(texto):
+            lista = self._ocurrencias.get(trigrama)
+            if lista is None:
+                lista = self._ocurrencias[trigrama] = array('i')
+            lista.append(id)
+            self._total_entradas += 1
+
+    def _descartar(self, id):
+        texto = self._textos.pop(id, None)
+        if texto is not None:
+            self._obsoletas += len(trigramas(texto))
+
+    def agregar(self, id, cliente):
+        """Agrega o reemplaza un cliente en el índice."""
+        self._descartar(id)
+        self._indexar(id, self._texto_cliente(cliente.nombre, cliente.email, cliente.telefono))
+        self._compactar_si_corresponde()
+
+    def eliminar(self, id):
+        """Quita un cliente del índice."""
+        self._descartar(id)
+        self._compactar_si_corresponde()
+
+    def _compactar_si_corresponde(self):
+        if self._total_entradas and self._obsoletas > self._total_entradas * self.fraccion_compactar:
+            self.compactar()
+
+    def compactar(self):
+        """Reconstruye las listas de ocurrencias sin entradas obsoletas."""
+        textos = self._textos
+        self._ocurrencias = {}
+        self._textos = {}
+        self._total_entradas = 0
+        self._obsoletas = 0
+        for id, texto in textos.items():
+            self._indexar(id, texto)
+
+    def buscar(self, termino, limite=10, minimo=0.3):
+        """Retorna hasta `limite` tuplas (id, similitud) ordenadas de mayor a menor.
+
+        La similitud es la fracción de trigramas de la búsqueda presentes en
+        el cliente; se descartan los resultados por debajo de `minimo`.
+
+        Los candidatos se generan recorriendo primero las listas de los
+        trigramas más raros, que son las más selectivas, hasta agotar un
+        presupuesto de entradas leídas; así las listas muy frecuentes no
+        dominan el tiempo de búsqueda. Los mejores candidatos se puntúan
+        luego con exactitud contra su texto vigente.
+        """
+        consulta = trigramas(termino)
+        if not consulta:
+            return []
+
+        listas = sorted(
+            (self._ocurrencias[t] for t in consulta if t in self._ocurrencias),
+            key=len
+        )
+        conteo = Counter()
+        leidas = 0
+        for lista in listas:
+            if leidas and leidas + len(lista) > self.presupuesto:
+                break
+            conteo.update(lista)
+            leidas += len(lista)
+
+        resultados = []
+        for id, _ in conteo.most_common(self.limite_reordenar):
+            texto = self._textos.get(id)
+            if texto is None:
+                continue
+            propios = trigramas(texto)
+            comunes = len(consulta & propios)
+            if not comunes:
+                continue
+            # Cobertura de la consulta y, a igualdad, el texto más parecido
+            cobertura = comunes / len(consulta)
+            if cobertura < minimo:
+                continue
+            jaccard = comunes / (len(consulta) + len(propios) - comunes)
+            resultados.append((cobertura, jaccard, id))
+
+        mejores = heapq.nlargest(limite, resultados)
+        return [(id, round(cobertura, 3)) for cobertura, _, id in mejores]
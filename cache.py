@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+
+from database import get_db_connection
+
+
+class CacheConsultas:
+    """Cache de resultados para consultas de listado y búsqueda.
+
+    Cada resultado se guarda junto con la versión de las tablas de las que
+    depende (tabla versiones_tabla, que los triggers incrementan en cada
+    escritura). Para validar una entrada basta con `PRAGMA data_version`
+    sobre una conexión propia, que cambia cuando cualquier otra conexión
+    (de este u otro proceso) confirma cambios; solo entonces se releen los
+    contadores por tabla. Así un cambio en pedidos no invalida el listado
+    de clientes.
+
+    La memoria se limita por cantidad de entradas y por total de filas
+    guardadas, desalojando primero las menos usadas recientemente.
+    """
+
+    def __init__(self, max_entradas=128, max_filas=200000):
+        self.max_entradas = max_entradas
+        self.max_filas = max_filas
+        self._conn = get_db_connection(check_same_thread=False)
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # (sql, parámetros) -> (firma, filas)
+        self._filas = 0
+        self._data_version = None
+        self._versiones = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def cerrar(self):
+        self._conn.close()
+
+    def _versiones_actuales(self):
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._data_version:
+            filas = self._conn.execute('SELECT tabla, version FROM versiones_tabla').fetchall()
+            self._versiones = {tabla: version for tabla, version in filas}
+            self._data_version = data_version
+        return self._versiones
+
+    def consultar(self, sql, parametros, tablas):
+        """Retorna las filas de la consulta, desde el cache si siguen vigentes.
+
+        `tablas` son las tablas que lee la consulta; un cambio en cualquiera
+        de ellas invalida el resultado guardado.
+        """
+        clave = (sql, tuple(parametros))
+        with self._lock:
+            versiones = self._versiones_actuales()
+            firma = tuple(versiones.get(tabla, 0) for tabla in tablas)
+
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] == firma:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[1]
+
+            self.fallos += 1
+            filas = self._conn.execute(sql, parametros).fetchall()
+            self._guardar(clave, firma, filas)
+            return filas
+
+    def _guardar(self, clave, firma, filas):
+        anterior = self._entradas.pop(clave, None)
+        if anterior is not None:
+            self._filas -= len(anterior[1])
+        if len(filas) > self.max_filas:
+            return  # Un resultado más grande que el límite no se guarda
+        self._entradas[clave] = (firma, filas)
+        self._filas += len(filas)
+        while len(self._entradas) > self.max_entradas or self._filas > self.max_filas:
+            _, (_, desalojadas) = self._entradas.popitem(last=False)
+            self._filas -= len(desalojadas)
+            self.desalojos += 1
+
+    def limpiar(self):
+        """Descarta todos los resultados guardados."""
+        with self._lock:
+            self._entradas.clear()
+            self._filas = 0
+
+    def estadisticas(self):
+        return {
+            "entradas": len(self._entradas),
+            "filas": self._filas,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojos": self.desalojos,
+        }
@@ -0,0 +1,362 @@
+"""Prueba de carga concurrente con verificación de invariantes.
+
+Simula varios operadores trabajando a la vez (hilos o procesos) contra
+una base de datos generada en un directorio aparte: búsquedas de
+clientes, consultas de pedidos, altas con PedidoController.crear, cambios
+de estado y bajas. Informa el rendimiento y los percentiles de latencia de
+cada operación y, al terminar, verifica que:
+
+- ningún producto quedó con stock negativo;
+- el total de cada pedido es la suma de sus líneas;
+- el stock se conservó: stock actual + unidades en pedidos = stock inicial;
+- no quedaron líneas sin pedido y el resumen por cliente coincide con los pedidos.
+
+Uso:
+    python carga.py /tmp/carga --hilos 8 --duracion 30
+    python carga.py /tmp/carga --procesos 4 --operaciones 2000
+    python carga.py /tmp/carga --mezcla crear=60,eliminar=20,buscar=20
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from controllers import ClienteController, PedidoController, ProductoController
+import database
+from database import BackendMemoria, BackendSQLite, backend_actual, get_db_connection, init_db
+from models import ESTADOS_PEDIDO, DetallePedido, Pedido
+from reintentos import ESTADISTICAS
+
+NOMBRES = ["Ana", "Juan", "María", "José", "Lucía", "Pedro", "Sofía", "Martín", "Valentina", "Ramón"]
+APELLIDOS = ["Pérez", "Gómez", "López", "Díaz", "Martínez", "Rodríguez", "Núñez", "González"]
+ARTICULOS = ["Teclado", "Ratón", "Monitor", "Auriculares", "Cable", "Disco", "Memoria", "Cámara"]
+
+MEZCLA_POR_DEFECTO = {"buscar": 40, "detalle": 20, "crear": 25, "estado": 10, "eliminar": 5}
+
+
+class _Descartar:
+    """Salida que descarta lo escrito (los controladores informan errores con print)."""
+
+    def write(self, texto):
+        return len(texto)
+
+    def flush(self):
+        pass
+
+
+def generar(clientes=1000, productos=200, pedidos=2000, semilla=1):
+    """Crea la base de prueba en el almacenamiento actual (ver database.usar_backend)."""
+    aleatorio = random.Random(semilla)
+    init_db()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.executemany(
+        'INSERT INTO clientes (nombre, email, telefono, direccion) VALUES (?, ?, ?, ?)',
+        [(f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}",
+          f"cliente{i}@ejemplo.com", f"11-{aleatorio.randint(1000, 9999)}-{i:04d}", f"Calle {i}")
+         for i in range(clientes)]
+    )
+    cursor.executemany(
+        'INSERT INTO productos (nombre, descripcion, precio, stock, stock_minimo) VALUES (?, ?, ?, ?, ?)',
+        [(f"{aleatorio.choice(ARTICULOS)} {i}", "Producto de prueba", round(aleatorio.uniform(1, 500), 2),
+          aleatorio.randint(500, 3000), 20)
+         for i in range(productos)]
+    )
+
+    precios = dict(cursor.execute('SELECT id, precio FROM productos').fetchall())
+    controlador = PedidoController()
+    inicio = datetime.date(2024, 1, 1)
+    for _ in range(pedidos):
+        detalles = [
+            DetallePedido(producto_id=producto_id, cantidad=aleatorio.randint(1, 3), precio_unitario=precios[producto_id])
+            for producto_id in aleatorio.sample(list(precios), aleatorio.randint(1, 4))
+        ]
+        pedido = Pedido(
+            cliente_id=aleatorio.randint(1, clientes),
+            fecha=(inicio + datetime.timedelta(days=aleatorio.randint(0, 365))).isoformat(),
+            estado=aleatorio.choice(ESTADOS_PEDIDO),
+            total=sum(detalle.subtotal() for detalle in detalles)
+        )
+        controlador.insertar(cursor, pedido, detalles)
+
+    conn.commit()
+    conn.close()
+
+
+def stock_inicial():
+    """Stock de cada producto sumando las unidades que hay en pedidos (lo que debe conservarse)."""
+    conn = get_db_connection()
+    filas = conn.execute('''
+        SELECT p.id, p.stock + COALESCE((SELECT SUM(d.cantidad) FROM detalles_pedido d WHERE d.producto_id = p.id), 0)
+        FROM productos p
+    ''').fetchall()
+    conn.close()
+    return {producto_id: stock for producto_id, stock in filas}
+
+
+def verificar_invariantes(stock_base):
+    """Retorna la lista de invariantes violados (vacía si todo está bien)."""
+    conn = get_db_connection()
+    problemas = []
+
+    for row in conn.execute('SELECT id, stock FROM productos WHERE stock < 0'):
+        problemas.append(f"producto {row['id']} con stock negativo ({row['stock']})")
+
+    for row in conn.execute('''
+        SELECT p.id, p.total, TOTAL(d.cantidad * d.precio_unitario) AS suma
+        FROM pedidos p LEFT JOIN detalles_pedido d ON d.pedido_id = p.id
+        GROUP BY p.id
+        HAVING ABS(p.total - suma) > 0.005
+    '''):
+        problemas.append(f"pedido {row['id']}: total {row['total']} y suma de líneas {row['suma']}")
+
+    for producto_id, stock in stock_inicial().items():
+        if stock != stock_base.get(producto_id):
+            problemas.append(f"producto {producto_id}: stock + unidades en pedidos = {stock}, se esperaba {stock_base.get(producto_id)}")
+
+    huerfanas = conn.execute(
+        'SELECT COUNT(*) FROM detalles_pedido d WHERE NOT EXISTS (SELECT 1 FROM pedidos p WHERE p.id = d.pedido_id)'
+    ).fetchone()[0]
+    if huerfanas:
+        problemas.append(f"{huerfanas} líneas de pedido sin pedido")
+
+    esperado = {
+        row[0]: (row[1], round(row[2], 2)) for row in conn.execute('''
+            SELECT cliente_id, COUNT(*), TOTAL(CASE WHEN estado <> 'Cancelado' THEN total END)
+            FROM pedidos GROUP BY cliente_id
+        ''')
+    }
+    resumen = {
+        row[0]: (row[1], round(row[2], 2))
+        for row in conn.execute('SELECT cliente_id, cantidad_pedidos, total_gastado FROM resumen_clientes')
+    }
+    distintos = sum(1 for cliente_id in esperado.keys() | resumen.keys() if esperado.get(cliente_id) != resumen.get(cliente_id))
+    if distintos:
+        problemas.append(f"{distintos} clientes con el resumen de pedidos desactualizado")
+
+    conn.close()
+    return problemas
+
+
+class Operador:
+    """Un usuario simulado que ejecuta operaciones al azar según la mezcla."""
+
+    def __init__(self, semilla, mezcla):
+        self.aleatorio = random.Random(semilla)
+        self.operaciones = list(mezcla)
+        self.pesos = [mezcla[nombre] for nombre in self.operaciones]
+        self.clientes = ClienteController()
+        self.productos = ProductoController()
+        self.pedidos = PedidoController()
+        conn = get_db_connection()
+        self.max_cliente = conn.execute('SELECT COALESCE(MAX(id), 0) FROM clientes').fetchone()[0]
+        self.ids_productos = [row[0] for row in conn.execute('SELECT id FROM productos')]
+        self.max_pedido = conn.execute('SELECT COALESCE(MAX(id), 0) FROM pedidos').fetchone()[0]
+        conn.close()
+
+    def _pedido_al_azar(self):
+        return self.aleatorio.randint(1, max(1, self.max_pedido))
+
+    def buscar(self):
+        self.clientes.buscar(self.aleatorio.choice(NOMBRES)[:3])
+        return True
+
+    def detalle(self):
+        pedido = self.pedidos.obtener_por_id(self._pedido_al_azar())
+        if pedido is not None:
+            [detalle.producto for detalle in pedido.detalles]
+        return True
+
+    def crear(self):
+        # Igual que la aplicación: lee cada producto y no pide más de lo que ve disponible
+        detalles = []
+        for producto_id in self.aleatorio.sample(self.ids_productos, self.aleatorio.randint(1, 3)):
+            producto = self.productos.obtener_por_id(producto_id)
+            if producto is None or producto.stock <= 0:
+                continue
+            cantidad = self.aleatorio.randint(1, min(5, producto.stock))
+            detalles.append(DetallePedido(producto_id=producto.id, cantidad=cantidad, precio_unitario=producto.precio))
+        if not detalles:
+            return False
+        pedido = Pedido(
+            cliente_id=self.aleatorio.randint(1, self.max_cliente),
+            fecha=datetime.date.today().isoformat(),
+            estado="Pendiente",
+            total=sum(detalle.subtotal() for detalle in detalles)
+        )
+        pedido_id = self.pedidos.crear(pedido, detalles)
+        if pedido_id:
+            self.max_pedido = max(self.max_pedido, pedido_id)
+        return bool(pedido_id)
+
+    def estado(self):
+        return self.pedidos.actualizar_estado(self._pedido_al_azar(), self.aleatorio.choice(ESTADOS_PEDIDO))
+
+    def eliminar(self):
+        return self.pedidos.eliminar(self._pedido_al_azar())
+
+    def ejecutar(self, duracion=None, operaciones=None):
+        """Ejecuta operaciones hasta cumplir la duración o la cantidad. Retorna las mediciones."""
+        latencias = {nombre: [] for nombre in self.operaciones}
+        fallos = {nombre: 0 for nombre in self.operaciones}
+        fin = time.monotonic() + duracion if duracion else None
+        hechas = 0
+        while (operaciones is None or hechas < operaciones) and (fin is None or time.monotonic() < fin):
+            nombre = self.aleatorio.choices(self.operaciones, self.pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                exito = getattr(self, nombre)()
+            except Exception:
+                exito = False
+            latencias[nombre].append(time.perf_counter() - inicio)
+            if not exito:
+                fallos[nombre] += 1
+            hechas += 1
+        return {"latencias": latencias, "fallos": fallos}
+
+
+def _trabajo_proceso(semilla, mezcla, duracion, operaciones):
+    sys.stdout = _Descartar()
+    ESTADISTICAS.reiniciar()
+    resultado = Operador(semilla, mezcla).ejecutar(duracion, operaciones)
+    return resultado, ESTADISTICAS.como_dict()
+
+
+def ejecutar_carga(operadores, mezcla, duracion=None, operaciones=None, procesos=False, semilla=1):
+    """Corre `operadores` usuarios simultáneos.
+
+    Retorna (mediciones de cada operador, estadísticas de contención, segundos).
+    """
+    inicio = time.perf_counter()
+    if procesos:
+        # Los procesos usan la misma base de prueba que este, aunque se
+        # inicien sin copiar su memoria (spawn)
+        with ProcessPoolExecutor(max_workers=operadores, initializer=database.usar_backend,
+                                 initargs=(backend_actual(),)) as pool:
+            futuros = [
+                pool.submit(_trabajo_proceso, semilla + i, mezcla, duracion, operaciones)
+                for i in range(operadores)
+            ]
+            resultados, contencion = [], {}
+            for futuro in futuros:
+                resultado, estadisticas = futuro.result()
+                resultados.append(resultado)
+                for clave, valor in estadisticas.items():
+                    contencion[clave] = contencion.get(clave, 0) + valor
+    else:
+        ESTADISTICAS.reiniciar()
+        resultados = [None] * operadores
+        simulados = [Operador(semilla + i, mezcla) for i in range(operadores)]
+
+        def correr(indice):
+            resultados[indice] = simulados[indice].ejecutar(duracion, operaciones)
+
+        hilos = [threading.Thread(target=correr, args=(i,)) for i in range(operadores)]
+        salida, sys.stdout = sys.stdout, _Descartar()
+        try:
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        finally:
+            sys.stdout = salida
+        contencion = ESTADISTICAS.como_dict()
+    return resultados, contencion, time.perf_counter() - inicio
+
+
+def _percentil(ordenados, fraccion):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(fraccion * len(ordenados)))]
+
+
+def informe(resultados, contencion, segundos):
+    """Imprime rendimiento y percentiles de latencia (en milisegundos) por operación."""
+    latencias, fallos = {}, {}
+    for resultado in resultados:
+        for nombre, valores in resultado["latencias"].items():
+            latencias.setdefault(nombre, []).extend(valores)
+            fallos[nombre] = fallos.get(nombre, 0) + resultado["fallos"][nombre]
+
+    total = sum(len(valores) for valores in latencias.values())
+    print(f"\n{total} operaciones en {segundos:.1f} s ({total / segundos:.0f} op/s)\n")
+    print(f"{'Operación':<10} {'Cantidad':>9} {'Fallos':>7} {'op/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8}")
+    print("-" * 72)
+    for nombre, valores in latencias.items():
+        ordenados = sorted(valores)
+        p50, p95, p99 = (_percentil(ordenados, f) * 1000 for f in (0.50, 0.95, 0.99))
+        maximo = ordenados[-1] * 1000 if ordenados else 0.0
+        print(f"{nombre:<10} {len(valores):>9} {fallos[nombre]:>7} {len(valores) / segundos:>8.1f} "
+              f"{p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {maximo:>8.2f}")
+    print("\nContención de escrituras: " + ", ".join(f"{clave}={round(valor, 3)}" for clave, valor in contencion.items()))
+
+
+def _leer_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        if nombre not in MEZCLA_POR_DEFECTO:
+            raise argparse.ArgumentTypeError(f"operación desconocida: {nombre}")
+        mezcla[nombre] = int(peso)
+    return mezcla
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga concurrente de TechLab.")
+    parser.add_argument("directorio", help="directorio de la base de prueba (se genera si no existe techlab.db)")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument("--hilos", type=int, default=8, help="operadores simultáneos en hilos")
+    modo.add_argument("--procesos", type=int, help="operadores simultáneos en procesos")
+    parser.add_argument("--duracion", type=float, default=10, help="segundos de carga")
+    parser.add_argument("--operaciones", type=int, help="operaciones por operador (en lugar de duración)")
+    parser.add_argument("--mezcla", type=_leer_mezcla, default=MEZCLA_POR_DEFECTO, help="pesos, p. ej. crear=50,buscar=50")
+    parser.add_argument("--clientes", type=int, default=1000)
+    parser.add_argument("--productos", type=int, default=200)
+    parser.add_argument("--pedidos", type=int, default=2000)
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    # La base de prueba es techlab.db dentro del directorio indicado (o la
+    # base en memoria, con TECHLAB_BACKEND=memoria), nunca la de TECHLAB_DB
+    anterior = backend_actual()
+    if isinstance(anterior, BackendMemoria):
+        if args.procesos:
+            parser.error("la base en memoria no se comparte entre procesos: use --hilos")
+    else:
+        os.makedirs(args.directorio, exist_ok=True)
+        database.usar_backend(BackendSQLite(os.path.join(args.directorio, 'techlab.db')))
+    try:
+        if not backend_actual().existe():
+            print("Generando base de prueba...")
+            generar(args.clientes, args.productos, args.pedidos, args.semilla)
+
+        stock_base = stock_inicial()
+        operadores = args.procesos or args.hilos
+        print(f"{operadores} operadores en {'procesos' if args.procesos else 'hilos'}, mezcla {args.mezcla}")
+        resultados, contencion, segundos = ejecutar_carga(
+            operadores, args.mezcla,
+            duracion=None if args.operaciones else args.duracion,
+            operaciones=args.operaciones,
+            procesos=bool(args.procesos),
+            semilla=args.semilla
+        )
+        informe(resultados, contencion, segundos)
+
+        problemas = verificar_invariantes(stock_base)
+        if problemas:
+            print(f"\nInvariantes violados ({len(problemas)}):")
+            for problema in problemas[:50]:
+                print(f"  - {problema}")
+            sys.exit(1)
+        print("\nInvariantes verificados: stock no negativo, totales, conservación de stock y resúmenes.")
+    finally:
+        database.usar_backend(anterior)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import bisect
+import copy
+import threading
+
+from database import get_db_connection
+from models import Producto
+from texto import normalizar
+
+
+class CatalogoEnMemoria:
+    """Copia en memoria de todos los productos, para leer sin ir a la base.
+
+    Las escrituras siguen yendo a techlab.db (ProductoController escribe y
+    luego llama a `sincronizar`). Los cambios de otras conexiones o
+    procesos, incluidos los descuentos de stock de los pedidos, se detectan
+    con `PRAGMA data_version` antes de cada lectura y se traen desde el
+    registro de cambios (tabla `cambios`): solo se releen los productos
+    modificados. Si el registro no alcanza para saber qué cambió (por
+    ejemplo, porque se purgó), se recarga el catálogo completo.
+
+    Las lecturas retornan copias, así que modificar un producto obtenido
+    no altera el catálogo hasta que el cambio se guarde.
+    """
+
+    def __init__(self):
+        self._conn = get_db_connection(check_same_thread=False)
+        self._conn.isolation_level = None
+        self._lock = threading.Lock()
+        self._productos = {}  # ID -> Producto
+        self._normalizados = {}  # ID -> (nombre_norm, descripcion_norm)
+        self._orden = []  # (nombre_norm, ID) ordenado, para buscar por prefijo
+        self._data_version = None
+        self._version = None  # Versión de la tabla productos (versiones_tabla) ya aplicada
+        self._posicion = 0  # Último cambio (tabla cambios) ya aplicado
+        self.recargas = 0
+        self.actualizaciones = 0
+        with self._lock:
+            self._recargar()
+
+    def cerrar(self):
+        self._conn.close()
+
+    def __len__(self):
+        return len(self._productos)
+
+    def _recargar(self):
+        self._conn.execute('BEGIN')
+        try:
+            self._version, self._posicion = self._estado()
+            self._productos.clear()
+            self._normalizados.clear()
+            for row in self._conn.execute('SELECT * FROM productos'):
+                self._guardar(row)
+            self._orden = sorted((normalizados[0], id) for id, normalizados in self._normalizados.items())
+        finally:
+            self._conn.execute('COMMIT')
+        self.recargas += 1
+
+    def _estado(self):
+        version = self._conn.execute("SELECT version FROM versiones_tabla WHERE tabla = 'productos'").fetchone()[0]
+        posicion = self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM cambios').fetchone()[0]
+        return version, posicion
+
+    def _guardar(self, row):
+        self._productos[row['id']] = Producto.from_db_row(row)
+        self._normalizados[row['id']] = (row['nombre_norm'] or '', row['descripcion_norm'] or '')
+
+    def _quitar_del_orden(self, id):
+        normalizados = self._normalizados.get(id)
+        if normalizados is None:
+            return
+        posicion = bisect.bisect_left(self._orden, (normalizados[0], id))
+        if posicion < len(self._orden) and self._orden[posicion] == (normalizados[0], id):
+            del self._orden[posicion]
+
+    def _al_dia(self):
+        """Aplica los cambios confirmados por otras conexiones desde la última lectura."""
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+
+        self._conn.execute('BEGIN')
+        try:
+            version, posicion = self._estado()
+            if version == self._version:
+                return
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT fila_id FROM cambios WHERE id > ? AND tabla = 'productos'", (self._posicion,)
+            )]
+            # Cada cambio en productos avanza la versión y deja un registro:
+            # si no coinciden, faltan registros y no se sabe qué cambió
+            completo = len(ids) == version - self._version
+            if completo:
+                self._aplicar(set(ids))
+                self._version, self._posicion = version, posicion
+        finally:
+            self._conn.execute('COMMIT')
+        if not completo:
+            self._recargar()
+
+    def _aplicar(self, ids):
+        ids = sorted(ids)
+        filas = {}
+        for inicio in range(0, len(ids), 500):
+            bloque = ids[inicio:inicio + 500]
+            marcas = ','.join('?' * len(bloque))
+            for row in self._conn.execute(f'SELECT * FROM productos WHERE id IN ({marcas})', bloque):
+                filas[row['id']] = row
+        for id in ids:
+            self._quitar_del_orden(id)
+            row = filas.get(id)
+            if row is None:
+                self._productos.pop(id, None)
+                self._normalizados.pop(id, None)
+                continue
+            self._guardar(row)
+            bisect.insort(self._orden, (self._normalizados[id][0], id))
+        self.actualizaciones += len(ids)
+
+    def sincronizar(self):
+        """Trae los cambios pendientes; se llama después de cada escritura propia."""
+        with self._lock:
+            self._al_dia()
+
+    def obtener(self, id):
+        """Retorna una copia del producto, o None si no existe."""
+        with self._lock:
+            self._al_dia()
+            producto = self._productos.get(id)
+            return copy.copy(producto) if producto is not None else None
+
+    def obtener_varios(self, ids):
+        """Retorna {id: copia del producto} para los IDs que existen."""
+        with self._lock:
+            self._al_dia()
+            return {id: copy.copy(self._productos[id]) for id in ids if id in self._productos}
+
+    def listar(self):
+        """Todos los productos ordenados por nombre."""
+        with self._lock:
+            self._al_dia()
+            productos = [copy.copy(producto) for producto in self._productos.values()]
+        return sorted(productos, key=lambda producto: producto.nombre)
+
+    def buscar(self, termino):
+        """Igual que ProductoController.buscar: primero por prefijo del nombre, después por contenido."""
+        termino_norm = normalizar(termino)
+        with self._lock:
+            self._al_dia()
+            inicio = bisect.bisect_left(self._orden, (termino_norm,))
+            prefijos = []
+            for nombre_norm, id in self._orden[inicio:]:
+                if not nombre_norm.startswith(termino_norm):
+                    break
+                prefijos.append(id)
+            vistos = set(prefijos)
+            contienen = [
+                id for id, (nombre_norm, descripcion_norm) in self._normalizados.items()
+                if id not in vistos and (termino_norm in nombre_norm or termino_norm in descripcion_norm)
+            ]
+            grupos = [[copy.copy(self._productos[id]) for id in ids] for ids in (prefijos, contienen)]
+        return [producto for grupo in grupos for producto in sorted(grupo, key=lambda producto: producto.nombre)]
@@ -0,0 +1,279 @@
+"""Lectura incremental del registro de cambios (change data capture).
+
+Los triggers creados por database.migrar_db registran en la tabla `cambios`
+cada alta (I), modificación (U) y baja (D) de clientes, productos, pedidos
+y detalles_pedido. Cada consumidor guarda su posición en
+`consumidores_cambios` y lee los cambios posteriores en lotes.
+
+Uso:
+    python cdc.py exportar CONSUMIDOR [--lote N]   # JSONL por la salida estándar
+    python cdc.py estado
+    python cdc.py purgar [--compactar-despues S] [--inactividad-maxima S]
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+from database import get_db_connection
+
+TABLAS = ('clientes', 'productos', 'pedidos', 'detalles_pedido')
+
+
+def _ahora():
+    return int(time.time())
+
+
+class ConsumidorCambios:
+    """Consumidor con nombre que lee el registro de cambios desde su última posición."""
+
+    def __init__(self, nombre, desde_inicio=True):
+        """Registra el consumidor si no existe.
+
+        Un consumidor nuevo empieza desde el primer cambio retenido, o
+        desde el final del registro si `desde_inicio` es False (por
+        ejemplo, después de copiar una instantánea de las tablas).
+        """
+        self.nombre = nombre
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        posicion = 0
+        if not desde_inicio:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM cambios')
+            posicion = cursor.fetchone()[0]
+        cursor.execute(
+            'INSERT OR IGNORE INTO consumidores_cambios (nombre, posicion, actualizado) VALUES (?, ?, ?)',
+            (nombre, posicion, _ahora())
+        )
+        conn.commit()
+        conn.close()
+
+    def posicion(self):
+        """Retorna el ID del último cambio confirmado por el consumidor."""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT posicion FROM consumidores_cambios WHERE nombre = ?', (self.nombre,))
+        row = cursor.fetchone()
+        conn.close()
+        return row['posicion'] if row else 0
+
+    def leer(self, lote=500, posicion=None):
+        """Retorna hasta `lote` cambios posteriores a la posición, en orden."""
+        if posicion is None:
+            posicion = self.posicion()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM cambios WHERE id > ? ORDER BY id LIMIT ?', (posicion, lote))
+        cambios = cursor.fetchall()
+        conn.close()
+        return cambios
+
+    def confirmar(self, hasta_id):
+        """Avanza la posición del consumidor hasta el cambio indicado (inclusive)."""
+        conn = get_db_connection()
+        conn.execute(
+            'UPDATE consumidores_cambios SET posicion = MAX(posicion, ?), actualizado = ? WHERE nombre = ?',
+            (hasta_id, _ahora(), self.nombre)
+        )
+        conn.commit()
+        conn.close()
+
+    def lotes(self, lote=500):
+        """Itera los cambios pendientes en lotes, confirmando cada lote al pedir el siguiente.
+
+        Si el consumidor deja de iterar, el último lote entregado no se
+        confirma y se vuelve a leer la próxima vez.
+        """
+        posicion = self.posicion()
+        while True:
+            cambios = self.leer(lote, posicion)
+            if not cambios:
+                return
+            yield cambios
+            posicion = cambios[-1]['id']
+            self.confirmar(posicion)
+
+    def eliminar(self):
+        """Da de baja al consumidor para que deje de retener cambios."""
+        conn = get_db_connection()
+        conn.execute('DELETE FROM consumidores_cambios WHERE nombre = ?', (self.nombre,))
+        conn.commit()
+        conn.close()
+
+
+def ultimos_por_fila(cambios):
+    """Reduce un lote de cambios al último cambio de cada (tabla, fila_id), en orden."""
+    ultimos = {}
+    for cambio in cambios:
+        clave = (cambio['tabla'], cambio['fila_id'])
+        ultimos.pop(clave, None)
+        ultimos[clave] = cambio
+    return list(ultimos.values())
+
+
+def filas_actuales(cursor, cambios):
+    """Lee el estado actual de las filas afectadas por los cambios.
+
+    Retorna un diccionario (tabla, fila_id) -> fila, o None si la fila ya
+    no existe. Como los cambios solo identifican la fila, este es el estado
+    que un consumidor debe aplicar.
+    """
+    ids_por_tabla = {}
+    for cambio in cambios:
+        ids_por_tabla.setdefault(cambio['tabla'], set()).add(cambio['fila_id'])
+
+    filas = {}
+    for tabla, ids in ids_por_tabla.items():
+        if tabla not in TABLAS:
+            continue
+        ids = sorted(ids)
+        for id in ids:
+            filas[(tabla, id)] = None
+        for inicio in range(0, len(ids), 500):
+            bloque = ids[inicio:inicio + 500]
+            marcas = ','.join('?' * len(bloque))
+            cursor.execute(f'SELECT * FROM {tabla} WHERE id IN ({marcas})', bloque)
+            for row in cursor.fetchall():
+                filas[(tabla, row['id'])] = row
+    return filas
+
+
+def _tramos(conn, desde, hasta, tamano):
+    """Divide los cambios con id en (desde, hasta] en tramos (a, b] de hasta `tamano` registros."""
+    while desde < hasta:
+        fila = conn.execute(
+            'SELECT id FROM cambios WHERE id > ? AND id <= ? ORDER BY id LIMIT 1 OFFSET ?',
+            (desde, hasta, tamano - 1)
+        ).fetchone()
+        fin = fila[0] if fila is not None else hasta
+        yield desde, fin
+        desde = fin
+
+
+def purgar(compactar_despues=3600, inactividad_maxima=30 * 86400, conn=None, tamano_lote=5000):
+    """Aplica la política de retención del registro de cambios.
+
+    1. Da de baja a los consumidores sin actividad en `inactividad_maxima`
+       segundos, para que no retengan el registro indefinidamente.
+    2. Elimina los cambios ya confirmados por todos los consumidores.
+    3. Compacta los cambios con más de `compactar_despues` segundos,
+       conservando solo el último de cada fila. Como los consumidores leen
+       el estado actual de la fila, no se pierde información.
+
+    Con esto el registro queda acotado por la cantidad de filas distintas
+    modificadas. Los borrados se hacen en tramos de `tamano_lote` registros,
+    cada uno en su propia transacción, así que el bloqueo de escritura se
+    retiene poco tiempo. `conn` permite usar una conexión propia (la del
+    mantenimiento, con su espera máxima por bloqueos). Los errores se
+    propagan; lo ya eliminado queda eliminado. Retorna un diccionario con la
+    cantidad de registros afectados.
+    """
+    resultado = {"consumidores_dados_de_baja": 0, "confirmados": 0, "compactados": 0}
+    propia = conn is None
+    if propia:
+        conn = get_db_connection()
+    nivel = conn.isolation_level
+    conn.isolation_level = None  # Cada sentencia es su propia transacción
+    try:
+        ahora = _ahora()
+        cursor = conn.execute('DELETE FROM consumidores_cambios WHERE actualizado < ?', (ahora - inactividad_maxima,))
+        resultado["consumidores_dados_de_baja"] = cursor.rowcount
+
+        primero, ultimo = conn.execute('SELECT COALESCE(MIN(id), 0) - 1, COALESCE(MAX(id), 0) FROM cambios').fetchone()
+        minima, consumidores = conn.execute('SELECT MIN(posicion), COUNT(*) FROM consumidores_cambios').fetchone()
+        if consumidores:
+            for desde, hasta in _tramos(conn, primero, min(minima, ultimo), tamano_lote):
+                cursor = conn.execute('DELETE FROM cambios WHERE id > ? AND id <= ?', (desde, hasta))
+                resultado["confirmados"] += cursor.rowcount
+            primero = max(primero, minima)
+
+        # Un cambio se compacta si hay otro posterior de la misma fila
+        # (índice por tabla, fila_id, id)
+        for desde, hasta in _tramos(conn, primero, ultimo, tamano_lote):
+            cursor = conn.execute('''
+                DELETE FROM cambios
+                WHERE id > ? AND id <= ? AND momento < ?
+                  AND EXISTS (
+                      SELECT 1 FROM cambios posterior
+                      WHERE posterior.tabla = cambios.tabla AND posterior.fila_id = cambios.fila_id
+                        AND posterior.id > cambios.id
+                  )
+            ''', (desde, hasta, ahora - compactar_despues))
+            resultado["compactados"] += cursor.rowcount
+    finally:
+        conn.isolation_level = nivel
+        if propia:
+            conn.close()
+    return resultado
+
+
+def estado():
+    """Retorna el último cambio registrado y el atraso de cada consumidor."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT COALESCE(MAX(id), 0), COUNT(*) FROM cambios')
+    ultimo, retenidos = cursor.fetchone()
+    cursor.execute('SELECT nombre, posicion, actualizado FROM consumidores_cambios ORDER BY nombre')
+    consumidores = [
+        {"nombre": row['nombre'], "posicion": row['posicion'], "atraso": ultimo - row['posicion'],
+         "actualizado": row['actualizado']}
+        for row in cursor.fetchall()
+    ]
+    conn.close()
+    return {"ultimo": ultimo, "retenidos": retenidos, "consumidores": consumidores}
+
+
+def exportar(nombre, lote=1000, salida=sys.stdout):
+    """Escribe los cambios pendientes del consumidor como JSONL, con el estado actual de cada fila."""
+    consumidor = ConsumidorCambios(nombre)
+    total = 0
+    for cambios in consumidor.lotes(lote):
+        conn = get_db_connection()
+        filas = filas_actuales(conn.cursor(), cambios)
+        conn.close()
+        for cambio in cambios:
+            fila = filas.get((cambio['tabla'], cambio['fila_id']))
+            registro = {
+                "id": cambio['id'],
+                "tabla": cambio['tabla'],
+                "operacion": cambio['operacion'],
+                "fila_id": cambio['fila_id'],
+                "momento": cambio['momento'],
+                "fila": dict(fila) if fila is not None else None,
+            }
+            salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        salida.flush()
+        total += len(cambios)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registro de cambios de la base de datos TechLab.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    exportar_parser = subparsers.add_parser("exportar", help="exporta los cambios pendientes de un consumidor")
+    exportar_parser.add_argument("consumidor")
+    exportar_parser.add_argument("--lote", type=int, default=1000)
+
+    subparsers.add_parser("estado", help="muestra el atraso de cada consumidor")
+
+    purgar_parser = subparsers.add_parser("purgar", help="aplica la política de retención")
+    purgar_parser.add_argument("--compactar-despues", type=int, default=3600)
+    purgar_parser.add_argument("--inactividad-maxima", type=int, default=30 * 86400)
+
+    args = parser.parse_args()
+    if args.comando == "exportar":
+        exportar(args.consumidor, args.lote)
+    elif args.comando == "estado":
+        print(json.dumps(estado(), indent=2, ensure_ascii=False))
+    else:
+        try:
+            resultado = purgar(args.compactar_despues, args.inactividad_maxima)
+        except sqlite3.Error as e:
+            sys.exit(f"Error al purgar el registro de cambios: {e}")
+        print(json.dumps(resultado, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Copia en memoria, por columnas, de las líneas de pedido para análisis.
+
+`InstantaneaLineas` carga detalles_pedido unido con pedidos en arreglos
+compactos (módulo array): una columna por campo en lugar de un objeto
+DetallePedido por fila. Los IDs de producto, cliente y pedido, la fecha y
+el estado se guardan codificados con diccionario (un entero por fila que
+indexa la lista de valores distintos), lo que permite agrupar con un
+simple acumulador por código. Si NumPy está instalado, las agrupaciones
+usan numpy.bincount sobre los mismos arreglos, sin copiarlos.
+
+Uso:
+    python columnar.py                 # productos más vendidos y tamaño de las canastas
+    python columnar.py --top 20
+"""
+import argparse
+from array import array
+
+from database import get_db_connection
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Columnas agrupables (codificadas con diccionario) y columnas numéricas
+CLAVES = ('producto', 'cliente', 'pedido', 'fecha', 'estado')
+VALORES = ('cantidad', 'importe')
+# Códigos de tipo de array con valores enteros
+ENTEROS = 'bBhHiIlLqQ'
+
+
+class Diccionario:
+    """Codificación de valores repetidos como enteros consecutivos."""
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def codificar(self, valor):
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def codigo(self, valor):
+        """Código de un valor, o None si no aparece en la instantánea."""
+        return self._codigos.get(valor)
+
+    def __len__(self):
+        return len(self.valores)
+
+
+class InstantaneaLineas:
+    """Líneas de pedido en columnas, con actualización incremental.
+
+    `refrescar()` agrega solo las líneas nuevas (id mayor al último
+    cargado). Para saber si además hubo modificaciones o bajas compara el
+    avance de versiones_tabla con la cantidad de pedidos y líneas nuevas:
+    si no coinciden, algo más cambió (por ejemplo, el estado de un pedido)
+    y la instantánea se vuelve a cargar completa.
+    """
+
+    def __init__(self, tamano_lote=10000):
+        self.tamano_lote = tamano_lote
+        self.cargas_completas = 0
+        self._vaciar()
+
+    def _vaciar(self):
+        self.linea_id = array('q')
+        self.cantidad = array('q')
+        self.precio = array('d')
+        self.importe = array('d')
+        self.diccionarios = {clave: Diccionario() for clave in CLAVES}
+        self.codigos = {clave: array('l') for clave in CLAVES}
+        self._versiones = None
+        self._ultimo_pedido = 0
+        self._ultima_linea = 0
+
+    def __len__(self):
+        return len(self.linea_id)
+
+    def refrescar(self):
+        """Trae los cambios de la base. Retorna la cantidad de líneas agregadas."""
+        conn = get_db_connection()
+        conn.isolation_level = None
+        try:
+            # Una sola transacción de lectura: versiones, máximos y filas consistentes
+            conn.execute('BEGIN')
+            versiones = dict(conn.execute(
+                "SELECT tabla, version FROM versiones_tabla WHERE tabla IN ('pedidos', 'detalles_pedido')"
+            ).fetchall())
+            if not self._solo_altas(conn, versiones):
+                self._vaciar()
+                self.cargas_completas += 1
+            antes = len(self)
+            self._cargar(conn)
+            self._versiones = versiones
+            self._ultimo_pedido = conn.execute('SELECT COALESCE(MAX(id), 0) FROM pedidos').fetchone()[0]
+            conn.execute('COMMIT')
+            return len(self) - antes
+        finally:
+            conn.close()
+
+    def _solo_altas(self, conn, versiones):
+        """Indica si desde la última carga solo se agregaron pedidos y líneas."""
+        if self._versiones is None:
+            return False
+        nuevos_pedidos = conn.execute(
+            'SELECT COUNT(*) FROM pedidos WHERE id > ?', (self._ultimo_pedido,)
+        ).fetchone()[0]
+        nuevas_lineas = conn.execute(
+            'SELECT COUNT(*) FROM detalles_pedido WHERE id > ?', (self._ultima_linea,)
+        ).fetchone()[0]
+        return (versiones['pedidos'] - self._versiones['pedidos'] == nuevos_pedidos
+                and versiones['detalles_pedido'] - self._versiones['detalles_pedido'] == nuevas_lineas)
+
+    def _cargar(self, conn):
+        cursor = conn.execute('''
+            SELECT d.id, d.producto_id, p.cliente_id, d.pedido_id, p.fecha, p.estado, d.cantidad, d.precio_unitario
+            FROM detalles_pedido d JOIN pedidos p ON p.id = d.pedido_id
+            WHERE d.id > ?
+            ORDER BY d.id
+        ''', (self._ultima_linea,))
+        codificadores = [self.diccionarios[clave].codificar for clave in CLAVES]
+        columnas = [self.codigos[clave] for clave in CLAVES]
+        while True:
+            filas = cursor.fetchmany(self.tamano_lote)
+            if not filas:
+                break
+            for fila in filas:
+                self.linea_id.append(fila[0])
+                for columna, codificar, valor in zip(columnas, codificadores, fila[1:6]):
+                    columna.append(codificar(valor))
+                self.cantidad.append(fila[6])
+                self.precio.append(fila[7])
+                self.importe.append(fila[6] * fila[7])
+            self._ultima_linea = filas[-1][0]
+
+    def _columna_valores(self, valores):
+        if valores not in VALORES:
+            raise ValueError(f"columna de valores desconocida: {valores}")
+        return getattr(self, valores)
+
+    def _mascara(self, excluir_estados):
+        """Booleanos con las filas a considerar, o None para todas.
+
+        Con NumPy es un arreglo calculado sobre los códigos de estado sin
+        copiarlos; sin NumPy, una lista.
+        """
+        excluidos = {self.diccionarios['estado'].codigo(estado) for estado in excluir_estados or ()}
+        excluidos.discard(None)
+        if not excluidos:
+            return None
+        estados = self.codigos['estado']
+        if numpy is not None:
+            estados_np = numpy.frombuffer(estados, dtype=numpy.dtype(estados.typecode))
+            return numpy.isin(estados_np, sorted(excluidos), invert=True)
+        return [codigo not in excluidos for codigo in estados]
+
+    def sumar_por(self, clave, valores='importe', excluir_estados=('Cancelado',)):
+        """Suma una columna numérica agrupando por `clave`. Retorna {valor de la clave: suma}.
+
+        Por defecto no cuenta las líneas de pedidos cancelados.
+        """
+        codigos = self.codigos[clave]
+        columna = self._columna_valores(valores)
+        mascara = self._mascara(excluir_estados)
+        diccionario = self.diccionarios[clave]
+
+        if numpy is not None:
+            codigos_np = numpy.frombuffer(codigos, dtype=numpy.dtype(codigos.typecode))
+            pesos = numpy.frombuffer(columna, dtype=numpy.dtype(columna.typecode)).astype(float)
+            if mascara is not None:
+                codigos_np, pesos = codigos_np[mascara], pesos[mascara]
+            sumas = numpy.bincount(codigos_np, weights=pesos, minlength=len(diccionario))
+            if columna.typecode in ENTEROS:
+                # bincount suma en float: se vuelve a enteros, como sin NumPy
+                sumas = numpy.rint(sumas).astype(numpy.int64)
+            sumas = sumas.tolist()
+        else:
+            sumas = [0] * len(diccionario)
+            if mascara is None:
+                for codigo, valor in zip(codigos, columna):
+                    sumas[codigo] += valor
+            else:
+                for codigo, valor, incluir in zip(codigos, columna, mascara):
+                    if incluir:
+                        sumas[codigo] += valor
+
+        return {valor: suma for valor, suma in zip(diccionario.valores, sumas) if suma}
+
+    def contar_por(self, clave, excluir_estados=('Cancelado',)):
+        """Cantidad de líneas por valor de `clave`."""
+        codigos = self.codigos[clave]
+        mascara = self._mascara(excluir_estados)
+        if numpy is not None:
+            codigos_np = numpy.frombuffer(codigos, dtype=numpy.dtype(codigos.typecode))
+            if mascara is not None:
+                codigos_np = codigos_np[mascara]
+            conteos = numpy.bincount(codigos_np, minlength=len(self.diccionarios[clave])).tolist()
+        else:
+            conteos = [0] * len(self.diccionarios[clave])
+            if mascara is None:
+                for codigo in codigos:
+                    conteos[codigo] += 1
+            else:
+                for codigo, incluir in zip(codigos, mascara):
+                    if incluir:
+                        conteos[codigo] += 1
+        return {valor: conteo for valor, conteo in zip(self.diccionarios[clave].valores, conteos) if conteo}
+
+    def mayores(self, clave, valores='importe', cantidad=10, excluir_estados=('Cancelado',)):
+        """Los `cantidad` valores de `clave` con mayor suma, de mayor a menor."""
+        sumas = self.sumar_por(clave, valores, excluir_estados)
+        return sorted(sumas.items(), key=lambda item: item[1], reverse=True)[:cantidad]
+
+    def tamanos_canasta(self, excluir_estados=('Cancelado',)):
+        """Resumen de las canastas: promedio de líneas y de unidades por pedido."""
+        lineas = self.contar_por('pedido', excluir_estados)
+        unidades = self.sumar_por('pedido', 'cantidad', excluir_estados)
+        pedidos = len(lineas)
+        if not pedidos:
+            return {"pedidos": 0, "lineas_por_pedido": 0.0, "unidades_por_pedido": 0.0, "maximo_lineas": 0}
+        return {
+            "pedidos": pedidos,
+            "lineas_por_pedido": sum(lineas.values()) / pedidos,
+            "unidades_por_pedido": sum(unidades.values()) / pedidos,
+            "maximo_lineas": max(lineas.values()),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Análisis de las líneas de pedido en memoria.")
+    parser.add_argument("--top", type=int, default=10, help="cantidad de productos a mostrar")
+    args = parser.parse_args()
+
+    instantanea = InstantaneaLineas()
+    instantanea.refrescar()
+    print(f"{len(instantanea)} líneas de {len(instantanea.diccionarios['pedido'])} pedidos\n")
+
+    print(f"{'Producto':<10} {'Unidades':<10} {'Importe':<12}")
+    print("-" * 34)
+    unidades = instantanea.sumar_por('producto', 'cantidad')
+    for producto_id, importe in instantanea.mayores('producto', cantidad=args.top):
+        print(f"{producto_id:<10} {unidades.get(producto_id, 0):<10} ${importe:<11.2f}")
+
+    canastas = instantanea.tamanos_canasta()
+    print(f"\nLíneas por pedido: {canastas['lineas_por_pedido']:.2f}")
+    print(f"Unidades por pedido: {canastas['unidades_por_pedido']:.2f}")
+    print(f"Máximo de líneas en un pedido: {canastas['maximo_lineas']}")
+
+
+if __name__ == "__main__":
+    main()
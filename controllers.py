@@ -1,25 +1,119 @@
 import sqlite3
-from database import get_db_connection
-from models import Cliente, Producto, Pedido, DetallePedido
+from database import get_db_connection, normalizar_telefono
+from models import Cliente, Producto, Pedido, PedidoResumido, ResumenCliente, ESTADOS_PEDIDO, agrupar
+from reintentos import BaseDeDatosOcupada, ejecutar_escritura
+import inventario
+from texto import normalizar
 import datetime
+import time
+
+# Segundos que se recuerda una clave de idempotencia (ver PedidoController.crear)
+VIGENCIA_CLAVES_IDEMPOTENCIA = 7 * 24 * 3600
+
+# Las escrituras que agotan los reintentos lanzan reintentos.BaseDeDatosOcupada
+# en lugar de imprimir el error y retornar False/None: el llamador decide si
+# reintentar más tarde
+
+class ConflictoVersion(Exception):
+    """El registro fue modificado o eliminado por otro usuario desde que se leyó."""
+
+class StockInsuficiente(sqlite3.IntegrityError):
+    """Un pedido pide más unidades de las que hay (o el producto no existe)."""
+
+def _rango_prefijo(prefijo):
+    """Retorna los límites (desde, hasta) que cubren los textos que empiezan con el prefijo.
+    
+    Una comparación por rango sobre una columna indexada usa el índice,
+    a diferencia de LIKE con comodín inicial.
+    """
+    return prefijo, prefijo + '\U0010ffff'
+
+def _a_segundos(momento):
+    """Convierte un datetime, una fecha (su medianoche, hora local) o un número a segundos desde 1970."""
+    if isinstance(momento, datetime.datetime):
+        return int(momento.timestamp())
+    if isinstance(momento, datetime.date):
+        return int(datetime.datetime.combine(momento, datetime.time()).timestamp())
+    return int(momento)
+
+def _consultar(cache, sql, parametros, tablas):
+    """Ejecuta una consulta de lectura, usando el cache de resultados si hay uno.
+    
+    `tablas` son las tablas que lee la consulta, para invalidar el cache.
+    """
+    if cache is not None:
+        return cache.consultar(sql, parametros, tablas)
+    conn = get_db_connection()
+    try:
+        return conn.execute(sql, parametros).fetchall()
+    finally:
+        conn.close()
+
+def _condiciones_pagina(columna, prefijo, clave, descendente=False):
+    """Condiciones WHERE de una página ordenada por (columna, id).
+    
+    `prefijo` limita a los valores de la columna que empiezan con él y
+    `clave` es la (columna, id) de la última fila de la página anterior:
+    la página sigue desde ahí recorriendo el índice, en lugar de descartar
+    con OFFSET todas las filas anteriores.
+    """
+    condiciones, parametros = [], []
+    if prefijo:
+        condiciones.append(f'{columna} >= ? AND {columna} < ?')
+        parametros.extend(_rango_prefijo(prefijo))
+    if clave is not None:
+        condiciones.append(f'({columna}, id) {"<" if descendente else ">"} (?, ?)')
+        parametros.extend(clave)
+    where = f'WHERE {" AND ".join(condiciones)}' if condiciones else ''
+    return where, parametros
+
+def _sin_repetir(*grupos):
+    """Une grupos de filas en orden, sin repetir las que tienen el mismo id."""
+    vistos = set()
+    filas = []
+    for grupo in grupos:
+        for row in grupo:
+            if row['id'] not in vistos:
+                vistos.add(row['id'])
+                filas.append(row)
+    return filas
+
+def _patron_contiene(termino):
+    """Patrón LIKE que busca el término en cualquier posición, escapando comodines."""
+    escapado = termino.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escapado}%'
 
 class ClienteController:
     """Controlador para operaciones CRUD de clientes."""
     
+    def __init__(self, indice=None, cache=None, crear_indice=None):
+        # Índice de trigramas opcional (busqueda.IndiceTrigramas) que se
+        # mantiene al día con cada alta, modificación y baja
+        self.indice = indice
+        # Alternativa a `indice`: función que lo construye en la primera
+        # búsqueda por similitud (por ejemplo, IndiceTrigramas.desde_db).
+        # Hasta entonces no hay nada que mantener: se lee todo de la base.
+        self._crear_indice = crear_indice
+        # Cache opcional de listados y búsquedas (cache.CacheConsultas)
+        self.cache = cache
+    
     def crear(self, cliente):
         """Crea un nuevo cliente en la base de datos."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            def trabajo(cursor):
+                cursor.execute(
+                    'INSERT INTO clientes (nombre, email, telefono, direccion) VALUES (?, ?, ?, ?)',
+                    (cliente.nombre, cliente.email, cliente.telefono, cliente.direccion)
+                )
+                return cursor.lastrowid
             
-            cursor.execute(
-                'INSERT INTO clientes (nombre, email, telefono, direccion) VALUES (?, ?, ?, ?)',
-                (cliente.nombre, cliente.email, cliente.telefono, cliente.direccion)
-            )
+            id = ejecutar_escritura(trabajo)
             
-            conn.commit()
-            conn.close()
+            if self.indice is not None:
+                self.indice.agregar(id, cliente)
             return True
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al crear cliente: {e}")
             return False
@@ -39,14 +133,41 @@ class ClienteController:
             print(f"Error al obtener cliente: {e}")
             return None
     
+    def obtener_resumen(self, id):
+        """Obtiene la cantidad de pedidos, el total gastado y las fechas del primer y último pedido.
+        
+        Si el cliente no tiene pedidos retorna un resumen en cero.
+        """
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM resumen_clientes WHERE cliente_id = ?', (id,))
+            row = cursor.fetchone()
+            
+            conn.close()
+            return ResumenCliente.from_db_row(row) if row else ResumenCliente(cliente_id=id)
+        except sqlite3.Error as e:
+            print(f"Error al obtener resumen del cliente: {e}")
+            return None
+    
     def obtener_por_email(self, email):
-        """Obtiene un cliente por su email."""
+        """Obtiene un cliente por su email, sin distinguir acentos ni mayúsculas.
+        
+        El email normalizado es único (idx_clientes_email_norm). En una base
+        migrada con emails que solo difieren en mayúsculas o acentos (ver el
+        aviso de migrar_db) el índice no es único: por eso primero se busca
+        el email exacto.
+        """
         try:
             conn = get_db_connection()
             cursor = conn.cursor()
             
             cursor.execute('SELECT * FROM clientes WHERE email = ?', (email,))
             row = cursor.fetchone()
+            if row is None:
+                cursor.execute('SELECT * FROM clientes WHERE email_norm = ?', (normalizar(email),))
+                row = cursor.fetchone()
             
             conn.close()
             return Cliente.from_db_row(row) if row else None
@@ -57,50 +178,137 @@ class ClienteController:
     def listar_todos(self):
         """Obtiene todos los clientes."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM clientes ORDER BY nombre')
-            rows = cursor.fetchall()
-            
-            conn.close()
+            rows = _consultar(self.cache, 'SELECT * FROM clientes ORDER BY nombre', (), ('clientes',))
             return [Cliente.from_db_row(row) for row in rows]
         except sqlite3.Error as e:
             print(f"Error al listar clientes: {e}")
             return []
     
+    def listar_pagina(self, limite=20, despues=None, filtro=None, saltar=0):
+        """Obtiene una página de clientes ordenados por nombre.
+        
+        `despues` es el último cliente de la página anterior; `saltar`
+        descarta filas con OFFSET y solo se usa para ir directo a una página.
+        `filtro` limita a los clientes cuyo nombre empieza con ese texto.
+        """
+        try:
+            clave = (normalizar(despues.nombre), despues.id) if despues is not None else None
+            where, parametros = _condiciones_pagina('nombre_norm', normalizar(filtro or ''), clave)
+            rows = _consultar(
+                self.cache,
+                f'SELECT * FROM clientes {where} ORDER BY nombre_norm, id LIMIT ? OFFSET ?',
+                (*parametros, limite, saltar), ('clientes',)
+            )
+            return [Cliente.from_db_row(row) for row in rows]
+        except sqlite3.Error as e:
+            print(f"Error al listar clientes: {e}")
+            return []
+    
+    def contar(self, filtro=None):
+        """Cuenta los clientes cuyo nombre empieza con `filtro` (todos si no se indica)."""
+        try:
+            where, parametros = _condiciones_pagina('nombre_norm', normalizar(filtro or ''), None)
+            rows = _consultar(self.cache, f'SELECT COUNT(*) FROM clientes {where}', parametros, ('clientes',))
+            return rows[0][0]
+        except sqlite3.Error as e:
+            print(f"Error al contar clientes: {e}")
+            return 0
+    
     def buscar(self, termino):
-        """Busca clientes por nombre, email o teléfono."""
+        """Busca clientes por nombre, email o teléfono, sin distinguir acentos ni mayúsculas.
+        
+        Primero van las coincidencias por prefijo, que se leen de los
+        índices de las columnas normalizadas, y después las que contienen el
+        término en cualquier otra parte del texto (esta búsqueda recorre la
+        tabla), cada grupo ordenado por nombre.
+        """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            termino_norm = normalizar(termino)
+            digitos = normalizar_telefono(termino)
+            
+            condiciones = ['(nombre_norm >= ? AND nombre_norm < ?)', '(email_norm >= ? AND email_norm < ?)']
+            parametros = [*_rango_prefijo(termino_norm), *_rango_prefijo(termino_norm)]
+            if digitos:
+                condiciones.append('(telefono_norm >= ? AND telefono_norm < ?)')
+                parametros.extend(_rango_prefijo(digitos))
+            prefijos = _consultar(
+                self.cache,
+                f'SELECT * FROM clientes WHERE {" OR ".join(condiciones)} ORDER BY nombre',
+                parametros, ('clientes',)
+            )
             
-            cursor.execute(
-                'SELECT * FROM clientes WHERE nombre LIKE ? OR email LIKE ? OR telefono LIKE ? ORDER BY nombre',
-                (f'%{termino}%', f'%{termino}%', f'%{termino}%')
+            condiciones = ["nombre_norm LIKE ? ESCAPE '\\'", "email_norm LIKE ? ESCAPE '\\'"]
+            patron = _patron_contiene(termino_norm)
+            parametros = [patron, patron]
+            if digitos:
+                condiciones.append("telefono_norm LIKE ? ESCAPE '\\'")
+                parametros.append(_patron_contiene(digitos))
+            contienen = _consultar(
+                self.cache,
+                f'SELECT * FROM clientes WHERE {" OR ".join(condiciones)} ORDER BY nombre',
+                parametros, ('clientes',)
             )
-            rows = cursor.fetchall()
             
-            conn.close()
-            return [Cliente.from_db_row(row) for row in rows]
+            return [Cliente.from_db_row(row) for row in _sin_repetir(prefijos, contienen)]
         except sqlite3.Error as e:
             print(f"Error al buscar clientes: {e}")
             return []
     
-    def actualizar(self, cliente):
-        """Actualiza un cliente existente."""
+    def buscar_similares(self, termino, limite=10):
+        """Busca los clientes más parecidos al término, tolerando errores de tipeo.
+        
+        Usa el índice de trigramas si está disponible (construyéndolo en la
+        primera llamada si se indicó `crear_indice`); si no, recurre a buscar().
+        """
+        if self.indice is None and self._crear_indice is not None:
+            self.indice = self._crear_indice()
+            self._crear_indice = None
+        if self.indice is None:
+            return self.buscar(termino)[:limite]
+        
+        ids = [id for id, _ in self.indice.buscar(termino, limite)]
+        if not ids:
+            return []
+        
         try:
             conn = get_db_connection()
             cursor = conn.cursor()
             
-            cursor.execute(
-                'UPDATE clientes SET nombre = ?, email = ?, telefono = ?, direccion = ? WHERE id = ?',
-                (cliente.nombre, cliente.email, cliente.telefono, cliente.direccion, cliente.id)
-            )
+            marcas = ','.join('?' * len(ids))
+            cursor.execute(f'SELECT * FROM clientes WHERE id IN ({marcas})', ids)
+            por_id = {row['id']: Cliente.from_db_row(row) for row in cursor.fetchall()}
             
-            conn.commit()
             conn.close()
+            # Respetar el orden de similitud del índice
+            return [por_id[id] for id in ids if id in por_id]
+        except sqlite3.Error as e:
+            print(f"Error al buscar clientes similares: {e}")
+            return []
+    
+    def actualizar(self, cliente):
+        """Actualiza un cliente existente.
+        
+        Lanza ConflictoVersion si otro usuario lo modificó desde que se leyó.
+        """
+        try:
+            def trabajo(cursor):
+                # Solo se actualiza si nadie lo modificó desde que se leyó (compare-and-swap)
+                cursor.execute(
+                    'UPDATE clientes SET nombre = ?, email = ?, telefono = ?, direccion = ?, version = version + 1 '
+                    'WHERE id = ? AND version = ?',
+                    (cliente.nombre, cliente.email, cliente.telefono, cliente.direccion, cliente.id, cliente.version)
+                )
+                if cursor.rowcount == 0:
+                    raise ConflictoVersion(f"El cliente {cliente.id} fue modificado o eliminado por otro usuario.")
+            
+            ejecutar_escritura(trabajo)
+            cliente.version += 1
+            
+            if self.indice is not None:
+                self.indice.agregar(cliente.id, cliente)
             return True
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al actualizar cliente: {e}")
             return False
@@ -108,22 +316,25 @@ class ClienteController:
     def eliminar(self, id):
         """Elimina un cliente por su ID."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Verificar si el cliente tiene pedidos asociados
-            cursor.execute('SELECT COUNT(*) FROM pedidos WHERE cliente_id = ?', (id,))
-            count = cursor.fetchone()[0]
-            
-            if count > 0:
-                conn.close()
-                return False  # No se puede eliminar porque tiene pedidos asociados
+            def trabajo(cursor):
+                # Verificar si el cliente tiene pedidos asociados
+                cursor.execute('SELECT cantidad_pedidos FROM resumen_clientes WHERE cliente_id = ?', (id,))
+                row = cursor.fetchone()
+                
+                if row and row['cantidad_pedidos'] > 0:
+                    return False  # No se puede eliminar porque tiene pedidos asociados
+                
+                cursor.execute('DELETE FROM clientes WHERE id = ?', (id,))
+                return True
             
-            cursor.execute('DELETE FROM clientes WHERE id = ?', (id,))
+            if not ejecutar_escritura(trabajo):
+                return False
             
-            conn.commit()
-            conn.close()
+            if self.indice is not None:
+                self.indice.eliminar(id)
             return True
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al eliminar cliente: {e}")
             return False
@@ -132,20 +343,32 @@ class ClienteController:
 class ProductoController:
     """Controlador para operaciones CRUD de productos."""
     
+    def __init__(self, cache=None, catalogo=None):
+        # Cache opcional de listados y búsquedas (cache.CacheConsultas)
+        self.cache = cache
+        # Copia en memoria opcional del catálogo (catalogo.CatalogoEnMemoria):
+        # si está, obtener_por_id, listar_todos y buscar se responden desde ella
+        self.catalogo = catalogo
+    
+    def _sincronizar_catalogo(self):
+        """Lleva a la copia en memoria lo que se acaba de escribir en la base."""
+        if self.catalogo is not None:
+            self.catalogo.sincronizar()
+    
     def crear(self, producto):
         """Crea un nuevo producto en la base de datos."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                'INSERT INTO productos (nombre, descripcion, precio, stock) VALUES (?, ?, ?, ?)',
-                (producto.nombre, producto.descripcion, producto.precio, producto.stock)
-            )
+            def trabajo(cursor):
+                cursor.execute(
+                    'INSERT INTO productos (nombre, descripcion, precio, stock, stock_minimo) VALUES (?, ?, ?, ?, ?)',
+                    (producto.nombre, producto.descripcion, producto.precio, producto.stock, producto.stock_minimo)
+                )
             
-            conn.commit()
-            conn.close()
+            ejecutar_escritura(trabajo)
+            self._sincronizar_catalogo()
             return True
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al crear producto: {e}")
             return False
@@ -153,6 +376,9 @@ class ProductoController:
     def obtener_por_id(self, id):
         """Obtiene un producto por su ID."""
         try:
+            if self.catalogo is not None:
+                return self.catalogo.obtener(id)
+            
             conn = get_db_connection()
             cursor = conn.cursor()
             
@@ -168,50 +394,93 @@ class ProductoController:
     def listar_todos(self):
         """Obtiene todos los productos."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM productos ORDER BY nombre')
-            rows = cursor.fetchall()
-            
-            conn.close()
+            if self.catalogo is not None:
+                return self.catalogo.listar()
+            rows = _consultar(self.cache, 'SELECT * FROM productos ORDER BY nombre', (), ('productos',))
+            return [Producto.from_db_row(row) for row in rows]
+        except sqlite3.Error as e:
+            print(f"Error al listar productos: {e}")
+            return []
+    
+    def listar_pagina(self, limite=20, despues=None, filtro=None, saltar=0):
+        """Obtiene una página de productos ordenados por nombre (ver ClienteController.listar_pagina)."""
+        try:
+            clave = (normalizar(despues.nombre), despues.id) if despues is not None else None
+            where, parametros = _condiciones_pagina('nombre_norm', normalizar(filtro or ''), clave)
+            rows = _consultar(
+                self.cache,
+                f'SELECT * FROM productos {where} ORDER BY nombre_norm, id LIMIT ? OFFSET ?',
+                (*parametros, limite, saltar), ('productos',)
+            )
             return [Producto.from_db_row(row) for row in rows]
         except sqlite3.Error as e:
             print(f"Error al listar productos: {e}")
             return []
     
+    def contar(self, filtro=None):
+        """Cuenta los productos cuyo nombre empieza con `filtro` (todos si no se indica)."""
+        try:
+            where, parametros = _condiciones_pagina('nombre_norm', normalizar(filtro or ''), None)
+            rows = _consultar(self.cache, f'SELECT COUNT(*) FROM productos {where}', parametros, ('productos',))
+            return rows[0][0]
+        except sqlite3.Error as e:
+            print(f"Error al contar productos: {e}")
+            return 0
+    
     def buscar(self, termino):
-        """Busca productos por nombre o descripción."""
+        """Busca productos por nombre o descripción, sin distinguir acentos ni mayúsculas.
+        
+        Igual que ClienteController.buscar: primero las coincidencias por
+        prefijo del nombre (indexado) y después las que contienen el término
+        en otra parte del nombre o en la descripción.
+        """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            if self.catalogo is not None:
+                return self.catalogo.buscar(termino)
+            
+            termino_norm = normalizar(termino)
+            prefijos = _consultar(
+                self.cache,
+                'SELECT * FROM productos WHERE nombre_norm >= ? AND nombre_norm < ? ORDER BY nombre',
+                _rango_prefijo(termino_norm), ('productos',)
+            )
             
-            cursor.execute(
-                'SELECT * FROM productos WHERE nombre LIKE ? OR descripcion LIKE ? ORDER BY nombre',
-                (f'%{termino}%', f'%{termino}%')
+            patron = _patron_contiene(termino_norm)
+            contienen = _consultar(
+                self.cache,
+                "SELECT * FROM productos WHERE nombre_norm LIKE ? ESCAPE '\\' OR descripcion_norm LIKE ? ESCAPE '\\' ORDER BY nombre",
+                (patron, patron), ('productos',)
             )
-            rows = cursor.fetchall()
             
-            conn.close()
-            return [Producto.from_db_row(row) for row in rows]
+            return [Producto.from_db_row(row) for row in _sin_repetir(prefijos, contienen)]
         except sqlite3.Error as e:
             print(f"Error al buscar productos: {e}")
             return []
     
     def actualizar(self, producto):
-        """Actualiza un producto existente."""
+        """Actualiza un producto existente.
+        
+        Lanza ConflictoVersion si otro usuario (o un pedido, al descontar
+        stock) lo modificó desde que se leyó.
+        """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                'UPDATE productos SET nombre = ?, descripcion = ?, precio = ?, stock = ? WHERE id = ?',
-                (producto.nombre, producto.descripcion, producto.precio, producto.stock, producto.id)
-            )
+            def trabajo(cursor):
+                # Solo se actualiza si nadie lo modificó desde que se leyó (compare-and-swap)
+                cursor.execute(
+                    'UPDATE productos SET nombre = ?, descripcion = ?, precio = ?, stock = ?, stock_minimo = ?, '
+                    'version = version + 1 WHERE id = ? AND version = ?',
+                    (producto.nombre, producto.descripcion, producto.precio, producto.stock, producto.stock_minimo,
+                     producto.id, producto.version)
+                )
+                if cursor.rowcount == 0:
+                    raise ConflictoVersion(f"El producto {producto.id} fue modificado o eliminado por otro usuario.")
             
-            conn.commit()
-            conn.close()
+            ejecutar_escritura(trabajo)
+            producto.version += 1
+            self._sincronizar_catalogo()
             return True
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al actualizar producto: {e}")
             return False
@@ -219,207 +488,406 @@ class ProductoController:
     def eliminar(self, id):
         """Elimina un producto por su ID."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Verificar si el producto está en algún pedido
-            cursor.execute('SELECT COUNT(*) FROM detalles_pedido WHERE producto_id = ?', (id,))
-            count = cursor.fetchone()[0]
-            
-            if count > 0:
-                conn.close()
-                return False  # No se puede eliminar porque está en pedidos
-            
-            cursor.execute('DELETE FROM productos WHERE id = ?', (id,))
-            
-            conn.commit()
-            conn.close()
-            return True
+            def trabajo(cursor):
+                # Verificar si el producto está en algún pedido
+                cursor.execute('SELECT COUNT(*) FROM detalles_pedido WHERE producto_id = ?', (id,))
+                count = cursor.fetchone()[0]
+                
+                if count > 0:
+                    return False  # No se puede eliminar porque está en pedidos
+                
+                cursor.execute('DELETE FROM productos WHERE id = ?', (id,))
+                return True
+            
+            eliminado = ejecutar_escritura(trabajo)
+            self._sincronizar_catalogo()
+            return eliminado
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al eliminar producto: {e}")
             return False
     
     def actualizar_stock(self, id, cantidad):
-        """Actualiza el stock de un producto."""
+        """Actualiza el stock de un producto.
+        
+        Si el cambio deja el stock en el mínimo o por debajo, avisa a los
+        suscriptores de inventario.
+        """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('UPDATE productos SET stock = stock + ? WHERE id = ?', (cantidad, id))
+            def trabajo(cursor):
+                cursor.execute(
+                    'UPDATE productos SET stock = stock + ?, version = version + 1 WHERE id = ? RETURNING *', (cantidad, id)
+                )
+                row = cursor.fetchone()
+                return Producto.from_db_row(row) if row else None
             
-            conn.commit()
-            conn.close()
+            producto = ejecutar_escritura(trabajo)
+            self._sincronizar_catalogo()
+            if producto is not None and inventario.cruzo_minimo(producto, -cantidad):
+                inventario.notificar([producto])
             return True
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al actualizar stock: {e}")
             return False
+    
+    def listar_a_reponer(self):
+        """Obtiene los productos con stock en el mínimo o por debajo, los más faltantes primero.
+        
+        La condición coincide con la del índice parcial idx_productos_reponer.
+        """
+        try:
+            rows = _consultar(
+                self.cache,
+                'SELECT * FROM productos WHERE stock <= stock_minimo ORDER BY stock - stock_minimo',
+                (), ('productos',)
+            )
+            return [Producto.from_db_row(row) for row in rows]
+        except sqlite3.Error as e:
+            print(f"Error al listar productos a reponer: {e}")
+            return []
 
 
 class PedidoController:
     """Controlador para operaciones CRUD de pedidos."""
     
-    def crear(self, pedido, detalles):
-        """Crea un nuevo pedido con sus detalles."""
+    def __init__(self, cache=None):
+        # Cache opcional de listados (cache.CacheConsultas)
+        self.cache = cache
+    
+    def crear(self, pedido, detalles, clave_idempotencia=None, carrito=None):
+        """Crea un nuevo pedido con sus detalles.
+        
+        Después de confirmarlo avisa a los suscriptores de inventario si
+        algún producto quedó en su stock mínimo o por debajo.
+        
+        `clave_idempotencia` es un identificador elegido por quien envía el
+        pedido (por ejemplo, un UUID por compra). Si ya se creó un pedido
+        con esa clave, no se vuelve a crear ni a descontar stock: se retorna
+        el ID del pedido original. Así un envío que se reintenta porque no
+        llegó la respuesta no duplica el pedido. Las claves se recuerdan
+        durante VIGENCIA_CLAVES_IDEMPOTENCIA segundos.
+        
+        `carrito` es la clave de un reservas.Carrito: el pedido puede usar
+        las unidades que ese carrito tiene reservadas, y las reservas se
+        eliminan al confirmarlo.
+        """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Insertar el pedido
-            cursor.execute(
-                'INSERT INTO pedidos (cliente_id, fecha, estado, total) VALUES (?, ?, ?, ?)',
-                (pedido.cliente_id, pedido.fecha, pedido.estado, pedido.total)
-            )
-            
-            # Obtener el ID del pedido recién insertado
-            pedido_id = cursor.lastrowid
-            
-            # Insertar los detalles del pedido
-            for detalle in detalles:
-                cursor.execute(
-                    'INSERT INTO detalles_pedido (pedido_id, producto_id, cantidad, precio_unitario) VALUES (?, ?, ?, ?)',
-                    (pedido_id, detalle.producto_id, detalle.cantidad, detalle.precio_unitario)
-                )
-                
-                # Actualizar el stock del producto
-                cursor.execute(
-                    'UPDATE productos SET stock = stock - ? WHERE id = ?',
-                    (detalle.cantidad, detalle.producto_id)
-                )
-            
-            conn.commit()
-            conn.close()
+            alertas = []
+            
+            def trabajo(cursor):
+                alertas.clear()  # Un reintento vuelve a empezar
+                if clave_idempotencia is not None:
+                    existente = self.pedido_por_clave(cursor, clave_idempotencia)
+                    if existente is not None:
+                        return existente
+                return self.insertar(cursor, pedido, detalles, alertas, clave_idempotencia, carrito)
+            
+            pedido_id = ejecutar_escritura(trabajo)
+            inventario.notificar(alertas)
             return pedido_id
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al crear pedido: {e}")
             return None
     
+    def pedido_por_clave(self, cursor, clave):
+        """ID del pedido creado con la clave de idempotencia `clave`, o None."""
+        cursor.execute('SELECT pedido_id FROM claves_idempotencia WHERE clave = ?', (clave,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def insertar(self, cursor, pedido, detalles, alertas=None, clave_idempotencia=None, carrito=None):
+        """Inserta un pedido con sus detalles usando un cursor existente.
+        
+        No confirma la transacción: el llamador decide cuándo hacer commit,
+        lo que permite agrupar varios pedidos en una sola transacción.
+        Si se pasa la lista `alertas`, se le agregan los productos que
+        quedaron en su stock mínimo o por debajo, para avisar después del
+        commit (inventario.notificar). Retorna el ID del pedido insertado.
+        
+        Lanza StockInsuficiente si algún producto no tiene las unidades
+        pedidas sin contar las reservadas por otros carritos (las del
+        `carrito` indicado sí se pueden usar, y se eliminan); el llamador
+        debe deshacer la transacción (o el SAVEPOINT).
+        Con `clave_idempotencia` registra la clave del pedido; si la clave
+        ya existe lanza sqlite3.IntegrityError (ver pedido_por_clave).
+        """
+        # Insertar el pedido
+        # Sin momento de creación se usa la medianoche (hora local) de la fecha
+        cursor.execute(
+            '''
+            INSERT INTO pedidos (cliente_id, fecha, estado, total, creado)
+            VALUES (?, ?, ?, ?, COALESCE(?, CAST(strftime('%s', ?, 'utc') AS INTEGER)))
+            ''',
+            (pedido.cliente_id, pedido.fecha, pedido.estado, pedido.total, pedido.creado, pedido.fecha)
+        )
+        
+        # Obtener el ID del pedido recién insertado
+        pedido_id = cursor.lastrowid
+        ahora = int(time.time())
+        
+        # Insertar los detalles del pedido
+        bajo_minimo = []
+        for detalle in detalles:
+            cursor.execute(
+                'INSERT INTO detalles_pedido (pedido_id, producto_id, cantidad, precio_unitario) VALUES (?, ?, ?, ?)',
+                (pedido_id, detalle.producto_id, detalle.cantidad, detalle.precio_unitario)
+            )
+            
+            # Actualizar el stock del producto. La condición se evalúa dentro
+            # de la transacción de escritura, así que dos pedidos simultáneos
+            # no pueden vender las mismas unidades, ni las reservadas por
+            # otros carritos
+            cursor.execute(
+                '''
+                UPDATE productos SET stock = stock - ?, version = version + 1
+                WHERE id = ? AND stock - (
+                    SELECT TOTAL(cantidad) FROM reservas
+                    WHERE producto_id = productos.id AND vence > ? AND carrito IS NOT ?
+                ) >= ?
+                RETURNING *
+                ''',
+                (detalle.cantidad, detalle.producto_id, ahora, carrito, detalle.cantidad)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise StockInsuficiente(f"stock insuficiente para el producto {detalle.producto_id}")
+            if row['stock'] <= row['stock_minimo']:
+                producto = Producto.from_db_row(row)
+                if inventario.cruzo_minimo(producto, detalle.cantidad):
+                    bajo_minimo.append(producto)
+        
+        if clave_idempotencia is not None:
+            cursor.execute(
+                'INSERT INTO claves_idempotencia (clave, pedido_id, creada) VALUES (?, ?, ?)',
+                (clave_idempotencia, pedido_id, ahora)
+            )
+        if carrito is not None:
+            # Las unidades reservadas ya se descontaron del stock
+            cursor.execute('DELETE FROM reservas WHERE carrito = ?', (carrito,))
+        
+        # Se agregan al final, cuando ya no puede fallar ninguna sentencia del pedido
+        if alertas is not None:
+            alertas.extend(bajo_minimo)
+        return pedido_id
+    
     def obtener_por_id(self, id):
-        """Obtiene un pedido por su ID, incluyendo cliente y detalles."""
+        """Obtiene un pedido por su ID.
+        
+        El cliente, los detalles y sus productos se cargan al accederlos por
+        primera vez, con una consulta por relación (no una por detalle).
+        """
         try:
             conn = get_db_connection()
             cursor = conn.cursor()
             
-            # Obtener el pedido
             cursor.execute('SELECT * FROM pedidos WHERE id = ?', (id,))
             row_pedido = cursor.fetchone()
             
-            if not row_pedido:
-                conn.close()
-                return None
-            
-            # Obtener el cliente del pedido
-            cursor.execute('SELECT * FROM clientes WHERE id = ?', (row_pedido['cliente_id'],))
-            row_cliente = cursor.fetchone()
-            cliente = Cliente.from_db_row(row_cliente) if row_cliente else None
-            
-            # Crear el objeto pedido
-            pedido = Pedido.from_db_row(row_pedido, cliente)
-            
-            # Obtener los detalles del pedido
-            cursor.execute('SELECT * FROM detalles_pedido WHERE pedido_id = ?', (id,))
-            rows_detalles = cursor.fetchall()
-            
-            detalles = []
-            for row_detalle in rows_detalles:
-                # Obtener el producto del detalle
-                cursor.execute('SELECT * FROM productos WHERE id = ?', (row_detalle['producto_id'],))
-                row_producto = cursor.fetchone()
-                producto = Producto.from_db_row(row_producto) if row_producto else None
-                
-                detalle = DetallePedido.from_db_row(row_detalle, producto)
-                detalles.append(detalle)
-            
-            pedido.detalles = detalles
-            
             conn.close()
-            return pedido
+            return Pedido.from_db_row(row_pedido) if row_pedido else None
         except sqlite3.Error as e:
             print(f"Error al obtener pedido: {e}")
             return None
     
     def listar_todos(self):
-        """Obtiene todos los pedidos con información básica."""
+        """Obtiene todos los pedidos con información básica.
+        
+        Los clientes se cargan en bloque para todo el listado solo si se
+        accede a `pedido.cliente`.
+        """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT p.*, c.nombre as cliente_nombre 
-                FROM pedidos p 
-                JOIN clientes c ON p.cliente_id = c.id 
-                ORDER BY p.fecha DESC
-            ''')
-            rows = cursor.fetchall()
-            
-            pedidos = []
-            for row in rows:
-                cliente = Cliente(id=row['cliente_id'], nombre=row['cliente_nombre'])
-                pedido = Pedido.from_db_row(row, cliente)
-                pedidos.append(pedido)
-            
-            conn.close()
-            return pedidos
+            rows = _consultar(self.cache, 'SELECT * FROM pedidos ORDER BY creado DESC, id DESC', (), ('pedidos',))
+            return agrupar(Pedido.from_db_row(row) for row in rows)
         except sqlite3.Error as e:
             print(f"Error al listar pedidos: {e}")
             return []
     
-    def listar_por_cliente(self, cliente_id):
-        """Obtiene todos los pedidos de un cliente."""
+    def _condiciones_estado(self, filtro, clave):
+        """Condiciones de una página de pedidos, del más reciente al más antiguo.
+        
+        `filtro` se compara con el comienzo del estado, sin distinguir
+        acentos ni mayúsculas ("pend" -> Pendiente).
+        """
+        where, parametros = _condiciones_pagina('creado', None, clave, descendente=True)
+        if filtro:
+            estados = [estado for estado in ESTADOS_PEDIDO if normalizar(estado).startswith(normalizar(filtro))]
+            condicion = f'estado IN ({",".join("?" * len(estados))})' if estados else '0'
+            where = f'{where} AND {condicion}' if where else f'WHERE {condicion}'
+            parametros.extend(estados)
+        return where, parametros
+    
+    def listar_pagina(self, limite=20, despues=None, filtro=None, saltar=0):
+        """Obtiene una página de pedidos, del más reciente al más antiguo.
+        
+        `despues` es el último pedido de la página anterior y `filtro` el
+        comienzo de un estado. Los clientes de la página se cargan en una
+        sola consulta si se accede a `pedido.cliente`.
+        """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT p.*, c.nombre as cliente_nombre 
-                FROM pedidos p 
-                JOIN clientes c ON p.cliente_id = c.id 
-                WHERE p.cliente_id = ? 
-                ORDER BY p.fecha DESC
-            ''', (cliente_id,))
-            rows = cursor.fetchall()
-            
-            pedidos = []
-            for row in rows:
-                cliente = Cliente(id=row['cliente_id'], nombre=row['cliente_nombre'])
-                pedido = Pedido.from_db_row(row, cliente)
-                pedidos.append(pedido)
-            
-            conn.close()
-            return pedidos
+            clave = (despues.creado, despues.id) if despues is not None else None
+            where, parametros = self._condiciones_estado(filtro, clave)
+            rows = _consultar(
+                self.cache,
+                f'SELECT * FROM pedidos {where} ORDER BY creado DESC, id DESC LIMIT ? OFFSET ?',
+                (*parametros, limite, saltar), ('pedidos',)
+            )
+            return agrupar(Pedido.from_db_row(row) for row in rows)
+        except sqlite3.Error as e:
+            print(f"Error al listar pedidos: {e}")
+            return []
+    
+    def contar(self, filtro=None):
+        """Cuenta los pedidos cuyo estado empieza con `filtro` (todos si no se indica)."""
+        try:
+            where, parametros = self._condiciones_estado(filtro, None)
+            rows = _consultar(self.cache, f'SELECT COUNT(*) FROM pedidos {where}', parametros, ('pedidos',))
+            return rows[0][0]
+        except sqlite3.Error as e:
+            print(f"Error al contar pedidos: {e}")
+            return 0
+    
+    def listar_por_cliente(self, cliente_id, limite=-1):
+        """Obtiene los pedidos de un cliente, del más reciente al más antiguo.
+        
+        `limite` acota la cantidad de pedidos (por defecto, todos).
+        """
+        try:
+            rows = _consultar(
+                self.cache, 'SELECT * FROM pedidos WHERE cliente_id = ? ORDER BY fecha DESC LIMIT ?',
+                (cliente_id, limite), ('pedidos',)
+            )
+            return agrupar(Pedido.from_db_row(row) for row in rows)
         except sqlite3.Error as e:
             print(f"Error al listar pedidos por cliente: {e}")
             return []
     
-    def actualizar(self, pedido):
-        """Actualiza un pedido existente en la base de datos."""
+    def listar_resumen(self, cliente_id=None, desde=None, hasta=None, estados=None, limite=-1):
+        """Obtiene pedidos con la cantidad de líneas, unidades y productos y el total de sus líneas.
+        
+        Todo sale de una sola consulta agrupada, del más reciente al más
+        antiguo. Filtros opcionales: cliente, rango de fechas (`desde`
+        inclusive, `hasta` exclusive, en formato YYYY-MM-DD) y lista de
+        estados. Retorna objetos PedidoResumido.
+        """
         try:
-            conn = sqlite3.connect('techlab.db')
-            cursor = conn.cursor()
-            
-            # Actualizar el pedido
-            cursor.execute(
-                "UPDATE pedidos SET estado = ? WHERE id = ?",
-                (pedido.estado, pedido.id)
+            condiciones, parametros = [], []
+            if cliente_id is not None:
+                condiciones.append('p.cliente_id = ?')
+                parametros.append(cliente_id)
+            if desde:
+                condiciones.append('p.fecha >= ?')
+                parametros.append(desde)
+            if hasta:
+                condiciones.append('p.fecha < ?')
+                parametros.append(hasta)
+            if estados is not None:
+                estados = list(estados)
+                condiciones.append(f'p.estado IN ({",".join("?" * len(estados))})' if estados else '0')
+                parametros.extend(estados)
+            where = f'WHERE {" AND ".join(condiciones)}' if condiciones else ''
+            
+            # Agrupar por (fecha, id) en lugar de solo id permite recorrer los
+            # pedidos en el orden del índice por fecha, sin ordenar al final
+            rows = _consultar(
+                self.cache,
+                f'''
+                SELECT p.*, COUNT(d.pedido_id) AS cantidad_lineas, TOTAL(d.cantidad) AS cantidad_unidades,
+                       COUNT(DISTINCT d.producto_id) AS productos_distintos,
+                       TOTAL(d.cantidad * d.precio_unitario) AS total_calculado
+                FROM pedidos p LEFT JOIN detalles_pedido d ON d.pedido_id = p.id
+                {where}
+                GROUP BY p.fecha, p.id
+                ORDER BY p.fecha DESC, p.id DESC
+                LIMIT ?
+                ''',
+                (*parametros, limite), ('pedidos', 'detalles_pedido')
+            )
+            return agrupar(PedidoResumido.from_db_row(row) for row in rows)
+        except sqlite3.Error as e:
+            print(f"Error al listar resumen de pedidos: {e}")
+            return []
+    
+    def _condiciones_intervalo(self, desde, hasta, clave=None):
+        where, parametros = _condiciones_pagina('creado', None, clave, descendente=True)
+        condiciones = [where[len('WHERE '):]] if where else []
+        if desde is not None:
+            condiciones.append('creado >= ?')
+            parametros.append(_a_segundos(desde))
+        if hasta is not None:
+            condiciones.append('creado < ?')
+            parametros.append(_a_segundos(hasta))
+        return (f'WHERE {" AND ".join(condiciones)}' if condiciones else ''), parametros
+    
+    def listar_intervalo(self, desde=None, hasta=None, limite=-1, despues=None):
+        """Obtiene los pedidos creados en [desde, hasta), del más reciente al más antiguo.
+        
+        `desde` y `hasta` pueden ser datetime (con hora), date (desde su
+        medianoche) o segundos desde 1970; cualquiera de los dos puede
+        omitirse. `despues` es el último pedido de la página anterior. El
+        rango y el orden salen del índice por momento de creación.
+        """
+        try:
+            clave = (despues.creado, despues.id) if despues is not None else None
+            where, parametros = self._condiciones_intervalo(desde, hasta, clave)
+            rows = _consultar(
+                self.cache,
+                f'SELECT * FROM pedidos {where} ORDER BY creado DESC, id DESC LIMIT ?',
+                (*parametros, limite), ('pedidos',)
             )
+            return agrupar(Pedido.from_db_row(row) for row in rows)
+        except sqlite3.Error as e:
+            print(f"Error al listar pedidos por intervalo: {e}")
+            return []
+    
+    def contar_intervalo(self, desde=None, hasta=None):
+        """Cuenta los pedidos creados en [desde, hasta) (solo lee el índice)."""
+        try:
+            where, parametros = self._condiciones_intervalo(desde, hasta)
+            rows = _consultar(self.cache, f'SELECT COUNT(*) FROM pedidos {where}', parametros, ('pedidos',))
+            return rows[0][0]
+        except sqlite3.Error as e:
+            print(f"Error al contar pedidos por intervalo: {e}")
+            return 0
+    
+    def actualizar(self, pedido):
+        """Actualiza un pedido existente en la base de datos.
+        
+        Lanza ConflictoVersion si otro usuario lo modificó desde que se leyó.
+        """
+        try:
+            def trabajo(cursor):
+                # Actualizar el pedido solo si nadie lo modificó desde que se leyó
+                cursor.execute(
+                    "UPDATE pedidos SET estado = ?, version = version + 1 WHERE id = ? AND version = ?",
+                    (pedido.estado, pedido.id, pedido.version)
+                )
+                if cursor.rowcount == 0:
+                    raise ConflictoVersion(f"El pedido {pedido.id} fue modificado o eliminado por otro usuario.")
             
-            conn.commit()
-            conn.close()
+            ejecutar_escritura(trabajo)
+            pedido.version += 1
             return True
-        except Exception as e:
+        except BaseDeDatosOcupada:
+            raise
+        except sqlite3.Error as e:
             print(f"Error al actualizar pedido: {e}")
             return False
     
     def actualizar_estado(self, id, estado):
         """Actualiza el estado de un pedido."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            def trabajo(cursor):
+                cursor.execute('UPDATE pedidos SET estado = ?, version = version + 1 WHERE id = ?', (estado, id))
             
-            cursor.execute('UPDATE pedidos SET estado = ? WHERE id = ?', (estado, id))
-            
-            conn.commit()
-            conn.close()
+            ejecutar_escritura(trabajo)
             return True
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al actualizar estado del pedido: {e}")
             return False
@@ -427,29 +895,108 @@ class PedidoController:
     def eliminar(self, id):
         """Elimina un pedido y sus detalles, y restaura el stock de productos."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Obtener los detalles del pedido para restaurar el stock
-            cursor.execute('SELECT producto_id, cantidad FROM detalles_pedido WHERE pedido_id = ?', (id,))
-            detalles = cursor.fetchall()
-            
-            # Restaurar el stock de cada producto
-            for detalle in detalles:
-                cursor.execute(
-                    'UPDATE productos SET stock = stock + ? WHERE id = ?',
-                    (detalle['cantidad'], detalle['producto_id'])
-                )
-            
-            # Eliminar los detalles del pedido
-            cursor.execute('DELETE FROM detalles_pedido WHERE pedido_id = ?', (id,))
-            
-            # Eliminar el pedido
-            cursor.execute('DELETE FROM pedidos WHERE id = ?', (id,))
-            
-            conn.commit()
-            conn.close()
+            ejecutar_escritura(lambda cursor: self._eliminar_lote(cursor, [id]))
             return True
+        except BaseDeDatosOcupada:
+            raise
         except sqlite3.Error as e:
             print(f"Error al eliminar pedido: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def _eliminar_lote(self, cursor, ids, restaurar_stock=True):
+        """Elimina los pedidos `ids` dentro de la transacción de `cursor`.
+        
+        El stock se restaura con un solo UPDATE que suma las cantidades por
+        producto, y los detalles y las claves de idempotencia se borran junto
+        con los pedidos por el ON DELETE CASCADE de sus tablas. Retorna
+        (pedidos, detalles, unidades).
+        """
+        marcas = ','.join('?' * len(ids))
+        cursor.execute(
+            f'SELECT COUNT(*), TOTAL(cantidad) FROM detalles_pedido WHERE pedido_id IN ({marcas})', ids
+        )
+        detalles, unidades = cursor.fetchone()
+        if restaurar_stock and detalles:
+            cursor.execute(f'''
+                UPDATE productos SET stock = stock + devueltos.cantidad, version = version + 1
+                FROM (
+                    SELECT producto_id, SUM(cantidad) AS cantidad FROM detalles_pedido
+                    WHERE pedido_id IN ({marcas}) GROUP BY producto_id
+                ) AS devueltos
+                WHERE productos.id = devueltos.producto_id
+            ''', ids)
+        cursor.execute(f'DELETE FROM pedidos WHERE id IN ({marcas})', ids)
+        return cursor.rowcount, detalles, int(unidades) if restaurar_stock else 0
+    
+    def eliminar_masivo(self, ids=None, desde=None, hasta=None, estados=None, restaurar_stock=True, tamano_lote=500):
+        """Elimina muchos pedidos a la vez, en transacciones de a `tamano_lote` pedidos.
+        
+        Los pedidos se eligen por lista de IDs, rango de fechas (`desde`
+        inclusive, `hasta` exclusive) y lista de estados; los criterios
+        indicados se combinan. Cada lote es una transacción corta, así que
+        la escritura no bloquea a los demás usuarios durante toda la purga;
+        si se interrumpe, los lotes ya confirmados quedan eliminados.
+        Con `restaurar_stock=False` no se devuelve el stock (por ejemplo,
+        al purgar pedidos entregados antiguos).
+        
+        Retorna un diccionario con la cantidad de pedidos, detalles,
+        unidades restauradas y lotes, o None si hubo un error.
+        """
+        if ids is None and not desde and not hasta and estados is None:
+            raise ValueError("Indique los pedidos a eliminar (IDs, fechas o estados).")
+        
+        condiciones, parametros = [], []
+        if desde:
+            condiciones.append('fecha >= ?')
+            parametros.append(desde)
+        if hasta:
+            condiciones.append('fecha < ?')
+            parametros.append(hasta)
+        if estados is not None:
+            estados = list(estados)
+            condiciones.append(f'estado IN ({",".join("?" * len(estados))})' if estados else '0')
+            parametros.extend(estados)
+        
+        def lotes():
+            # Con lista de IDs, cada lote toma un tramo de la lista; si no, los
+            # pedidos se recorren por ID desde el último eliminado
+            if ids is not None:
+                pendientes = sorted(set(ids))
+                for inicio in range(0, len(pendientes), tamano_lote):
+                    bloque = pendientes[inicio:inicio + tamano_lote]
+                    yield [f'id IN ({",".join("?" * len(bloque))})', *condiciones], [*bloque, *parametros]
+            else:
+                while True:
+                    yield ['id > ?', *condiciones], [ultimo, *parametros]
+        
+        totales = {"pedidos": 0, "detalles": 0, "unidades_restauradas": 0, "lotes": 0}
+        ultimo = 0
+        try:
+            for filtro, valores in lotes():
+                def trabajo(cursor):
+                    # Los pedidos se eligen dentro de la misma transacción que los elimina
+                    cursor.execute(
+                        f'SELECT id FROM pedidos WHERE {" AND ".join(filtro)} ORDER BY id LIMIT ?',
+                        (*valores, tamano_lote)
+                    )
+                    elegidos = [row['id'] for row in cursor.fetchall()]
+                    if not elegidos:
+                        return None
+                    return elegidos[-1], self._eliminar_lote(cursor, elegidos, restaurar_stock)
+                
+                resultado = ejecutar_escritura(trabajo)
+                if resultado is None:
+                    if ids is None:
+                        break
+                    continue
+                ultimo, (pedidos, detalles, unidades) = resultado
+                totales["pedidos"] += pedidos
+                totales["detalles"] += detalles
+                totales["unidades_restauradas"] += unidades
+                totales["lotes"] += 1
+            return totales
+        except BaseDeDatosOcupada:
+            raise
+        except sqlite3.Error as e:
+            print(f"Error al eliminar pedidos: {e}")
+            return None
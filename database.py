@@ -1,17 +1,280 @@
 import sqlite3
 import os
+import threading
+import uuid
+from texto import normalizar
 
-def get_db_connection():
-    """Establece y retorna una conexión a la base de datos."""
-    conn = sqlite3.connect('techlab.db')
+def normalizar_telefono(telefono):
+    """Deja solo los dígitos de un teléfono."""
+    if telefono is None:
+        return ""
+    return ''.join(c for c in str(telefono) if c.isdigit())
+
+# Función opcional que recibe cada sentencia SQL de las conexiones nuevas
+# (la usa verificar_planes.py para revisar los planes de consulta)
+_traza = None
+
+def registrar_traza(funcion):
+    """Hace que las conexiones que se abran pasen cada sentencia a `funcion` (None la desactiva)."""
+    global _traza
+    _traza = funcion
+
+# Ubicación de la base. TECHLAB_DB cambia el archivo (por defecto,
+# techlab.db en el directorio actual) y TECHLAB_BACKEND=memoria usa una
+# base en memoria en lugar del archivo
+RUTA_DB = os.environ.get('TECHLAB_DB', 'techlab.db')
+
+class BackendSQLite:
+    """Almacenamiento en un archivo SQLite."""
+    
+    def __init__(self, ruta=None):
+        self.ruta = ruta or RUTA_DB
+    
+    def conectar(self, check_same_thread=True):
+        return sqlite3.connect(self.ruta, check_same_thread=check_same_thread)
+    
+    def existe(self):
+        """True si la base ya fue creada (si no, hay que llamar a init_db)."""
+        return os.path.exists(self.ruta)
+    
+    def cerrar(self):
+        pass
+    
+    def __repr__(self):
+        return f"BackendSQLite({self.ruta!r})"
+
+class BackendMemoria(BackendSQLite):
+    """Almacenamiento en memoria, para pruebas y simulaciones cortas.
+    
+    Usa el VFS memdb de SQLite: todas las conexiones del proceso que usan
+    el mismo nombre ven la misma base, con el mismo esquema, triggers y
+    transacciones que el archivo, pero sin escribir a disco. El contenido
+    se pierde al llamar a `cerrar` o al terminar el proceso, y no es
+    visible desde otros procesos. Sin nombre, cada instancia es una base
+    nueva e independiente.
+    """
+    
+    def __init__(self, nombre=None):
+        self.nombre = nombre or uuid.uuid4().hex
+        self.ruta = f'file:/{self.nombre}?vfs=memdb'
+        self._ancla = None
+        self._lock = threading.Lock()
+    
+    def conectar(self, check_same_thread=True):
+        # memdb libera la base cuando se cierra su última conexión: la
+        # conexión ancla la mantiene viva entre una operación y otra
+        with self._lock:
+            if self._ancla is None:
+                self._ancla = sqlite3.connect(self.ruta, uri=True, check_same_thread=False)
+        return sqlite3.connect(self.ruta, uri=True, check_same_thread=check_same_thread)
+    
+    def existe(self):
+        with self._lock:
+            if self._ancla is None:
+                return False
+            return self._ancla.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clientes'"
+            ).fetchone() is not None
+    
+    def cerrar(self):
+        """Descarta la base (las conexiones abiertas siguen viéndola hasta cerrarse)."""
+        with self._lock:
+            if self._ancla is not None:
+                self._ancla.close()
+                self._ancla = None
+    
+    def __repr__(self):
+        return f"BackendMemoria({self.nombre!r})"
+
+BACKENDS = {'sqlite': BackendSQLite, 'memoria': BackendMemoria}
+
+_backend = None
+
+def backend_actual():
+    """Retorna el almacenamiento que usan las conexiones sin ruta explícita."""
+    global _backend
+    if _backend is None:
+        nombre = os.environ.get('TECHLAB_BACKEND', 'sqlite')
+        if nombre not in BACKENDS:
+            raise ValueError(f"TECHLAB_BACKEND desconocido: {nombre} (opciones: {', '.join(BACKENDS)})")
+        _backend = BACKENDS[nombre]()
+    return _backend
+
+def usar_backend(backend):
+    """Cambia el almacenamiento de las conexiones nuevas. Retorna el anterior (para restaurarlo)."""
+    global _backend
+    anterior = _backend
+    _backend = backend
+    return anterior
+
+def get_db_connection(check_same_thread=True, ruta=None):
+    """Establece y retorna una conexión a la base de datos.
+    
+    Sin `ruta`, se conecta al almacenamiento configurado (ver backend_actual).
+    """
+    if ruta is None:
+        conn = backend_actual().conectar(check_same_thread)
+    else:
+        conn = sqlite3.connect(ruta, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
+    # Funciones usadas por los triggers que mantienen las columnas normalizadas
+    conn.create_function('normalizar', 1, normalizar, deterministic=True)
+    conn.create_function('normalizar_telefono', 1, normalizar_telefono, deterministic=True)
+    # SQLite no verifica las claves foráneas (ni aplica ON DELETE CASCADE)
+    # si no se activan en cada conexión
+    conn.execute('PRAGMA foreign_keys = ON')
+    if _traza is not None:
+        conn.set_trace_callback(_traza)
     return conn
 
+def _columnas(cursor, tabla):
+    cursor.execute(f'PRAGMA table_info({tabla})')
+    return {row[1] for row in cursor.fetchall()}
+
+def _agregar_columna(cursor, tabla, columna, definicion):
+    """Agrega una columna si todavía no existe. Retorna True si la agregó."""
+    if columna in _columnas(cursor, tabla):
+        return False
+    cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}')
+    return True
+
+def _detalles_en_cascada(conn):
+    """Reconstruye detalles_pedido para que sus filas se borren junto con el pedido.
+    
+    SQLite no permite cambiar una clave foránea con ALTER TABLE: se crea la
+    tabla nueva, se copian las filas y se reemplaza la anterior, con las
+    claves foráneas desactivadas (procedimiento recomendado por SQLite).
+    Los índices y triggers de la tabla se vuelven a crear más adelante en
+    migrar_db. No hace nada si la tabla ya tiene ON DELETE CASCADE.
+    """
+    claves = conn.execute('PRAGMA foreign_key_list(detalles_pedido)').fetchall()
+    if any(clave['table'] == 'pedidos' and clave['on_delete'] == 'CASCADE' for clave in claves):
+        return
+    
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('PRAGMA foreign_keys = OFF')  # No tiene efecto dentro de una transacción
+    try:
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute('''
+            CREATE TABLE detalles_pedido_nueva (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pedido_id INTEGER NOT NULL,
+                producto_id INTEGER NOT NULL,
+                cantidad INTEGER NOT NULL,
+                precio_unitario REAL NOT NULL,
+                FOREIGN KEY (pedido_id) REFERENCES pedidos (id) ON DELETE CASCADE,
+                FOREIGN KEY (producto_id) REFERENCES productos (id)
+            )
+            ''')
+            conn.execute('''
+            INSERT INTO detalles_pedido_nueva (id, pedido_id, producto_id, cantidad, precio_unitario)
+            SELECT id, pedido_id, producto_id, cantidad, precio_unitario FROM detalles_pedido
+            ''')
+            # Conservar el contador de AUTOINCREMENT para no reutilizar IDs ya borrados
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'detalles_pedido_nueva'")
+            conn.execute(
+                "INSERT INTO sqlite_sequence (name, seq) "
+                "SELECT 'detalles_pedido_nueva', seq FROM sqlite_sequence WHERE name = 'detalles_pedido'"
+            )
+            conn.execute('DROP TABLE detalles_pedido')
+            conn.execute('ALTER TABLE detalles_pedido_nueva RENAME TO detalles_pedido')
+            huerfanos = conn.execute('PRAGMA foreign_key_check(detalles_pedido)').fetchall()
+            if huerfanos:
+                print(f"Aviso: {len(huerfanos)} detalles de pedido hacen referencia a pedidos o productos inexistentes.")
+    finally:
+        conn.execute('PRAGMA foreign_keys = ON')
+
+def _email_norm_unico(cursor):
+    """Crea idx_clientes_email_norm como índice único (un email por cliente sin distinguir mayúsculas ni acentos).
+    
+    Si ya hay clientes cuyos emails solo difieren en mayúsculas o acentos,
+    se avisa cuáles son y el índice queda sin UNIQUE hasta corregirlos (la
+    próxima migración lo vuelve a intentar).
+    """
+    indices = {row['name']: row['unique'] for row in cursor.execute('PRAGMA index_list(clientes)').fetchall()}
+    if indices.get('idx_clientes_email_norm'):
+        return
+    
+    cursor.execute(
+        'SELECT email_norm, GROUP_CONCAT(id) FROM clientes WHERE email_norm IS NOT NULL '
+        'GROUP BY email_norm HAVING COUNT(*) > 1'
+    )
+    repetidos = cursor.fetchall()
+    if repetidos:
+        print(f"Aviso: {len(repetidos)} emails están repetidos sin distinguir mayúsculas ni acentos; "
+              f"corríjalos para que no se puedan volver a repetir:")
+        for email_norm, ids in repetidos:
+            print(f"  {email_norm}: clientes {ids}")
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_clientes_email_norm ON clientes (email_norm)')
+        return
+    
+    cursor.execute('DROP INDEX IF EXISTS idx_clientes_email_norm')
+    cursor.execute('CREATE UNIQUE INDEX idx_clientes_email_norm ON clientes (email_norm)')
+
+def _claves_en_cascada(conn):
+    """Reconstruye claves_idempotencia para que sus filas se borren junto con el pedido.
+    
+    Mismo procedimiento que _detalles_en_cascada. Las claves de pedidos que
+    ya no existen no se copian: reenviar esas claves debe crear el pedido
+    de nuevo. No hace nada si la tabla ya tiene ON DELETE CASCADE.
+    """
+    claves = conn.execute('PRAGMA foreign_key_list(claves_idempotencia)').fetchall()
+    if any(clave['table'] == 'pedidos' and clave['on_delete'] == 'CASCADE' for clave in claves):
+        return
+    
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('PRAGMA foreign_keys = OFF')  # No tiene efecto dentro de una transacción
+    try:
+        with conn:
+            conn.execute('BEGIN')
+            conn.execute('''
+            CREATE TABLE claves_idempotencia_nueva (
+                clave TEXT PRIMARY KEY,
+                pedido_id INTEGER NOT NULL,
+                creada INTEGER NOT NULL,
+                FOREIGN KEY (pedido_id) REFERENCES pedidos (id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+            INSERT INTO claves_idempotencia_nueva (clave, pedido_id, creada)
+            SELECT clave, pedido_id, creada FROM claves_idempotencia c
+            WHERE EXISTS (SELECT 1 FROM pedidos p WHERE p.id = c.pedido_id)
+            ''')
+            conn.execute('DROP TABLE claves_idempotencia')
+            conn.execute('ALTER TABLE claves_idempotencia_nueva RENAME TO claves_idempotencia')
+    finally:
+        conn.execute('PRAGMA foreign_keys = ON')
+
+# Versión mínima de la biblioteca SQLite: las consultas usan RETURNING
+# (3.35) y UPDATE ... FROM (3.33), y la base en memoria el VFS memdb (3.36)
+SQLITE_MINIMA = (3, 35, 0)
+SQLITE_MINIMA_MEMORIA = (3, 36, 0)
+
+def _verificar_version_sqlite(backend):
+    """Lanza RuntimeError si la biblioteca SQLite es anterior a la que necesita `backend`."""
+    minima = SQLITE_MINIMA_MEMORIA if isinstance(backend, BackendMemoria) else SQLITE_MINIMA
+    if sqlite3.sqlite_version_info < minima:
+        raise RuntimeError(
+            f"Se necesita SQLite {'.'.join(map(str, minima))} o superior y Python usa la versión "
+            f"{sqlite3.sqlite_version}. Actualice Python o la biblioteca SQLite (ver Requisitos en el README)."
+        )
+
 def init_db():
-    """Inicializa la base de datos con las tablas necesarias."""
+    """Inicializa la base de datos con las tablas necesarias.
+    
+    Lanza RuntimeError si la versión de SQLite no alcanza (SQLITE_MINIMA).
+    """
+    _verificar_version_sqlite(backend_actual())
     conn = get_db_connection()
     cursor = conn.cursor()
     
+    # Permite liberar espacio de a poco (PRAGMA incremental_vacuum); solo
+    # tiene efecto si se configura antes de crear la primera tabla
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
     # Crear tabla de clientes
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS clientes (
@@ -54,12 +317,277 @@ def init_db():
         producto_id INTEGER NOT NULL,
         cantidad INTEGER NOT NULL,
         precio_unitario REAL NOT NULL,
-        FOREIGN KEY (pedido_id) REFERENCES pedidos (id),
+        FOREIGN KEY (pedido_id) REFERENCES pedidos (id) ON DELETE CASCADE,
         FOREIGN KEY (producto_id) REFERENCES productos (id)
     )
     ''')
     
+    migrar_db(conn)
+    
     conn.commit()
     conn.close()
     
-    print("Base de datos inicializada correctamente.")
\ No newline at end of file
+    print("Base de datos inicializada correctamente.")
+
+def migrar_db(conn=None):
+    """Aplica sobre una base existente los cambios de esquema posteriores a init_db.
+    
+    Todas las operaciones son idempotentes, así que se puede llamar en cada
+    inicio de la aplicación. Igual que init_db, verifica la versión de SQLite.
+    """
+    _verificar_version_sqlite(backend_actual())
+    propia = conn is None
+    if propia:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # Al borrar un pedido se borran sus detalles (ON DELETE CASCADE)
+    _detalles_en_cascada(conn)
+    
+    # Con WAL los lectores no bloquean al escritor ni el escritor a los lectores
+    cursor.execute('PRAGMA journal_mode = WAL')
+    
+    # Crear tabla de archivos ingeridos desde el directorio de entrada
+    # (permite reanudar la ingesta sin duplicar pedidos tras una caída)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS archivos_ingeridos (
+        nombre TEXT PRIMARY KEY,
+        fecha TEXT NOT NULL,
+        pedidos INTEGER NOT NULL,
+        rechazados INTEGER NOT NULL
+    )
+    ''')
+    
+    # Columnas normalizadas (sin acentos y en minúsculas) para las búsquedas
+    nuevas = [
+        _agregar_columna(cursor, 'clientes', 'nombre_norm', 'TEXT'),
+        _agregar_columna(cursor, 'clientes', 'email_norm', 'TEXT'),
+        _agregar_columna(cursor, 'clientes', 'telefono_norm', 'TEXT'),
+    ]
+    if any(nuevas):
+        cursor.execute(
+            'UPDATE clientes SET nombre_norm = normalizar(nombre), email_norm = normalizar(email), '
+            'telefono_norm = normalizar_telefono(telefono)'
+        )
+    nuevas = [
+        _agregar_columna(cursor, 'productos', 'nombre_norm', 'TEXT'),
+        _agregar_columna(cursor, 'productos', 'descripcion_norm', 'TEXT'),
+    ]
+    if any(nuevas):
+        cursor.execute('UPDATE productos SET nombre_norm = normalizar(nombre), descripcion_norm = normalizar(descripcion)')
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_clientes_nombre_norm ON clientes (nombre_norm)')
+    _email_norm_unico(cursor)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_clientes_telefono_norm ON clientes (telefono_norm)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_productos_nombre_norm ON productos (nombre_norm)')
+    
+    # Carga en bloque de los detalles de varios pedidos
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_detalles_pedido_pedido ON detalles_pedido (pedido_id)')
+    # Verificar si un producto figura en pedidos antes de eliminarlo
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_detalles_pedido_producto ON detalles_pedido (producto_id)')
+    
+    # Listado paginado de pedidos por fecha (el índice incluye el id)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_fecha ON pedidos (fecha)')
+    
+    # Los triggers mantienen las columnas normalizadas con cualquier escritura
+    for evento in ('INSERT', 'UPDATE OF nombre, email, telefono'):
+        sufijo = 'ai' if evento == 'INSERT' else 'au'
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS clientes_normalizar_{sufijo} AFTER {evento} ON clientes
+        BEGIN
+            UPDATE clientes SET nombre_norm = normalizar(NEW.nombre), email_norm = normalizar(NEW.email),
+                telefono_norm = normalizar_telefono(NEW.telefono)
+            WHERE id = NEW.id;
+        END
+        ''')
+    for evento in ('INSERT', 'UPDATE OF nombre, descripcion'):
+        sufijo = 'ai' if evento == 'INSERT' else 'au'
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS productos_normalizar_{sufijo} AFTER {evento} ON productos
+        BEGIN
+            UPDATE productos SET nombre_norm = normalizar(NEW.nombre), descripcion_norm = normalizar(NEW.descripcion)
+            WHERE id = NEW.id;
+        END
+        ''')
+    
+    # Versión de cada fila para el control de concurrencia optimista
+    for tabla in ('clientes', 'productos', 'pedidos'):
+        _agregar_columna(cursor, tabla, 'version', 'INTEGER NOT NULL DEFAULT 0')
+    
+    # Contador de cambios por tabla, usado para validar los resultados en cache
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS versiones_tabla (
+        tabla TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    for tabla in ('clientes', 'productos', 'pedidos', 'detalles_pedido'):
+        cursor.execute('INSERT OR IGNORE INTO versiones_tabla (tabla) VALUES (?)', (tabla,))
+        for evento in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {tabla}_version_{evento.lower()} AFTER {evento} ON {tabla}
+            BEGIN
+                UPDATE versiones_tabla SET version = version + 1 WHERE tabla = '{tabla}';
+            END
+            ''')
+    
+    # Registro de cambios (change data capture) para consumidores externos.
+    # Cada registro solo identifica la fila; el consumidor lee su estado actual.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS cambios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tabla TEXT NOT NULL,
+        operacion TEXT NOT NULL,
+        fila_id INTEGER NOT NULL,
+        momento INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cambios_fila ON cambios (tabla, fila_id, id)')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS consumidores_cambios (
+        nombre TEXT PRIMARY KEY,
+        posicion INTEGER NOT NULL DEFAULT 0,
+        actualizado INTEGER NOT NULL
+    )
+    ''')
+    for tabla in ('clientes', 'productos', 'pedidos', 'detalles_pedido'):
+        for evento, operacion, fila in (('INSERT', 'I', 'NEW'), ('UPDATE', 'U', 'NEW'), ('DELETE', 'D', 'OLD')):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {tabla}_cdc_{evento.lower()} AFTER {evento} ON {tabla}
+            BEGIN
+                INSERT INTO cambios (tabla, operacion, fila_id, momento)
+                VALUES ('{tabla}', '{operacion}', {fila}.id, CAST(strftime('%s', 'now') AS INTEGER));
+            END
+            ''')
+    
+    # Punto de reposición de cada producto. El índice parcial contiene solo
+    # los productos con stock en el mínimo o por debajo, así que el reporte
+    # de reposición no recorre el resto del catálogo
+    _agregar_columna(cursor, 'productos', 'stock_minimo', 'INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_productos_reponer ON productos (stock - stock_minimo) WHERE stock <= stock_minimo')
+    
+    # Resumen de pedidos por cliente, mantenido por triggers. Un alta suma
+    # al resumen; una baja o un cambio de estado, total, fecha o cliente lo
+    # recalcula desde los pedidos del cliente (índice por cliente_id, fecha).
+    # Los pedidos cancelados no suman al total gastado.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_cliente_fecha ON pedidos (cliente_id, fecha)')
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'resumen_clientes'")
+    resumen_existente = cursor.fetchone() is not None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS resumen_clientes (
+        cliente_id INTEGER PRIMARY KEY,
+        cantidad_pedidos INTEGER NOT NULL,
+        pedidos_cancelados INTEGER NOT NULL,
+        total_gastado REAL NOT NULL,
+        primer_pedido TEXT,
+        ultimo_pedido TEXT
+    )
+    ''')
+    recalcular = '''
+        DELETE FROM resumen_clientes WHERE cliente_id = {fila}.cliente_id;
+        INSERT INTO resumen_clientes
+        SELECT cliente_id, COUNT(*), SUM(estado = 'Cancelado'), TOTAL(CASE WHEN estado <> 'Cancelado' THEN total END),
+               MIN(fecha), MAX(fecha)
+        FROM pedidos WHERE cliente_id = {fila}.cliente_id GROUP BY cliente_id;
+    '''
+    if not resumen_existente:
+        cursor.execute('''
+        INSERT INTO resumen_clientes
+        SELECT cliente_id, COUNT(*), SUM(estado = 'Cancelado'), TOTAL(CASE WHEN estado <> 'Cancelado' THEN total END),
+               MIN(fecha), MAX(fecha)
+        FROM pedidos GROUP BY cliente_id
+        ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS pedidos_resumen_insert AFTER INSERT ON pedidos
+    BEGIN
+        INSERT INTO resumen_clientes
+        VALUES (NEW.cliente_id, 1, NEW.estado = 'Cancelado', CASE WHEN NEW.estado <> 'Cancelado' THEN NEW.total ELSE 0 END,
+                NEW.fecha, NEW.fecha)
+        ON CONFLICT(cliente_id) DO UPDATE SET
+            cantidad_pedidos = cantidad_pedidos + 1,
+            pedidos_cancelados = pedidos_cancelados + excluded.pedidos_cancelados,
+            total_gastado = total_gastado + excluded.total_gastado,
+            primer_pedido = MIN(primer_pedido, excluded.primer_pedido),
+            ultimo_pedido = MAX(ultimo_pedido, excluded.ultimo_pedido);
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS pedidos_resumen_delete AFTER DELETE ON pedidos
+    BEGIN
+        {recalcular.format(fila='OLD')}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS pedidos_resumen_update AFTER UPDATE OF cliente_id, fecha, estado, total ON pedidos
+    BEGIN
+        {recalcular.format(fila='OLD')}
+        {recalcular.format(fila='NEW')}
+    END
+    ''')
+    
+    # Listado de pedidos con totales por línea (PedidoController.listar_resumen):
+    # filtro por estado ordenado por fecha, y las líneas de cada pedido
+    # sumadas desde el índice, sin leer la tabla detalles_pedido
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_estado_fecha ON pedidos (estado, fecha)')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_detalles_pedido_totales '
+        'ON detalles_pedido (pedido_id, producto_id, cantidad, precio_unitario)'
+    )
+    
+    # Claves de idempotencia de los pedidos: reenviar un pedido con la misma
+    # clave retorna el pedido original en lugar de crearlo de nuevo. Las
+    # claves vencidas las elimina el mantenimiento (índice por fecha de alta).
+    # Al borrar un pedido se borran sus claves (ON DELETE CASCADE, con índice
+    # por pedido): una clave nunca retorna el ID de un pedido eliminado
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS claves_idempotencia (
+        clave TEXT PRIMARY KEY,
+        pedido_id INTEGER NOT NULL,
+        creada INTEGER NOT NULL,
+        FOREIGN KEY (pedido_id) REFERENCES pedidos (id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    ''')
+    _claves_en_cascada(conn)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_claves_idempotencia_creada ON claves_idempotencia (creada)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_claves_idempotencia_pedido ON claves_idempotencia (pedido_id)')
+    
+    # Reservas de stock de los pedidos en preparación (reservas.py). El
+    # disponible de un producto es su stock menos las reservas vigentes de
+    # otros carritos, que se suman desde el índice por producto
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS reservas (
+        carrito TEXT NOT NULL,
+        producto_id INTEGER NOT NULL,
+        cantidad INTEGER NOT NULL,
+        vence INTEGER NOT NULL,
+        PRIMARY KEY (carrito, producto_id),
+        FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reservas_producto ON reservas (producto_id, vence, cantidad)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reservas_vence ON reservas (vence)')
+    
+    # Momento de creación de cada pedido, en segundos desde 1970. `fecha`
+    # solo guarda el día; a los pedidos existentes se les asigna la
+    # medianoche (hora local) de su fecha. El índice resuelve los listados
+    # por intervalo de tiempo (PedidoController.listar_intervalo) y, junto
+    # con el estado, las páginas del listado de pedidos (listar_pagina)
+    if _agregar_columna(cursor, 'pedidos', 'creado', 'INTEGER'):
+        cursor.execute("UPDATE pedidos SET creado = CAST(strftime('%s', fecha, 'utc') AS INTEGER) WHERE creado IS NULL")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_creado ON pedidos (creado)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_estado_creado ON pedidos (estado, creado)')
+    
+    # Historial de las tareas de mantenimiento (mantenimiento.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS historial_mantenimiento (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tarea TEXT NOT NULL,
+        inicio INTEGER NOT NULL,
+        duracion REAL NOT NULL,
+        resultado TEXT
+    )
+    ''')
+    
+    if propia:
+        conn.commit()
+        conn.close()
@@ -0,0 +1,436 @@
+"""Ingesta de pedidos desde un directorio de entrada (spool).
+
+La tienda web deja archivos JSONL en ``<spool>/entrada``; cada línea es un
+pedido con el formato:
+
+    {"cliente_id": 1, "fecha": "2024-05-01", "estado": "Pendiente",
+     "detalles": [{"producto_id": 3, "cantidad": 2, "precio_unitario": 10.5}]}
+
+``fecha``, ``estado`` y ``precio_unitario`` son opcionales. También se puede
+incluir ``"clave_idempotencia"``: un pedido cuya clave ya fue ingerida (o
+usada en PedidoController.crear) se omite sin contarlo como rechazo, así
+que reenviar un archivo no duplica pedidos. Los archivos se
+deben escribir con otro nombre (por ejemplo ``.tmp``) y renombrarse a
+``.jsonl`` al terminar, para que nunca se lea un archivo a medio escribir.
+
+El análisis y la validación de cada archivo se hace en un pool de procesos;
+las escrituras pasan por un único escritor que agrupa varios archivos en una
+misma transacción. Al reclamarlo, cada archivo recibe un nombre único
+(``<momento>-<proceso>-<id>-<nombre>``), así que dos archivos enviados con el
+mismo nombre se ingieren por separado. Al confirmar, cada archivo se mueve a
+``procesados``; las líneas rechazadas se copian a ``fallidos`` junto con un
+``.errores`` que explica el motivo de cada rechazo.
+
+Uso:
+    python ingesta.py DIRECTORIO [--procesos N] [--lote N] [--intervalo S] [--una-vez]
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import inventario
+from controllers import PedidoController
+from database import backend_actual, get_db_connection, init_db, migrar_db
+from models import ESTADOS_PEDIDO, Pedido, DetallePedido
+from reintentos import POLITICA
+
+SUBDIRECTORIOS = ("entrada", "procesando", "procesados", "fallidos")
+
+
+def _error_linea(numero, linea, motivo):
+    return {"linea": numero, "texto": linea, "motivo": motivo}
+
+
+def _validar_pedido(datos):
+    """Valida la estructura de un pedido. Retorna el motivo del rechazo o None."""
+    if not isinstance(datos, dict):
+        return "la línea no es un objeto JSON"
+    cliente_id = datos.get("cliente_id")
+    if not isinstance(cliente_id, int) or isinstance(cliente_id, bool) or cliente_id <= 0:
+        return "cliente_id inválido"
+    fecha = datos.get("fecha")
+    if fecha is not None:
+        try:
+            datetime.datetime.strptime(fecha, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return "fecha inválida (se espera AAAA-MM-DD)"
+    estado = datos.get("estado")
+    if estado is not None and estado not in ESTADOS_PEDIDO:
+        return "estado inválido"
+    clave = datos.get("clave_idempotencia")
+    if clave is not None and (not isinstance(clave, str) or not clave):
+        return "clave_idempotencia inválida"
+    detalles = datos.get("detalles")
+    if not isinstance(detalles, list) or not detalles:
+        return "el pedido no tiene detalles"
+    for detalle in detalles:
+        if not isinstance(detalle, dict):
+            return "detalle inválido"
+        producto_id = detalle.get("producto_id")
+        cantidad = detalle.get("cantidad")
+        precio = detalle.get("precio_unitario")
+        if not isinstance(producto_id, int) or isinstance(producto_id, bool) or producto_id <= 0:
+            return "producto_id inválido"
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad <= 0:
+            return "cantidad inválida"
+        if precio is not None and (not isinstance(precio, (int, float)) or isinstance(precio, bool) or precio < 0):
+            return "precio_unitario inválido"
+    return None
+
+
+def analizar_archivo(ruta):
+    """Lee y valida un archivo JSONL. Se ejecuta en un proceso del pool.
+
+    Retorna un diccionario con la ruta, los pedidos válidos (con su número
+    de línea) y los errores encontrados. Solo valida la estructura: las
+    comprobaciones contra la base de datos las hace el escritor.
+    """
+    pedidos = []
+    errores = []
+    with open(ruta, encoding="utf-8") as archivo:
+        for numero, linea in enumerate(archivo, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                datos = json.loads(linea)
+            except ValueError:
+                errores.append(_error_linea(numero, linea, "JSON inválido"))
+                continue
+            motivo = _validar_pedido(datos)
+            if motivo:
+                errores.append(_error_linea(numero, linea, motivo))
+            else:
+                pedidos.append({"linea": numero, "texto": linea, "datos": datos})
+    return {"ruta": ruta, "pedidos": pedidos, "errores": errores}
+
+
+class EscritorPedidos:
+    """Escritor único que inserta los pedidos analizados en lotes transaccionales."""
+
+    def __init__(self):
+        self.conn = get_db_connection()
+        # Las transacciones se controlan explícitamente con BEGIN/SAVEPOINT
+        self.conn.isolation_level = None
+        self.conn.execute(f'PRAGMA busy_timeout = {int(POLITICA.busy_timeout_ms)}')
+        self.pedido_controller = PedidoController()
+
+    def cerrar(self):
+        self.conn.close()
+
+    def ya_ingerido(self, nombre):
+        """Indica si un archivo ya fue confirmado en una ingesta anterior."""
+        cursor = self.conn.execute('SELECT 1 FROM archivos_ingeridos WHERE nombre = ?', (nombre,))
+        return cursor.fetchone() is not None
+
+    def _cargar_referencias(self, cursor, resultados):
+        """Carga en bloque los clientes y productos referenciados por el lote."""
+        clientes_ids = set()
+        productos_ids = set()
+        for resultado in resultados:
+            for pedido in resultado["pedidos"]:
+                clientes_ids.add(pedido["datos"]["cliente_id"])
+                for detalle in pedido["datos"]["detalles"]:
+                    productos_ids.add(detalle["producto_id"])
+
+        clientes = set()
+        productos = {}
+        for ids, tabla in ((sorted(clientes_ids), "clientes"), (sorted(productos_ids), "productos")):
+            for inicio in range(0, len(ids), 500):
+                bloque = ids[inicio:inicio + 500]
+                marcas = ",".join("?" * len(bloque))
+                if tabla == "clientes":
+                    cursor.execute(f'SELECT id FROM clientes WHERE id IN ({marcas})', bloque)
+                    clientes.update(row['id'] for row in cursor.fetchall())
+                else:
+                    cursor.execute(f'SELECT id, precio, stock FROM productos WHERE id IN ({marcas})', bloque)
+                    for row in cursor.fetchall():
+                        productos[row['id']] = {"precio": row['precio'], "stock": row['stock']}
+        return clientes, productos
+
+    def escribir_lote(self, resultados):
+        """Inserta los pedidos de varios archivos en una única transacción.
+
+        Cada pedido se inserta dentro de un SAVEPOINT, de modo que un pedido
+        rechazado por la base de datos no afecta al resto del lote. Los
+        rechazos se agregan a los errores del archivo correspondiente y los
+        pedidos con una clave de idempotencia ya usada se cuentan en
+        "repetidos". Cada archivo va además en su propio SAVEPOINT: si ya
+        figura como ingerido, se deshacen solo sus pedidos y se marca con
+        "ya_ingerido", sin afectar a los demás archivos del lote. Retorna la
+        cantidad de pedidos insertados.
+        """
+        cursor = self.conn.cursor()
+        insertados = 0
+        alertas = []  # Productos que quedaron bajo su stock mínimo
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            clientes, productos = self._cargar_referencias(cursor, resultados)
+            ahora = datetime.datetime.now()
+            hoy = ahora.strftime("%Y-%m-%d")
+
+            for resultado in resultados:
+                aceptados = 0
+                resultado["repetidos"] = 0
+                descontado = {}  # Stock descontado por este archivo, por si se deshace
+                cursor.execute('SAVEPOINT archivo')
+                for entrada in resultado["pedidos"]:
+                    datos = entrada["datos"]
+                    clave = datos.get("clave_idempotencia")
+                    if clave is not None and self.pedido_controller.pedido_por_clave(cursor, clave) is not None:
+                        resultado["repetidos"] += 1
+                        continue
+
+                    motivo = None
+                    if datos["cliente_id"] not in clientes:
+                        motivo = "cliente inexistente"
+
+                    # Agrupar cantidades por producto para validar el stock
+                    requerido = {}
+                    for detalle in datos["detalles"]:
+                        requerido[detalle["producto_id"]] = requerido.get(detalle["producto_id"], 0) + detalle["cantidad"]
+                    for producto_id, cantidad in requerido.items():
+                        if motivo:
+                            break
+                        if producto_id not in productos:
+                            motivo = f"producto {producto_id} inexistente"
+                        elif productos[producto_id]["stock"] < cantidad:
+                            motivo = f"stock insuficiente para el producto {producto_id}"
+
+                    if motivo:
+                        resultado["errores"].append(_error_linea(entrada["linea"], entrada["texto"], motivo))
+                        continue
+
+                    detalles = []
+                    for detalle in datos["detalles"]:
+                        precio = detalle.get("precio_unitario")
+                        if precio is None:
+                            precio = productos[detalle["producto_id"]]["precio"]
+                        detalles.append(DetallePedido(
+                            producto_id=detalle["producto_id"],
+                            cantidad=detalle["cantidad"],
+                            precio_unitario=precio
+                        ))
+                    pedido = Pedido(
+                        cliente_id=datos["cliente_id"],
+                        fecha=datos.get("fecha") or hoy,
+                        estado=datos.get("estado") or "Pendiente",
+                        total=sum(detalle.subtotal() for detalle in detalles),
+                        # Con fecha explícita, el momento es la medianoche de esa fecha
+                        creado=None if datos.get("fecha") else int(ahora.timestamp())
+                    )
+
+                    cursor.execute('SAVEPOINT pedido')
+                    try:
+                        self.pedido_controller.insertar(cursor, pedido, detalles, alertas, clave)
+                    except sqlite3.IntegrityError as e:
+                        cursor.execute('ROLLBACK TO pedido')
+                        cursor.execute('RELEASE pedido')
+                        resultado["errores"].append(_error_linea(entrada["linea"], entrada["texto"], str(e)))
+                        continue
+                    cursor.execute('RELEASE pedido')
+
+                    for producto_id, cantidad in requerido.items():
+                        productos[producto_id]["stock"] -= cantidad
+                        descontado[producto_id] = descontado.get(producto_id, 0) + cantidad
+                    aceptados += 1
+
+                try:
+                    cursor.execute(
+                        'INSERT INTO archivos_ingeridos (nombre, fecha, pedidos, rechazados) VALUES (?, ?, ?, ?)',
+                        (os.path.basename(resultado["ruta"]), datetime.datetime.now().isoformat(timespec="seconds"),
+                         aceptados, len(resultado["errores"]))
+                    )
+                except sqlite3.IntegrityError:
+                    # El archivo ya se confirmó en una ingesta anterior: sus
+                    # pedidos ya están en la base
+                    cursor.execute('ROLLBACK TO archivo')
+                    cursor.execute('RELEASE archivo')
+                    for producto_id, cantidad in descontado.items():
+                        productos[producto_id]["stock"] += cantidad
+                    resultado["aceptados"] = 0
+                    resultado["ya_ingerido"] = True
+                    continue
+                cursor.execute('RELEASE archivo')
+                resultado["aceptados"] = aceptados
+                insertados += aceptados
+
+            cursor.execute('COMMIT')
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        inventario.notificar(alertas)
+        return insertados
+
+
+class Ingesta:
+    """Vigila un directorio de entrada e ingiere los pedidos que aparecen."""
+
+    def __init__(self, directorio, procesos=None, tamano_lote=1000, intervalo=2.0):
+        self.directorio = directorio
+        self.procesos = procesos
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.total_pedidos = 0
+        self.total_rechazados = 0
+        self.total_repetidos = 0
+        self.total_archivos = 0
+        self.segundos_activos = 0.0
+        for nombre in SUBDIRECTORIOS:
+            os.makedirs(self._ruta(nombre), exist_ok=True)
+
+    def _ruta(self, subdirectorio, nombre=""):
+        return os.path.join(self.directorio, subdirectorio, nombre)
+
+    def _reclamar_archivos(self):
+        """Mueve los archivos listos de ``entrada`` a ``procesando``.
+
+        El renombrado es atómico, así que dos ingestas sobre el mismo
+        directorio nunca procesan el mismo archivo.
+        """
+        reclamados = []
+        for nombre in sorted(os.listdir(self._ruta("entrada"))):
+            if not nombre.endswith(".jsonl"):
+                continue
+            # Nombre único: el registro de archivos ingeridos y los
+            # directorios de destino no confunden dos envíos con el mismo nombre
+            unico = f"{datetime.datetime.now():%Y%m%d%H%M%S}-{os.getpid()}-{uuid.uuid4().hex[:8]}-{nombre}"
+            try:
+                os.replace(self._ruta("entrada", nombre), self._ruta("procesando", unico))
+            except FileNotFoundError:
+                continue  # Otra ingesta lo reclamó primero
+            reclamados.append(self._ruta("procesando", unico))
+        return reclamados
+
+    def _escribir_atomico(self, ruta, lineas):
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            archivo.writelines(linea + "\n" for linea in lineas)
+        os.replace(temporal, ruta)
+
+    def _finalizar(self, resultado):
+        """Mueve un archivo confirmado a ``procesados`` y registra sus rechazos."""
+        nombre = os.path.basename(resultado["ruta"])
+        if resultado.get("ya_ingerido"):
+            # Sus pedidos y rechazos ya se registraron la primera vez
+            os.replace(resultado["ruta"], self._ruta("procesados", nombre))
+            return
+        errores = sorted(resultado["errores"], key=lambda error: error["linea"])
+        if errores:
+            self._escribir_atomico(self._ruta("fallidos", nombre), [error["texto"] for error in errores])
+            self._escribir_atomico(
+                self._ruta("fallidos", nombre + ".errores"),
+                [f"línea {error['linea']}: {error['motivo']}" for error in errores]
+            )
+        os.replace(resultado["ruta"], self._ruta("procesados", nombre))
+        self.total_archivos += 1
+        self.total_rechazados += len(errores)
+        self.total_repetidos += resultado.get("repetidos", 0)
+
+    def _descartar(self, ruta, motivo):
+        """Mueve a ``fallidos`` un archivo que no se pudo leer."""
+        nombre = os.path.basename(ruta)
+        self._escribir_atomico(self._ruta("fallidos", nombre + ".errores"), [motivo])
+        os.replace(ruta, self._ruta("fallidos", nombre))
+        self.total_archivos += 1
+
+    def procesar_pendientes(self, pool, escritor):
+        """Procesa todos los archivos disponibles. Retorna los pedidos insertados."""
+        # Archivos que quedaron en "procesando" por una ejecución interrumpida
+        rutas = sorted(
+            self._ruta("procesando", nombre)
+            for nombre in os.listdir(self._ruta("procesando"))
+            if nombre.endswith(".jsonl")
+        )
+        for ruta in list(rutas):
+            if escritor.ya_ingerido(os.path.basename(ruta)):
+                # Se confirmó pero no se llegó a mover: no volver a insertarlo
+                os.replace(ruta, self._ruta("procesados", os.path.basename(ruta)))
+                rutas.remove(ruta)
+        rutas.extend(self._reclamar_archivos())
+        if not rutas:
+            return 0
+
+        inicio = time.perf_counter()
+        insertados = 0
+        pendientes = []
+        pedidos_pendientes = 0
+        futuros = [(ruta, pool.submit(analizar_archivo, ruta)) for ruta in rutas]
+
+        def confirmar():
+            escritos = escritor.escribir_lote(pendientes)
+            for resultado in pendientes:
+                self._finalizar(resultado)
+            pendientes.clear()
+            return escritos
+
+        for ruta, futuro in futuros:
+            try:
+                resultado = futuro.result()
+            except (OSError, UnicodeDecodeError) as e:
+                self._descartar(ruta, f"no se pudo leer el archivo: {e}")
+                continue
+            pendientes.append(resultado)
+            pedidos_pendientes += len(resultado["pedidos"])
+            if pedidos_pendientes >= self.tamano_lote:
+                insertados += confirmar()
+                pedidos_pendientes = 0
+        if pendientes:
+            insertados += confirmar()
+
+        self.segundos_activos += time.perf_counter() - inicio
+        self.total_pedidos += insertados
+        return insertados
+
+    def pedidos_por_segundo(self):
+        """Pedidos insertados por segundo de trabajo efectivo (sin contar esperas)."""
+        if self.segundos_activos == 0:
+            return 0.0
+        return self.total_pedidos / self.segundos_activos
+
+    def resumen(self):
+        return (f"Archivos: {self.total_archivos} | Pedidos: {self.total_pedidos} | "
+                f"Rechazados: {self.total_rechazados} | Repetidos: {self.total_repetidos} | "
+                f"{self.pedidos_por_segundo():.1f} pedidos/s")
+
+    def ejecutar(self, una_vez=False):
+        """Bucle principal: procesa lo disponible y espera nuevos archivos."""
+        escritor = EscritorPedidos()
+        try:
+            with ProcessPoolExecutor(max_workers=self.procesos) as pool:
+                while True:
+                    if self.procesar_pendientes(pool, escritor) and not una_vez:
+                        print(self.resumen())
+                    if una_vez:
+                        break
+                    time.sleep(self.intervalo)
+        except KeyboardInterrupt:
+            print("\nIngesta detenida por el usuario.")
+        finally:
+            escritor.cerrar()
+        print(self.resumen())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta de pedidos desde un directorio de entrada.")
+    parser.add_argument("directorio", help="directorio de spool (se crean entrada/, procesados/ y fallidos/)")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos de análisis (por defecto, uno por núcleo)")
+    parser.add_argument("--lote", type=int, default=1000, help="pedidos por transacción")
+    parser.add_argument("--intervalo", type=float, default=2.0, help="segundos entre revisiones del directorio")
+    parser.add_argument("--una-vez", action="store_true", help="procesar lo pendiente y terminar")
+    args = parser.parse_args()
+
+    if not backend_actual().existe():
+        init_db()
+    else:
+        migrar_db()
+    Ingesta(args.directorio, args.procesos, args.lote, args.intervalo).ejecutar(una_vez=args.una_vez)
+
+
+if __name__ == "__main__":
+    main()
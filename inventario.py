@@ -0,0 +1,41 @@
+"""Avisos de stock bajo.
+
+Cada producto tiene un stock mínimo (punto de reposición). Cuando una
+escritura deja el stock de un producto en su mínimo o por debajo, habiendo
+estado por encima, se avisa a las funciones suscritas con la lista de
+productos afectados. La detección usa el RETURNING de la misma sentencia
+UPDATE que descuenta el stock, así que no agrega consultas.
+
+Los avisos se envían después de confirmar la transacción: un pedido que
+se deshace o se reintenta no genera avisos falsos ni repetidos.
+"""
+
+_suscriptores = []
+
+
+def suscribir(funcion):
+    """Registra `funcion(productos)` para recibir los productos que bajaron del mínimo."""
+    _suscriptores.append(funcion)
+    return funcion
+
+
+def desuscribir(funcion):
+    if funcion in _suscriptores:
+        _suscriptores.remove(funcion)
+
+
+def cruzo_minimo(producto, cantidad_descontada):
+    """Indica si descontar `cantidad_descontada` llevó el stock del producto a su mínimo."""
+    anterior = producto.stock + cantidad_descontada
+    return producto.stock <= producto.stock_minimo < anterior
+
+
+def notificar(productos):
+    """Avisa a los suscriptores; un suscriptor que falla no impide avisar a los demás."""
+    if not productos:
+        return
+    for funcion in list(_suscriptores):
+        try:
+            funcion(productos)
+        except Exception as e:
+            print(f"Error en aviso de stock bajo: {e}")
@@ -0,0 +1,287 @@
+"""Mantenimiento periódico de la base de datos.
+
+Ejecuta en segundo plano, cada una con su intervalo:
+
+- optimizar: ``PRAGMA optimize`` (actualiza estadísticas solo donde hace falta).
+- analizar: ``ANALYZE`` completo con ``analysis_limit`` para acotar su duración.
+- checkpoint: ``PRAGMA wal_checkpoint(PASSIVE)``, que nunca espera a los escritores.
+- vacio_incremental: libera páginas vacías de a poco (requiere auto_vacuum=INCREMENTAL).
+- purgar_cambios: política de retención del registro de cambios (cdc.purgar).
+- purgar_claves: elimina las claves de idempotencia de pedidos ya vencidas.
+- purgar_reservas: elimina las reservas de stock vencidas (reservas.py).
+
+Las tareas pesadas esperan a que la base esté inactiva (sin escrituras de
+otras conexiones durante un rato), salvo que lleven demasiado tiempo
+postergadas. Todas usan un busy_timeout corto: si la base está ocupada se
+posponen en lugar de hacer esperar a los usuarios. La duración de cada
+ejecución queda en la tabla historial_mantenimiento.
+
+Uso:
+    python mantenimiento.py                # planificador en primer plano
+    python mantenimiento.py --una-vez      # ejecuta todas las tareas una vez
+    python mantenimiento.py --tarea analizar
+    python mantenimiento.py convertir-vacio  # habilita auto_vacuum=INCREMENTAL (hace VACUUM)
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+
+import cdc
+import reservas
+from controllers import VIGENCIA_CLAVES_IDEMPOTENCIA
+from database import backend_actual, get_db_connection, init_db, migrar_db
+from reintentos import es_contencion
+
+# Espera máxima por un bloqueo: el mantenimiento nunca debe frenar a los usuarios
+BUSY_TIMEOUT_MS = 100
+PAGINAS_POR_PASO = 256
+
+
+class Tarea:
+    """Una tarea de mantenimiento con su intervalo y su última ejecución."""
+
+    def __init__(self, nombre, funcion, intervalo, solo_inactivo=False):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.intervalo = intervalo
+        self.solo_inactivo = solo_inactivo
+        self.ultima = 0.0
+        self.ultima_duracion = None
+        self.ultimo_resultado = None
+
+    def vencida(self, ahora):
+        return ahora - self.ultima >= self.intervalo
+
+
+def _optimizar(conn):
+    conn.execute('PRAGMA optimize')
+    return "ok"
+
+
+def _analizar(conn):
+    conn.execute('PRAGMA analysis_limit = 1000')
+    conn.execute('ANALYZE')
+    return "ok"
+
+
+def _checkpoint(conn):
+    bloqueado, paginas_wal, copiadas = conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+    return f"wal={paginas_wal} copiadas={copiadas}"
+
+
+def _vacio_incremental(conn):
+    """Libera las páginas vacías en pasos cortos para no retener el bloqueo de escritura."""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        return "omitida: auto_vacuum no es INCREMENTAL (ver convertir-vacio)"
+    liberadas = 0
+    anteriores = None
+    while True:
+        libres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if libres == 0 or libres == anteriores:
+            break
+        anteriores = libres
+        paso = min(libres, PAGINAS_POR_PASO)
+        conn.execute(f'PRAGMA incremental_vacuum({paso})').fetchall()
+        liberadas += paso
+    return f"paginas={liberadas}"
+
+
+def _purgar_cambios(conn):
+    resultado = cdc.purgar(conn=conn)
+    return " ".join(f"{clave}={valor}" for clave, valor in resultado.items())
+
+
+def _purgar_claves(conn):
+    limite = int(time.time()) - VIGENCIA_CLAVES_IDEMPOTENCIA
+    cursor = conn.execute('DELETE FROM claves_idempotencia WHERE creada < ?', (limite,))
+    return f"eliminadas={cursor.rowcount}"
+
+
+def _purgar_reservas(conn):
+    return f"eliminadas={reservas.purgar_vencidas(conn)}"
+
+
+def tareas_por_defecto(intervalos=None):
+    """Crea las tareas estándar; `intervalos` permite cambiar los segundos de cada una."""
+    intervalos = intervalos or {}
+    return [
+        Tarea("checkpoint", _checkpoint, intervalos.get("checkpoint", 300)),
+        Tarea("optimizar", _optimizar, intervalos.get("optimizar", 3600)),
+        Tarea("purgar_cambios", _purgar_cambios, intervalos.get("purgar_cambios", 3600)),
+        Tarea("purgar_claves", _purgar_claves, intervalos.get("purgar_claves", 3600)),
+        Tarea("purgar_reservas", _purgar_reservas, intervalos.get("purgar_reservas", 60)),
+        Tarea("vacio_incremental", _vacio_incremental, intervalos.get("vacio_incremental", 6 * 3600), solo_inactivo=True),
+        Tarea("analizar", _analizar, intervalos.get("analizar", 24 * 3600), solo_inactivo=True),
+    ]
+
+
+class PlanificadorMantenimiento(threading.Thread):
+    """Hilo que ejecuta las tareas de mantenimiento cuando vencen.
+
+    La inactividad se detecta con `PRAGMA data_version` sobre la conexión
+    del planificador: cambia cada vez que otra conexión confirma una
+    escritura.
+    """
+
+    def __init__(self, tareas=None, inactividad=30, postergacion_maxima=4, pausa=1.0):
+        super().__init__(name="mantenimiento", daemon=True)
+        self.tareas = tareas or tareas_por_defecto()
+        self.inactividad = inactividad
+        # Una tarea que espera inactividad se ejecuta igual si lleva
+        # `postergacion_maxima` veces su intervalo sin correr
+        self.postergacion_maxima = postergacion_maxima
+        self.pausa = pausa
+        self._detener = threading.Event()
+        self._conn = None
+        self._data_version = None
+        self._ultima_actividad = time.monotonic()
+
+    def _conectar(self):
+        conn = get_db_connection()
+        conn.isolation_level = None
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        return conn
+
+    def detener(self):
+        self._detener.set()
+
+    def _registrar_actividad(self):
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._ultima_actividad = time.monotonic()
+
+    def inactiva(self):
+        return time.monotonic() - self._ultima_actividad >= self.inactividad
+
+    def ejecutar_tarea(self, tarea):
+        """Ejecuta una tarea y registra su duración. Retorna False si la base estaba ocupada.
+        
+        Si la tarea falla por otro motivo, el error queda en el historial y
+        se informa por stderr; el planificador sigue con las demás tareas.
+        """
+        inicio = time.time()
+        reloj = time.perf_counter()
+        ocupada = False
+        try:
+            resultado = tarea.funcion(self._conn)
+        except sqlite3.OperationalError as e:
+            ocupada = es_contencion(e)
+            resultado = f"error: {e}"
+        except Exception as e:
+            resultado = f"error: {type(e).__name__}: {e}"
+        duracion = time.perf_counter() - reloj
+        if self._conn.in_transaction:
+            self._conn.execute('ROLLBACK')  # Lo que haya dejado a medias la tarea interrumpida
+        if ocupada:
+            return False  # Se reintenta en la próxima vuelta
+        if resultado.startswith("error:"):
+            print(f"Mantenimiento: la tarea {tarea.nombre} falló ({resultado[7:]})", file=sys.stderr)
+
+        tarea.ultima = time.monotonic()
+        tarea.ultima_duracion = duracion
+        tarea.ultimo_resultado = resultado
+        try:
+            self._conn.execute(
+                'INSERT INTO historial_mantenimiento (tarea, inicio, duracion, resultado) VALUES (?, ?, ?, ?)',
+                (tarea.nombre, int(inicio), duracion, resultado)
+            )
+        except sqlite3.Error as e:
+            if not es_contencion(e):
+                print(f"Mantenimiento: no se pudo registrar la tarea {tarea.nombre} ({e})", file=sys.stderr)
+        # Las escrituras propias no cuentan como actividad de los usuarios
+        self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        return True
+
+    def ejecutar_pendientes(self, forzar=False):
+        """Ejecuta las tareas vencidas. Con `forzar`, todas sin esperar inactividad."""
+        self._registrar_actividad()
+        ahora = time.monotonic()
+        for tarea in self.tareas:
+            if self._detener.is_set():
+                return
+            if not forzar and not tarea.vencida(ahora):
+                continue
+            postergada = ahora - tarea.ultima >= tarea.intervalo * self.postergacion_maxima
+            if not forzar and tarea.solo_inactivo and not self.inactiva() and not postergada:
+                continue
+            self.ejecutar_tarea(tarea)
+
+    def run(self):
+        self._conn = self._conectar()
+        ahora = time.monotonic()
+        for tarea in self.tareas:
+            # La primera ejecución ocurre un intervalo después de arrancar
+            tarea.ultima = ahora
+        try:
+            while not self._detener.wait(self.pausa):
+                self.ejecutar_pendientes()
+        finally:
+            self._conn.close()
+
+    def ejecutar_una_vez(self, nombres=None):
+        """Ejecuta las tareas indicadas (o todas) en el hilo actual."""
+        self._conn = self._conectar()
+        try:
+            for tarea in self.tareas:
+                if nombres and tarea.nombre not in nombres:
+                    continue
+                if not self.ejecutar_tarea(tarea):
+                    print(f"{tarea.nombre}: base de datos ocupada, se omitió.")
+                    continue
+                print(f"{tarea.nombre}: {tarea.ultimo_resultado} ({tarea.ultima_duracion:.3f} s)")
+        finally:
+            self._conn.close()
+
+
+def convertir_vacio():
+    """Habilita auto_vacuum=INCREMENTAL en una base existente (reescribe el archivo)."""
+    conn = get_db_connection()
+    conn.isolation_level = None
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de datos TechLab.")
+    parser.add_argument("comando", nargs="?", choices=["convertir-vacio"], help="acción puntual")
+    parser.add_argument("--una-vez", action="store_true", help="ejecutar las tareas una vez y terminar")
+    parser.add_argument("--tarea", action="append", help="ejecutar solo esta tarea (se puede repetir)")
+    parser.add_argument("--intervalo", action="append", default=[], metavar="TAREA=SEGUNDOS",
+                        help="cambiar el intervalo de una tarea")
+    parser.add_argument("--inactividad", type=float, default=30, help="segundos sin escrituras para considerar la base inactiva")
+    args = parser.parse_args()
+
+    if not backend_actual().existe():
+        init_db()
+    else:
+        migrar_db()
+    if args.comando == "convertir-vacio":
+        convertir_vacio()
+        print("auto_vacuum=INCREMENTAL habilitado.")
+        return
+
+    intervalos = {}
+    for valor in args.intervalo:
+        nombre, _, segundos = valor.partition("=")
+        intervalos[nombre] = float(segundos)
+    planificador = PlanificadorMantenimiento(tareas_por_defecto(intervalos), inactividad=args.inactividad)
+
+    if args.una_vez or args.tarea:
+        planificador.ejecutar_una_vez(args.tarea)
+        return
+
+    planificador.start()
+    try:
+        while planificador.is_alive():
+            planificador.join(1)
+    except KeyboardInterrupt:
+        planificador.detener()
+        print("\nMantenimiento detenido.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,133 @@
+import sqlite3
+from database import get_db_connection
+
+# Estados posibles de un pedido, en el orden en que se muestran al usuario
+ESTADOS_PEDIDO = ["Pendiente", "En proceso", "Enviado", "Entregado", "Cancelado"]
+
+# Máximo de parámetros por consulta IN al cargar relaciones en bloque
+TAMANO_BLOQUE = 500
+
+
+def agrupar(objetos):
+    """Marca una lista de objetos como un mismo conjunto de resultados.
+    
+    Cuando se accede a una relación diferida de cualquiera de ellos, la
+    relación se carga de una vez para todos los del grupo, evitando una
+    consulta por objeto (N+1). Retorna la misma lista.
+    """
+    objetos = list(objetos)
+    for objeto in objetos:
+        objeto.__dict__['_grupo'] = objetos
+    return objetos
+
+
+def _filas_por_ids(sql, ids):
+    """Ejecuta `sql` (con un marcador {marcas} para el IN) en bloques de IDs."""
+    ids = list(ids)
+    if not ids:
+        return []
+    filas = []
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        for inicio in range(0, len(ids), TAMANO_BLOQUE):
+            bloque = ids[inicio:inicio + TAMANO_BLOQUE]
+            cursor.execute(sql.format(marcas=','.join('?' * len(bloque))), bloque)
+            filas.extend(cursor.fetchall())
+    finally:
+        conn.close()
+    return filas
+
+
+class Relacion:
+    """Descriptor para relaciones que se cargan recién en el primer acceso.
+    
+    `cargador` recibe la lista de objetos del grupo que aún no tienen la
+    relación cargada y debe asignarla en todos ellos. Asignar un valor
+    explícitamente (por ejemplo, en el constructor) evita la carga.
+    """
+    
+    def __init__(self, cargador):
+        self.cargador = cargador
+    
+    def __set_name__(self, propietario, nombre):
+        self.atributo = '_' + nombre
+    
+    def __get__(self, objeto, tipo=None):
+        if objeto is None:
+            return self
+        try:
+            return objeto.__dict__[self.atributo]
+        except KeyError:
+            pass
+        grupo = objeto.__dict__.get('_grupo', [objeto])
+        pendientes = [o for o in grupo if self.atributo not in o.__dict__]
+        if objeto not in pendientes:
+            pendientes.append(objeto)
+        self.cargador(pendientes)
+        return objeto.__dict__[self.atributo]
+    
+    def __set__(self, objeto, valor):
+        objeto.__dict__[self.atributo] = valor
+
+
+def _cargar_clientes(pedidos):
+    """Carga en bloque el cliente de cada pedido."""
+    ids = {pedido.cliente_id for pedido in pedidos if pedido.cliente_id is not None}
+    clientes = {}
+    try:
+        for row in _filas_por_ids('SELECT * FROM clientes WHERE id IN ({marcas})', ids):
+            clientes[row['id']] = Cliente.from_db_row(row)
+    except sqlite3.Error as e:
+        print(f"Error al cargar clientes de pedidos: {e}")
+    for pedido in pedidos:
+        pedido.cliente = clientes.get(pedido.cliente_id)
+
+
+def _cargar_detalles(pedidos):
+    """Carga en bloque los detalles de cada pedido.
+    
+    Todos los detalles cargados forman un único grupo, así que sus
+    productos también se cargan con una sola consulta.
+    """
+    ids = {pedido.id for pedido in pedidos if pedido.id is not None}
+    por_pedido = {}
+    try:
+        filas = _filas_por_ids('SELECT * FROM detalles_pedido WHERE pedido_id IN ({marcas}) ORDER BY id', ids)
+        for detalle in agrupar(DetallePedido.from_db_row(row) for row in filas):
+            por_pedido.setdefault(detalle.pedido_id, []).append(detalle)
+    except sqlite3.Error as e:
+        print(f"Error al cargar detalles de pedidos: {e}")
+    for pedido in pedidos:
+        pedido.detalles = por_pedido.get(pedido.id, [])
+
+
+def _cargar_productos(detalles):
+    """Carga en bloque el producto de cada detalle."""
+    ids = {detalle.producto_id for detalle in detalles if detalle.producto_id is not None}
+    productos = {}
+    try:
+        for row in _filas_por_ids('SELECT * FROM productos WHERE id IN ({marcas})', ids):
+            productos[row['id']] = Producto.from_db_row(row)
+    except sqlite3.Error as e:
+        print(f"Error al cargar productos de detalles: {e}")
+    for detalle in detalles:
+        detalle.producto = productos.get(detalle.producto_id)
+
+
 class Cliente:
     """Modelo para representar un cliente en el sistema."""
     
-    def __init__(self, id=None, nombre="", email="", telefono="", direccion=""):
+    # Campos que se exportan (to_dict, serializacion.py)
+    CAMPOS = ('id', 'nombre', 'email', 'telefono', 'direccion', 'version')
+    
+    def __init__(self, id=None, nombre="", email="", telefono="", direccion="", version=0):
         self.id = id
         self.nombre = nombre
         self.email = email
         self.telefono = telefono
         self.direccion = direccion
+        self.version = version  # Se incrementa en cada modificación (control de concurrencia)
     
     @classmethod
     def from_db_row(cls, row):
@@ -18,22 +139,67 @@ class Cliente:
             nombre=row['nombre'],
             email=row['email'],
             telefono=row['telefono'],
-            direccion=row['direccion']
+            direccion=row['direccion'],
+            version=row['version']
         )
     
+    def to_dict(self):
+        """Retorna el cliente como diccionario serializable a JSON."""
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+    
     def __str__(self):
         return f"Cliente(id={self.id}, nombre='{self.nombre}', email='{self.email}')"
 
 
+class ResumenCliente:
+    """Totales de pedidos de un cliente (tabla resumen_clientes, mantenida por triggers)."""
+    
+    CAMPOS = ('cliente_id', 'cantidad_pedidos', 'pedidos_cancelados', 'total_gastado', 'primer_pedido', 'ultimo_pedido')
+    
+    def __init__(self, cliente_id=None, cantidad_pedidos=0, pedidos_cancelados=0, total_gastado=0.0,
+                 primer_pedido=None, ultimo_pedido=None):
+        self.cliente_id = cliente_id
+        self.cantidad_pedidos = cantidad_pedidos
+        self.pedidos_cancelados = pedidos_cancelados
+        self.total_gastado = total_gastado  # Sin contar los pedidos cancelados
+        self.primer_pedido = primer_pedido
+        self.ultimo_pedido = ultimo_pedido
+    
+    @classmethod
+    def from_db_row(cls, row):
+        """Crea una instancia de ResumenCliente a partir de una fila de la base de datos."""
+        if row is None:
+            return None
+        return cls(
+            cliente_id=row['cliente_id'],
+            cantidad_pedidos=row['cantidad_pedidos'],
+            pedidos_cancelados=row['pedidos_cancelados'],
+            total_gastado=row['total_gastado'],
+            primer_pedido=row['primer_pedido'],
+            ultimo_pedido=row['ultimo_pedido']
+        )
+    
+    def to_dict(self):
+        """Retorna el resumen como diccionario serializable a JSON."""
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+    
+    def __str__(self):
+        return f"ResumenCliente(cliente_id={self.cliente_id}, pedidos={self.cantidad_pedidos}, total={self.total_gastado})"
+
+
 class Producto:
     """Modelo para representar un producto en el sistema."""
     
-    def __init__(self, id=None, nombre="", descripcion="", precio=0.0, stock=0):
+    CAMPOS = ('id', 'nombre', 'descripcion', 'precio', 'stock', 'stock_minimo', 'version')
+    
+    def __init__(self, id=None, nombre="", descripcion="", precio=0.0, stock=0, version=0, stock_minimo=0):
         self.id = id
         self.nombre = nombre
         self.descripcion = descripcion
         self.precio = precio
         self.stock = stock
+        self.stock_minimo = stock_minimo  # Con este stock o menos hay que reponer
+        self.version = version  # Se incrementa en cada modificación (control de concurrencia)
     
     @classmethod
     def from_db_row(cls, row):
@@ -45,9 +211,15 @@ class Producto:
             nombre=row['nombre'],
             descripcion=row['descripcion'],
             precio=row['precio'],
-            stock=row['stock']
+            stock=row['stock'],
+            version=row['version'],
+            stock_minimo=row['stock_minimo']
         )
     
+    def to_dict(self):
+        """Retorna el producto como diccionario serializable a JSON."""
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+    
     def __str__(self):
         return f"Producto(id={self.id}, nombre='{self.nombre}', precio={self.precio}, stock={self.stock})"
 
@@ -55,14 +227,26 @@ class Producto:
 class Pedido:
     """Modelo para representar un pedido en el sistema."""
     
-    def __init__(self, id=None, cliente_id=None, fecha="", estado="", total=0.0, cliente=None, detalles=None):
+    CAMPOS = ('id', 'cliente_id', 'fecha', 'estado', 'total', 'version', 'creado')
+    
+    # Se cargan desde la base de datos recién al accederlos
+    cliente = Relacion(_cargar_clientes)  # Objeto Cliente asociado
+    detalles = Relacion(_cargar_detalles)  # Lista de detalles del pedido
+    
+    def __init__(self, id=None, cliente_id=None, fecha="", estado="", total=0.0, cliente=None, detalles=None, version=0,
+                 creado=None):
         self.id = id
         self.cliente_id = cliente_id
         self.fecha = fecha
         self.estado = estado
         self.total = total
-        self.cliente = cliente  # Objeto Cliente asociado
-        self.detalles = detalles or []  # Lista de detalles del pedido
+        self.version = version  # Se incrementa en cada modificación (control de concurrencia)
+        # Momento de creación en segundos desde 1970; si no se indica, la medianoche de `fecha`
+        self.creado = creado
+        if cliente is not None:
+            self.cliente = cliente
+        if detalles is not None:
+            self.detalles = detalles
     
     @classmethod
     def from_db_row(cls, row, cliente=None):
@@ -75,23 +259,77 @@ class Pedido:
             fecha=row['fecha'],
             estado=row['estado'],
             total=row['total'],
-            cliente=cliente
+            cliente=cliente,
+            version=row['version'],
+            creado=row['creado']
         )
     
+    def to_dict(self, con_detalles=False):
+        """Retorna el pedido como diccionario serializable a JSON.
+        
+        Con `con_detalles` incluye la lista de líneas (se cargan si hace falta).
+        """
+        datos = {campo: getattr(self, campo) for campo in self.CAMPOS}
+        if con_detalles:
+            datos['detalles'] = [detalle.to_dict() for detalle in self.detalles]
+        return datos
+    
     def __str__(self):
         return f"Pedido(id={self.id}, cliente_id={self.cliente_id}, fecha='{self.fecha}', total={self.total})"
 
 
+class PedidoResumido(Pedido):
+    """Pedido con los totales de sus líneas, calculados en la misma consulta del listado."""
+    
+    CAMPOS = Pedido.CAMPOS + ('cantidad_lineas', 'cantidad_unidades', 'productos_distintos', 'total_calculado')
+    
+    def __init__(self, cantidad_lineas=0, cantidad_unidades=0, productos_distintos=0, total_calculado=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.cantidad_lineas = cantidad_lineas
+        self.cantidad_unidades = cantidad_unidades
+        self.productos_distintos = productos_distintos
+        self.total_calculado = total_calculado  # Suma de cantidad * precio_unitario de las líneas
+    
+    @classmethod
+    def from_db_row(cls, row, cliente=None):
+        """Crea una instancia de PedidoResumido a partir de una fila de PedidoController.listar_resumen."""
+        if row is None:
+            return None
+        return cls(
+            id=row['id'],
+            cliente_id=row['cliente_id'],
+            fecha=row['fecha'],
+            estado=row['estado'],
+            total=row['total'],
+            cliente=cliente,
+            version=row['version'],
+            creado=row['creado'],
+            cantidad_lineas=row['cantidad_lineas'],
+            cantidad_unidades=int(row['cantidad_unidades']),
+            productos_distintos=row['productos_distintos'],
+            total_calculado=row['total_calculado']
+        )
+    
+    def __str__(self):
+        return (f"PedidoResumido(id={self.id}, cliente_id={self.cliente_id}, fecha='{self.fecha}', "
+                f"lineas={self.cantidad_lineas}, total={self.total})")
+
+
 class DetallePedido:
     """Modelo para representar un detalle de pedido en el sistema."""
     
+    CAMPOS = ('id', 'pedido_id', 'producto_id', 'cantidad', 'precio_unitario')
+    
+    producto = Relacion(_cargar_productos)  # Objeto Producto asociado, carga diferida
+    
     def __init__(self, id=None, pedido_id=None, producto_id=None, cantidad=0, precio_unitario=0.0, producto=None):
         self.id = id
         self.pedido_id = pedido_id
         self.producto_id = producto_id
         self.cantidad = cantidad
         self.precio_unitario = precio_unitario
-        self.producto = producto  # Objeto Producto asociado
+        if producto is not None:
+            self.producto = producto
     
     @classmethod
     def from_db_row(cls, row, producto=None):
@@ -111,5 +349,9 @@ class DetallePedido:
         """Calcula el subtotal del detalle (precio unitario * cantidad)."""
         return self.precio_unitario * self.cantidad
     
+    def to_dict(self):
+        """Retorna el detalle como diccionario serializable a JSON."""
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+    
     def __str__(self):
         return f"DetallePedido(id={self.id}, pedido_id={self.pedido_id}, producto_id={self.producto_id}, cantidad={self.cantidad})"
\ No newline at end of file
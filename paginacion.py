@@ -0,0 +1,108 @@
+import collections
+import os
+import sys
+
+# Puntos de partida que se recuerdan para retroceder sin OFFSET
+PUNTOS_DE_PARTIDA = 10
+
+
+class VistaPaginada:
+    """Listado interactivo que trae y muestra una página por vez.
+
+    `obtener_pagina(limite, despues, filtro, saltar)` y `contar(filtro)`
+    son los métodos listar_pagina y contar de un controlador. Avanzar y
+    retroceder usan la última fila de la página anterior como punto de
+    partida (paginación por clave), así que cuesta lo mismo en la primera
+    página que en la número mil; solo saltar a una página usa OFFSET. En
+    memoria queda una página y los puntos de partida de las últimas
+    PUNTOS_DE_PARTIDA páginas recorridas; para retroceder más allá se usa
+    OFFSET.
+    """
+
+    def __init__(self, titulo, encabezado, formatear, obtener_pagina, contar, tamano=20, ayuda_filtro="texto"):
+        self.titulo = titulo
+        self.encabezado = encabezado
+        self.formatear = formatear
+        self.obtener_pagina = obtener_pagina
+        self.contar = contar
+        self.tamano = tamano
+        self.ayuda_filtro = ayuda_filtro
+        self.filtro = None
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.pagina = 1
+        self.total = self.contar(self.filtro)
+        # Punto de partida de las últimas páginas recorridas desde el último
+        # salto: (última fila de la página anterior, filas a saltar)
+        self._inicios = collections.deque([(None, 0)], maxlen=PUNTOS_DE_PARTIDA)
+        self.filas = self.obtener_pagina(self.tamano, None, self.filtro, 0)
+
+    def paginas(self):
+        return max(1, -(-self.total // self.tamano))
+
+    def siguiente(self):
+        if not self.filas or self.pagina >= self.paginas():
+            return
+        filas = self.obtener_pagina(self.tamano, self.filas[-1], self.filtro, 0)
+        if filas:
+            self._inicios.append((self.filas[-1], 0))
+            self.filas = filas
+            self.pagina += 1
+
+    def anterior(self):
+        if self.pagina == 1:
+            return
+        if len(self._inicios) > 1:
+            self._inicios.pop()
+            despues, saltar = self._inicios[-1]
+            self.filas = self.obtener_pagina(self.tamano, despues, self.filtro, saltar)
+            self.pagina -= 1
+        else:
+            self.ir_a(self.pagina - 1)
+
+    def ir_a(self, pagina):
+        pagina = min(max(1, pagina), self.paginas())
+        saltar = (pagina - 1) * self.tamano
+        self._inicios = collections.deque([(None, saltar)], maxlen=PUNTOS_DE_PARTIDA)
+        self.filas = self.obtener_pagina(self.tamano, None, self.filtro, saltar)
+        self.pagina = pagina
+
+    def filtrar(self, filtro):
+        self.filtro = filtro or None
+        self._reiniciar()
+
+    def renderizar(self):
+        """Arma la pantalla completa como un solo texto."""
+        lineas = [f"\n===== {self.titulo} =====\n"]
+        if self.filtro:
+            lineas.append(f"Filtro: {self.filtro}\n")
+        if not self.filas:
+            lineas.append("No hay registros para mostrar.")
+        else:
+            lineas.append(self.encabezado)
+            lineas.append("-" * len(self.encabezado))
+            lineas.extend(self.formatear(fila) for fila in self.filas)
+        lineas.append(f"\nPágina {self.pagina} de {self.paginas()} ({self.total} registros)")
+        lineas.append(f"[Enter] siguiente  [a] anterior  [número] ir a página  [f {self.ayuda_filtro}] filtrar  [f] quitar filtro  [0] volver")
+        return "\n".join(lineas) + "\n"
+
+    def mostrar(self):
+        """Muestra las páginas hasta que el usuario elige volver."""
+        while True:
+            os.system('cls' if os.name == 'nt' else 'clear')
+            # Una sola escritura por página en lugar de un print por fila
+            sys.stdout.write(self.renderizar())
+            sys.stdout.flush()
+
+            opcion = input("\nOpción: ").strip()
+            if opcion == "0":
+                break
+            elif opcion == "":
+                self.siguiente()
+            elif opcion.lower() == "a":
+                self.anterior()
+            elif opcion.isdigit():
+                self.ir_a(int(opcion))
+            elif opcion.lower() == "f" or opcion.lower().startswith("f "):
+                self.filtrar(opcion[2:].strip())
@@ -0,0 +1,141 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from database import get_db_connection
+
+# Códigos de error de SQLite que indican contención por bloqueos
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+class BaseDeDatosOcupada(sqlite3.OperationalError):
+    """Se agotaron los reintentos porque la base de datos seguía bloqueada."""
+
+
+class PoliticaReintentos:
+    """Parámetros para reintentar escrituras ante SQLITE_BUSY.
+
+    `busy_timeout_ms` es lo que SQLite espera internamente por el bloqueo
+    en cada intento; si aun así no lo obtiene, se espera un tiempo
+    exponencial con jitter completo (entre 0 y base * 2^intento, con tope
+    en `espera_maxima`) antes de reintentar, para que los escritores que
+    chocaron no vuelvan a hacerlo al mismo tiempo.
+    """
+
+    def __init__(self, busy_timeout_ms=2000, max_intentos=6, espera_base=0.05, espera_maxima=2.0):
+        self.busy_timeout_ms = busy_timeout_ms
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+
+    @classmethod
+    def desde_entorno(cls):
+        """Crea la política por defecto, configurable con variables de entorno."""
+        return cls(
+            busy_timeout_ms=int(os.environ.get('TECHLAB_BUSY_TIMEOUT_MS', 2000)),
+            max_intentos=int(os.environ.get('TECHLAB_MAX_INTENTOS', 6)),
+        )
+
+    def espera(self, intento):
+        """Segundos a esperar antes del reintento número `intento` (desde 1)."""
+        return random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** intento))
+
+
+class EstadisticasContencion:
+    """Contadores de contención de escrituras, seguros entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.escrituras = 0
+            self.bloqueos = 0  # Intentos que encontraron la base bloqueada
+            self.reintentos = 0
+            self.agotados = 0  # Escrituras que fallaron tras agotar los reintentos
+            self.segundos_esperando_bloqueo = 0.0  # Tiempo dentro de BEGIN IMMEDIATE
+            self.segundos_en_espera = 0.0  # Tiempo de espera entre reintentos
+
+    def sumar(self, **valores):
+        with self._lock:
+            for nombre, valor in valores.items():
+                setattr(self, nombre, getattr(self, nombre) + valor)
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                "escrituras": self.escrituras,
+                "bloqueos": self.bloqueos,
+                "reintentos": self.reintentos,
+                "agotados": self.agotados,
+                "segundos_esperando_bloqueo": round(self.segundos_esperando_bloqueo, 3),
+                "segundos_en_espera": round(self.segundos_en_espera, 3),
+            }
+
+
+POLITICA = PoliticaReintentos.desde_entorno()
+ESTADISTICAS = EstadisticasContencion()
+
+
+def es_contencion(error):
+    """Indica si un error de SQLite se debe a que la base estaba bloqueada."""
+    codigo = getattr(error, 'sqlite_errorcode', None)
+    if codigo is not None:
+        return codigo & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+    mensaje = str(error).lower()
+    return 'locked' in mensaje or 'busy' in mensaje
+
+
+def ejecutar_escritura(trabajo, politica=None):
+    """Ejecuta `trabajo(cursor)` en una transacción de escritura con reintentos.
+
+    La transacción empieza con BEGIN IMMEDIATE, que toma el bloqueo de
+    escritura al comenzar: así dos escritores nunca quedan esperando a que
+    el otro suelte un bloqueo de lectura para poder escribir. Ante
+    SQLITE_BUSY se deshace todo y se reintenta `trabajo` desde el
+    principio, por lo que debe poder ejecutarse más de una vez.
+
+    Retorna lo que retorne `trabajo`. Si se agotan los intentos lanza
+    BaseDeDatosOcupada; cualquier otro error se propaga sin reintentar.
+    """
+    politica = politica or POLITICA
+    for intento in range(1, politica.max_intentos + 1):
+        conn = get_db_connection()
+        conn.isolation_level = None
+        conn.execute(f'PRAGMA busy_timeout = {int(politica.busy_timeout_ms)}')
+        cursor = conn.cursor()
+        try:
+            inicio = time.perf_counter()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+            finally:
+                ESTADISTICAS.sumar(segundos_esperando_bloqueo=time.perf_counter() - inicio)
+            resultado = trabajo(cursor)
+            cursor.execute('COMMIT')
+            ESTADISTICAS.sumar(escrituras=1)
+            return resultado
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not es_contencion(e):
+                raise
+            ESTADISTICAS.sumar(bloqueos=1)
+            if intento == politica.max_intentos:
+                ESTADISTICAS.sumar(agotados=1)
+                raise BaseDeDatosOcupada(
+                    f"la base de datos sigue bloqueada después de {intento} intentos"
+                ) from e
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        espera = politica.espera(intento)
+        ESTADISTICAS.sumar(reintentos=1, segundos_en_espera=espera)
+        time.sleep(espera)
@@ -0,0 +1,405 @@
+"""Replicación incremental de techlab.db hacia una o más réplicas de solo lectura.
+
+Se apoya en el registro de cambios (cdc.py): cada réplica tiene un
+consumidor en la base principal, y en cada lote se envía el estado actual
+de las filas modificadas. La réplica aplica el lote en una transacción,
+con inserciones/actualizaciones por ID y bajas, y guarda en la misma
+transacción hasta qué cambio aplicó; por eso aplicar dos veces el mismo
+lote no tiene efecto.
+
+Un destino puede ser la ruta de un archivo SQLite o ``unix:/ruta/al/socket``
+de un proceso ``servir`` que aplica los lotes en su propia réplica.
+
+Uso:
+    python replicacion.py inicializar DESTINO
+    python replicacion.py sincronizar DESTINO [DESTINO ...] [--continuo] [--lote N]
+    python replicacion.py estado DESTINO [DESTINO ...]
+    python replicacion.py servir RUTA_REPLICA --socket RUTA_SOCKET
+"""
+import argparse
+import base64
+import json
+import os
+import socket
+import socketserver
+import sqlite3
+import struct
+import tempfile
+import time
+
+from cdc import ConsumidorCambios, TABLAS, filas_actuales, ultimos_por_fila
+from database import get_db_connection
+
+TAMANO_BLOQUE_INSTANTANEA = 1024 * 1024
+
+
+class ReplicaDesincronizada(Exception):
+    """La réplica perdió cambios que ya no están en el registro y debe reinicializarse."""
+
+
+class ReplicaLocal:
+    """Réplica en un archivo SQLite accesible desde este proceso."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def _conectar(self):
+        conn = get_db_connection(ruta=self.ruta)
+        # Los lotes llegan compactados y pueden no respetar el orden de las
+        # claves foráneas; la consistencia la garantiza la base principal
+        conn.execute('PRAGMA foreign_keys = OFF')
+        conn.isolation_level = None
+        return conn
+
+    def estado(self):
+        """Retorna la posición aplicada y el momento de la última aplicación."""
+        if not os.path.exists(self.ruta):
+            return {"posicion": None, "aplicado": None}
+        conn = self._conectar()
+        try:
+            filas = conn.execute('SELECT clave, valor FROM replica_estado').fetchall()
+        except sqlite3.OperationalError:
+            filas = []  # El archivo existe pero no fue inicializado como réplica
+        conn.close()
+        valores = {clave: valor for clave, valor in filas}
+        return {"posicion": valores.get("posicion"), "aplicado": valores.get("aplicado")}
+
+    def aplicar(self, lote):
+        """Aplica un lote de filas en una sola transacción.
+
+        `lote` tiene las claves "desde" (posición esperada), "hasta" (último
+        cambio incluido) y "filas": lista de {"tabla", "fila_id", "fila"};
+        "fila" es None si la fila fue eliminada. Un lote ya aplicado se
+        ignora. Retorna la nueva posición.
+        """
+        conn = self._conectar()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute("SELECT valor FROM replica_estado WHERE clave = 'posicion'")
+            posicion = cursor.fetchone()[0]
+            if lote["hasta"] <= posicion:
+                cursor.execute('ROLLBACK')
+                return posicion
+            if lote["desde"] > posicion:
+                raise ReplicaDesincronizada(f"faltan los cambios entre {posicion} y {lote['desde']}")
+
+            for entrada in lote["filas"]:
+                tabla = entrada["tabla"]
+                if tabla not in TABLAS:
+                    continue
+                fila = entrada["fila"]
+                if fila is None:
+                    cursor.execute(f'DELETE FROM {tabla} WHERE id = ?', (entrada["fila_id"],))
+                    continue
+                columnas = list(fila)
+                actualizaciones = ', '.join(f'{columna} = excluded.{columna}' for columna in columnas if columna != 'id')
+                cursor.execute(
+                    f'INSERT INTO {tabla} ({", ".join(columnas)}) VALUES ({", ".join("?" * len(columnas))}) '
+                    f'ON CONFLICT(id) DO UPDATE SET {actualizaciones}',
+                    [fila[columna] for columna in columnas]
+                )
+
+            cursor.execute("UPDATE replica_estado SET valor = ? WHERE clave = 'posicion'", (lote["hasta"],))
+            cursor.execute("UPDATE replica_estado SET valor = ? WHERE clave = 'aplicado'", (int(time.time()),))
+            cursor.execute('COMMIT')
+            return lote["hasta"]
+        except BaseException:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def preparar(self, posicion):
+        """Convierte una copia recién restaurada de la base principal en réplica.
+
+        Quita los triggers de captura de cambios (la réplica no los
+        necesita), vacía el registro copiado y guarda la posición desde la
+        que hay que continuar.
+        """
+        conn = self._conectar()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%\\_cdc\\_%' ESCAPE '\\'")
+        for (nombre,) in cursor.fetchall():
+            cursor.execute(f'DROP TRIGGER {nombre}')
+        cursor.execute('DELETE FROM cambios')
+        cursor.execute('DELETE FROM consumidores_cambios')
+        cursor.execute('CREATE TABLE IF NOT EXISTS replica_estado (clave TEXT PRIMARY KEY, valor INTEGER)')
+        cursor.execute("INSERT OR REPLACE INTO replica_estado (clave, valor) VALUES ('posicion', ?)", (posicion,))
+        cursor.execute("INSERT OR REPLACE INTO replica_estado (clave, valor) VALUES ('aplicado', ?)", (int(time.time()),))
+        cursor.execute('COMMIT')
+        conn.close()
+
+    def recibir_instantanea(self, ruta_copia, posicion):
+        """Reemplaza la réplica por una copia de la base principal de forma atómica."""
+        temporal = self.ruta + '.nueva'
+        os.replace(ruta_copia, temporal)
+        ReplicaLocal(temporal).preparar(posicion)
+        os.replace(temporal, self.ruta)
+
+
+def _enviar(conexion, mensaje):
+    datos = json.dumps(mensaje).encode('utf-8')
+    conexion.sendall(struct.pack('>I', len(datos)) + datos)
+
+
+def _recibir(conexion):
+    cabecera = _recibir_exacto(conexion, 4)
+    if cabecera is None:
+        return None
+    (longitud,) = struct.unpack('>I', cabecera)
+    return json.loads(_recibir_exacto(conexion, longitud).decode('utf-8'))
+
+
+def _recibir_exacto(conexion, cantidad):
+    partes = []
+    while cantidad:
+        parte = conexion.recv(min(cantidad, 65536))
+        if not parte:
+            return None
+        partes.append(parte)
+        cantidad -= len(parte)
+    return b''.join(partes)
+
+
+class ReplicaSocket:
+    """Réplica remota atendida por `python replicacion.py servir` en un socket Unix."""
+
+    def __init__(self, ruta_socket):
+        self.ruta_socket = ruta_socket
+
+    def _llamar(self, *mensajes):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexion:
+            conexion.connect(self.ruta_socket)
+            for mensaje in mensajes:
+                _enviar(conexion, mensaje)
+            respuesta = _recibir(conexion)
+        if respuesta is None:
+            raise ConnectionError("la réplica cerró la conexión")
+        if "error" in respuesta:
+            raise RuntimeError(f"error en la réplica: {respuesta['error']}")
+        return respuesta["resultado"]
+
+    def estado(self):
+        return self._llamar({"operacion": "estado"})
+
+    def aplicar(self, lote):
+        return self._llamar({"operacion": "aplicar", "lote": lote})
+
+    def recibir_instantanea(self, ruta_copia, posicion):
+        def mensajes():
+            with open(ruta_copia, 'rb') as archivo:
+                while True:
+                    bloque = archivo.read(TAMANO_BLOQUE_INSTANTANEA)
+                    if not bloque:
+                        break
+                    yield {"operacion": "bloque", "datos": base64.b64encode(bloque).decode('ascii')}
+            yield {"operacion": "instantanea", "posicion": posicion}
+        self._llamar(*mensajes())
+        os.remove(ruta_copia)
+
+
+class _ManejadorReplica(socketserver.BaseRequestHandler):
+    def handle(self):
+        replica = self.server.replica
+        copia = None
+        try:
+            while True:
+                mensaje = _recibir(self.request)
+                if mensaje is None:
+                    return
+                operacion = mensaje["operacion"]
+                if operacion == "bloque":
+                    if copia is None:
+                        copia = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(replica.ruta)), delete=False)
+                    copia.write(base64.b64decode(mensaje["datos"]))
+                    continue
+                if operacion == "estado":
+                    resultado = replica.estado()
+                elif operacion == "aplicar":
+                    resultado = replica.aplicar(mensaje["lote"])
+                elif operacion == "instantanea":
+                    copia.close()
+                    replica.recibir_instantanea(copia.name, mensaje["posicion"])
+                    copia = None
+                    resultado = True
+                else:
+                    raise ValueError(f"operación desconocida: {operacion}")
+                _enviar(self.request, {"resultado": resultado})
+                return
+        except Exception as e:
+            _enviar(self.request, {"error": str(e)})
+        finally:
+            if copia is not None:
+                copia.close()
+                os.remove(copia.name)
+
+
+def servir(ruta_replica, ruta_socket):
+    """Atiende una réplica local a través de un socket Unix (una conexión por vez)."""
+    if os.path.exists(ruta_socket):
+        os.remove(ruta_socket)
+    with socketserver.UnixStreamServer(ruta_socket, _ManejadorReplica) as servidor:
+        servidor.replica = ReplicaLocal(ruta_replica)
+        print(f"Réplica {ruta_replica} escuchando en {ruta_socket}")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            print("\nServidor de réplica detenido.")
+
+
+def crear_destino(especificacion):
+    """Crea una réplica a partir de una ruta o de ``unix:/ruta/al/socket``."""
+    if especificacion.startswith('unix:'):
+        return ReplicaSocket(especificacion[len('unix:'):])
+    return ReplicaLocal(especificacion)
+
+
+class Replicador:
+    """Envía los cambios de la base principal a un destino."""
+
+    def __init__(self, especificacion, tamano_lote=1000):
+        self.especificacion = especificacion
+        self.destino = crear_destino(especificacion)
+        self.tamano_lote = tamano_lote
+        self.nombre_consumidor = f"replica:{especificacion}"
+
+    def _consumidor_registrado(self):
+        conn = get_db_connection()
+        row = conn.execute('SELECT 1 FROM consumidores_cambios WHERE nombre = ?', (self.nombre_consumidor,)).fetchone()
+        conn.close()
+        return row is not None
+
+    def inicializar(self):
+        """Copia una instantánea de la base principal y registra la réplica.
+
+        La posición se toma antes de copiar: los cambios confirmados
+        durante la copia se vuelven a aplicar al sincronizar, lo que es
+        inocuo porque aplicar es idempotente.
+        """
+        conn = get_db_connection()
+        posicion = conn.execute('SELECT COALESCE(MAX(id), 0) FROM cambios').fetchone()[0]
+        ConsumidorCambios(self.nombre_consumidor).confirmar(posicion)
+
+        descriptor, ruta_copia = tempfile.mkstemp(suffix='.db')
+        os.close(descriptor)
+        copia = sqlite3.connect(ruta_copia)
+        conn.backup(copia)
+        copia.close()
+        conn.close()
+
+        self.destino.recibir_instantanea(ruta_copia, posicion)
+        return posicion
+
+    def _leer_lote(self, posicion):
+        """Lee los cambios posteriores a `posicion` y el estado actual de sus filas.
+
+        Ambas lecturas se hacen en la misma transacción, así el estado
+        enviado es consistente con los cambios incluidos en el lote.
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        cursor.execute('SELECT * FROM cambios WHERE id > ? ORDER BY id LIMIT ?', (posicion, self.tamano_lote))
+        cambios = cursor.fetchall()
+        filas = filas_actuales(cursor, cambios)
+        cursor.execute('COMMIT')
+        conn.close()
+        if not cambios:
+            return None
+        return {
+            "desde": posicion,
+            "hasta": cambios[-1]['id'],
+            "momento": cambios[0]['momento'],
+            "filas": [
+                {
+                    "tabla": cambio['tabla'],
+                    "fila_id": cambio['fila_id'],
+                    "fila": dict(filas[(cambio['tabla'], cambio['fila_id'])])
+                    if filas.get((cambio['tabla'], cambio['fila_id'])) is not None else None,
+                }
+                for cambio in ultimos_por_fila(cambios)
+            ],
+        }
+
+    def sincronizar(self):
+        """Aplica en la réplica todos los cambios pendientes. Retorna la cantidad de lotes."""
+        posicion = self.destino.estado()["posicion"]
+        if posicion is None:
+            raise ReplicaDesincronizada(f"{self.especificacion} no está inicializada")
+        if not self._consumidor_registrado():
+            # El consumidor fue dado de baja por inactividad y el registro
+            # pudo haberse purgado: solo una nueva instantánea es segura
+            raise ReplicaDesincronizada(f"{self.especificacion} debe reinicializarse")
+
+        consumidor = ConsumidorCambios(self.nombre_consumidor)
+        lotes = 0
+        while True:
+            lote = self._leer_lote(posicion)
+            if lote is None:
+                return lotes
+            posicion = self.destino.aplicar(lote)
+            consumidor.confirmar(posicion)
+            lotes += 1
+
+    def atraso(self):
+        """Retorna el atraso de la réplica en cambios y en segundos."""
+        posicion = self.destino.estado()["posicion"] or 0
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*), MIN(momento) FROM cambios WHERE id > ?', (posicion,))
+        pendientes, primero = cursor.fetchone()
+        conn.close()
+        segundos = int(time.time()) - primero if primero is not None else 0
+        return {"destino": self.especificacion, "posicion": posicion, "cambios": pendientes, "segundos": segundos}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replicación incremental de techlab.db.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    inicializar_parser = subparsers.add_parser("inicializar", help="copia una instantánea al destino")
+    inicializar_parser.add_argument("destino")
+
+    sincronizar_parser = subparsers.add_parser("sincronizar", help="envía los cambios pendientes")
+    sincronizar_parser.add_argument("destinos", nargs="+")
+    sincronizar_parser.add_argument("--lote", type=int, default=1000)
+    sincronizar_parser.add_argument("--continuo", action="store_true", help="seguir sincronizando hasta Ctrl+C")
+    sincronizar_parser.add_argument("--intervalo", type=float, default=1.0)
+
+    estado_parser = subparsers.add_parser("estado", help="muestra el atraso de cada réplica")
+    estado_parser.add_argument("destinos", nargs="+")
+
+    servir_parser = subparsers.add_parser("servir", help="atiende una réplica por socket Unix")
+    servir_parser.add_argument("replica")
+    servir_parser.add_argument("--socket", required=True)
+
+    args = parser.parse_args()
+    if args.comando == "inicializar":
+        posicion = Replicador(args.destino).inicializar()
+        print(f"Réplica inicializada en la posición {posicion}.")
+        Replicador(args.destino).sincronizar()
+    elif args.comando == "sincronizar":
+        replicadores = [Replicador(destino, args.lote) for destino in args.destinos]
+        try:
+            while True:
+                for replicador in replicadores:
+                    replicador.sincronizar()
+                if not args.continuo:
+                    break
+                time.sleep(args.intervalo)
+        except KeyboardInterrupt:
+            print("\nReplicación detenida por el usuario.")
+        for replicador in replicadores:
+            print(json.dumps(replicador.atraso(), ensure_ascii=False))
+    elif args.comando == "estado":
+        for destino in args.destinos:
+            print(json.dumps(Replicador(destino).atraso(), ensure_ascii=False))
+    else:
+        servir(args.replica, args.socket)
+
+
+if __name__ == "__main__":
+    main()
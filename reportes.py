@@ -0,0 +1,263 @@
+"""Reportes de ventas sobre el historial de pedidos, calculados en paralelo.
+
+El rango de fechas se divide en particiones con una cantidad parecida de
+pedidos. Cada partición se calcula en un proceso aparte, con su propia
+conexión de solo lectura, y produce sumas parciales (por mes, por estado,
+por producto y por cliente). El proceso principal las suma: como todas
+son sumas y conteos, el resultado es el mismo que el de una sola consulta
+sobre todo el rango. Hay más particiones que procesos para que ninguno
+quede esperando al más lento.
+
+Cada partición lee una instantánea propia: si hay escrituras mientras se
+genera el reporte, unas particiones pueden verlas y otras no. Para cierres
+de período conviene generarlo sobre fechas ya cerradas.
+
+Uso:
+    python reportes.py --desde 2024-01-01 --hasta 2025-01-01
+    python reportes.py --procesos 8 --estado Entregado --estado Enviado
+"""
+import argparse
+import datetime
+import itertools
+import os
+import pathlib
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from database import BackendMemoria, backend_actual, get_db_connection
+
+# Particiones por proceso (más particiones reparten mejor el trabajo)
+PARTICIONES_POR_PROCESO = 4
+
+
+def _condiciones(desde, hasta, estados):
+    condiciones, parametros = ['p.fecha >= ?', 'p.fecha < ?'], [desde, hasta]
+    if estados is not None:
+        estados = list(estados)
+        condiciones.append(f'p.estado IN ({",".join("?" * len(estados))})' if estados else '0')
+        parametros.extend(estados)
+    return ' AND '.join(condiciones), parametros
+
+
+def _conectar_solo_lectura(ruta):
+    uri = pathlib.Path(ruta).resolve().as_uri() + '?mode=ro'
+    return sqlite3.connect(uri, uri=True)
+
+
+def _sumar(destino, clave, valores):
+    actuales = destino.get(clave)
+    destino[clave] = list(valores) if actuales is None else [a + b for a, b in zip(actuales, valores)]
+
+
+def calcular_particion(desde, hasta, estados=None, ruta=None):
+    """Sumas parciales de los pedidos con fecha en [desde, hasta).
+
+    Con `ruta` abre su propia conexión de solo lectura (la usan los
+    procesos del pool); sin ella usa la base configurada. Retorna un
+    diccionario de listas y números, que se puede pasar entre procesos.
+    """
+    conn = _conectar_solo_lectura(ruta) if ruta else get_db_connection()
+    conn.row_factory = None
+    where, parametros = _condiciones(desde, hasta, estados)
+    parcial = {'por_mes': {}, 'por_estado': {}, 'por_producto': {}, 'por_cliente': {}}
+    try:
+        # Una sola transacción: las tres consultas ven la misma instantánea
+        conn.execute('BEGIN')
+        for mes, estado, pedidos, total in conn.execute(f'''
+            SELECT substr(p.fecha, 1, 7), p.estado, COUNT(*), TOTAL(p.total)
+            FROM pedidos p WHERE {where}
+            GROUP BY 1, 2
+        ''', parametros):
+            _sumar(parcial['por_mes'], mes, (pedidos, total))
+            _sumar(parcial['por_estado'], estado, (pedidos, total))
+        for cliente_id, pedidos, total in conn.execute(f'''
+            SELECT p.cliente_id, COUNT(*), TOTAL(p.total)
+            FROM pedidos p WHERE {where}
+            GROUP BY p.cliente_id
+        ''', parametros):
+            parcial['por_cliente'][cliente_id] = [pedidos, total]
+        for producto_id, unidades, importe in conn.execute(f'''
+            SELECT d.producto_id, SUM(d.cantidad), TOTAL(d.cantidad * d.precio_unitario)
+            FROM pedidos p JOIN detalles_pedido d ON d.pedido_id = p.id
+            WHERE {where}
+            GROUP BY d.producto_id
+        ''', parametros):
+            parcial['por_producto'][producto_id] = [unidades, importe]
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+    return parcial
+
+
+def combinar(parciales):
+    """Suma las sumas parciales de varias particiones."""
+    resultado = {'por_mes': {}, 'por_estado': {}, 'por_producto': {}, 'por_cliente': {}}
+    for parcial in parciales:
+        for seccion, valores in parcial.items():
+            for clave, sumas in valores.items():
+                _sumar(resultado[seccion], clave, sumas)
+    return resultado
+
+
+def rango_completo(conn=None):
+    """(desde, hasta) que abarca todos los pedidos; `hasta` es el día siguiente al último."""
+    propia = conn is None
+    if propia:
+        conn = get_db_connection()
+    try:
+        # Por separado, cada extremo se lee directo del índice de fechas
+        primera, ultima = conn.execute(
+            'SELECT (SELECT MIN(fecha) FROM pedidos), (SELECT MAX(fecha) FROM pedidos)'
+        ).fetchone()
+    finally:
+        if propia:
+            conn.close()
+    if primera is None:
+        return None, None
+    siguiente = datetime.date.fromisoformat(ultima[:10]) + datetime.timedelta(days=1)
+    return primera[:10], siguiente.isoformat()
+
+
+def particiones(desde, hasta, cantidad, estados=None, conn=None):
+    """Divide [desde, hasta) en hasta `cantidad` rangos con una cantidad parecida de pedidos.
+
+    Los cortes se eligen con la cantidad de pedidos de cada fecha (una
+    sola lectura del índice de fechas), así que los meses con más ventas
+    quedan en rangos más cortos. Los pedidos de una misma fecha quedan
+    siempre en la misma partición.
+    """
+    propia = conn is None
+    if propia:
+        conn = get_db_connection()
+    where, parametros = _condiciones(desde, hasta, estados)
+    try:
+        por_fecha = conn.execute(
+            f'SELECT p.fecha, COUNT(*) FROM pedidos p WHERE {where} GROUP BY p.fecha ORDER BY p.fecha', parametros
+        ).fetchall()
+    finally:
+        if propia:
+            conn.close()
+    total = sum(pedidos for _, pedidos in por_fecha)
+    cortes = [desde]
+    acumulado = 0
+    for fecha, pedidos in por_fecha:
+        # Se corta antes de la fecha que pasa la siguiente fracción del total
+        if acumulado >= total * len(cortes) / cantidad and fecha > cortes[-1]:
+            cortes.append(fecha)
+        acumulado += pedidos
+    cortes.append(hasta)
+    return list(zip(cortes, cortes[1:]))
+
+
+def _nombres(conn, tabla, ids):
+    nombres = {}
+    ids = list(ids)
+    for inicio in range(0, len(ids), 500):
+        bloque = ids[inicio:inicio + 500]
+        nombres.update(conn.execute(
+            f'SELECT id, nombre FROM {tabla} WHERE id IN ({",".join("?" * len(bloque))})', bloque
+        ).fetchall())
+    return nombres
+
+
+def generar_reporte(desde=None, hasta=None, estados=None, procesos=None, top=10):
+    """Calcula el reporte de ventas de [desde, hasta) (por defecto, todo el historial).
+
+    Retorna un diccionario con los totales, los meses y estados
+    ({clave: {"pedidos", "total"}}), y los `top` productos y clientes con
+    mayor facturación. Los importes se redondean a centavos, así que no
+    dependen de cómo se particionó el rango. `procesos` es la cantidad de procesos (por defecto,
+    uno por núcleo); con 1, o con la base en memoria (que otros procesos no
+    ven), las particiones se calculan en este proceso.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    backend = backend_actual()
+    if isinstance(backend, BackendMemoria):
+        procesos = 1
+
+    conn = get_db_connection()
+    try:
+        if desde is None or hasta is None:
+            primera, siguiente = rango_completo(conn)
+            desde = desde or primera or '0000-01-01'
+            hasta = hasta or siguiente or desde
+        rangos = particiones(desde, hasta, procesos * PARTICIONES_POR_PROCESO, estados, conn)
+        inicios, fines = [inicio for inicio, _ in rangos], [fin for _, fin in rangos]
+        if procesos == 1:
+            datos = combinar(map(calcular_particion, inicios, fines, itertools.repeat(estados)))
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                datos = combinar(pool.map(
+                    calcular_particion, inicios, fines, itertools.repeat(estados), itertools.repeat(backend.ruta)
+                ))
+
+        # Mayor facturación primero; a igual importe, por ID (el orden no depende de las particiones)
+        ranking_productos = sorted(datos['por_producto'].items(), key=lambda item: (-round(item[1][1], 2), item[0]))[:top]
+        ranking_clientes = sorted(datos['por_cliente'].items(), key=lambda item: (-round(item[1][1], 2), item[0]))[:top]
+        nombres_productos = _nombres(conn, 'productos', [id for id, _ in ranking_productos])
+        nombres_clientes = _nombres(conn, 'clientes', [id for id, _ in ranking_clientes])
+    finally:
+        conn.close()
+
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'particiones': len(rangos),
+        'pedidos': sum(pedidos for pedidos, _ in datos['por_estado'].values()),
+        'total': round(sum(total for _, total in datos['por_estado'].values()), 2),
+        'unidades': sum(unidades for unidades, _ in datos['por_producto'].values()),
+        'meses': {mes: {'pedidos': pedidos, 'total': round(total, 2)} for mes, (pedidos, total) in sorted(datos['por_mes'].items())},
+        'estados': {estado: {'pedidos': pedidos, 'total': round(total, 2)} for estado, (pedidos, total) in sorted(datos['por_estado'].items())},
+        'productos': [
+            {'id': id, 'nombre': nombres_productos.get(id), 'unidades': unidades, 'total': round(total, 2)}
+            for id, (unidades, total) in ranking_productos
+        ],
+        'clientes': [
+            {'id': id, 'nombre': nombres_clientes.get(id), 'pedidos': pedidos, 'total': round(total, 2)}
+            for id, (pedidos, total) in ranking_clientes
+        ],
+    }
+
+
+def imprimir(reporte):
+    print(f"Ventas desde {reporte['desde']} hasta {reporte['hasta']} (sin incluir)")
+    print(f"Pedidos: {reporte['pedidos']}  Unidades: {reporte['unidades']}  Total: ${reporte['total']:.2f}")
+
+    print(f"\n{'Mes':<10}{'Pedidos':>10}{'Total':>16}")
+    for mes, datos in reporte['meses'].items():
+        print(f"{mes:<10}{datos['pedidos']:>10}{datos['total']:>16.2f}")
+
+    print(f"\n{'Estado':<14}{'Pedidos':>10}{'Total':>16}")
+    for estado, datos in reporte['estados'].items():
+        print(f"{estado:<14}{datos['pedidos']:>10}{datos['total']:>16.2f}")
+
+    print(f"\n{'Producto':<40}{'Unidades':>10}{'Total':>16}")
+    for producto in reporte['productos']:
+        nombre = producto['nombre'] or f"#{producto['id']}"
+        print(f"{nombre[:39]:<40}{producto['unidades']:>10}{producto['total']:>16.2f}")
+
+    print(f"\n{'Cliente':<40}{'Pedidos':>10}{'Total':>16}")
+    for cliente in reporte['clientes']:
+        nombre = cliente['nombre'] or f"#{cliente['id']}"
+        print(f"{nombre[:39]:<40}{cliente['pedidos']:>10}{cliente['total']:>16.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de ventas calculado en paralelo por rangos de fechas.")
+    parser.add_argument("--desde", help="pedidos desde esta fecha (YYYY-MM-DD); por defecto, el primero")
+    parser.add_argument("--hasta", help="pedidos anteriores a esta fecha (YYYY-MM-DD); por defecto, todos")
+    parser.add_argument("--estado", action="append", dest="estados", help="solo pedidos en este estado (repetible)")
+    parser.add_argument("--procesos", type=int, help="procesos en paralelo (por defecto, uno por núcleo)")
+    parser.add_argument("--top", type=int, default=10, help="cantidad de productos y clientes en los rankings")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    reporte = generar_reporte(args.desde, args.hasta, args.estados, args.procesos, args.top)
+    segundos = time.perf_counter() - inicio
+    imprimir(reporte)
+    print(f"\n{reporte['particiones']} particiones en {segundos:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Reservas de stock mientras se arma un pedido.
+
+Cada pedido en preparación tiene un `Carrito`. Al agregar un producto, el
+carrito reserva esas unidades por un tiempo limitado: los demás carritos
+y los pedidos que se crean por otras vías (ingesta, API) ven el stock
+disponible, es decir, el stock menos las reservas vigentes de otros
+carritos. Al confirmar el pedido (PedidoController.crear con
+`carrito=carrito.clave`) las reservas se convierten en el descuento de
+stock definitivo: mientras estuvieron vigentes, nadie más pudo vender
+esas unidades.
+
+Cada operación sobre el carrito extiende el vencimiento de sus reservas
+vigentes. Una reserva vencida deja de contar enseguida; la tarea
+`purgar_reservas` del mantenimiento borra las filas vencidas.
+
+Las operaciones que no obtienen el bloqueo de escritura tras agotar los
+reintentos lanzan reintentos.BaseDeDatosOcupada, como los controladores.
+"""
+import os
+import sqlite3
+import time
+import uuid
+
+from database import get_db_connection
+from reintentos import BaseDeDatosOcupada, ejecutar_escritura
+
+# Segundos que dura una reserva sin actividad en el carrito
+DURACION_RESERVA = int(os.environ.get('TECHLAB_DURACION_RESERVA', 15 * 60))
+
+_DISPONIBLE = '''
+    SELECT p.id, p.stock - (
+        SELECT TOTAL(r.cantidad) FROM reservas r
+        WHERE r.producto_id = p.id AND r.vence > ? AND r.carrito IS NOT ?
+    ) AS disponible
+    FROM productos p WHERE p.id IN ({marcas})
+'''
+
+
+def disponibles(producto_ids, carrito=None):
+    """Retorna {producto_id: unidades disponibles} sin contar lo reservado por otros carritos.
+
+    Las reservas del `carrito` indicado (su clave) no se descuentan.
+    """
+    ids = list(producto_ids)
+    resultado = {}
+    conn = get_db_connection()
+    try:
+        for inicio in range(0, len(ids), 500):
+            bloque = ids[inicio:inicio + 500]
+            cursor = conn.execute(
+                _DISPONIBLE.format(marcas=','.join('?' * len(bloque))), (int(time.time()), carrito, *bloque)
+            )
+            resultado.update((row['id'], int(row['disponible'])) for row in cursor)
+    finally:
+        conn.close()
+    return resultado
+
+
+def purgar_vencidas(conn):
+    """Elimina las reservas vencidas. Retorna la cantidad eliminada."""
+    cursor = conn.execute('DELETE FROM reservas WHERE vence <= ?', (int(time.time()),))
+    return cursor.rowcount
+
+
+class Carrito:
+    """Reservas de un pedido en preparación, identificadas por una clave única."""
+
+    def __init__(self, duracion=DURACION_RESERVA, clave=None):
+        self.clave = clave or uuid.uuid4().hex
+        self.duracion = duracion
+
+    def disponible(self, producto_id):
+        """Unidades del producto que este carrito puede reservar en total."""
+        try:
+            return disponibles([producto_id], self.clave).get(producto_id, 0)
+        except sqlite3.Error as e:
+            print(f"Error al consultar stock disponible: {e}")
+            return 0
+
+    def reservar(self, producto_id, cantidad):
+        """Deja reservadas `cantidad` unidades del producto para este carrito (reemplaza la reserva anterior).
+
+        Retorna True si había unidades suficientes sin contar las reservadas
+        por otros carritos; si no, la reserva anterior queda como estaba.
+        """
+        try:
+            def trabajo(cursor):
+                ahora = int(time.time())
+                cursor.execute(
+                    _DISPONIBLE.format(marcas='?'), (ahora, self.clave, producto_id)
+                )
+                row = cursor.fetchone()
+                if row is None or row['disponible'] < cantidad:
+                    return False
+                cursor.execute(
+                    '''
+                    INSERT INTO reservas (carrito, producto_id, cantidad, vence) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (carrito, producto_id) DO UPDATE SET cantidad = excluded.cantidad, vence = excluded.vence
+                    ''',
+                    (self.clave, producto_id, cantidad, ahora + self.duracion)
+                )
+                self._renovar(cursor, ahora)
+                return True
+
+            return ejecutar_escritura(trabajo)
+        except BaseDeDatosOcupada:
+            raise
+        except sqlite3.Error as e:
+            print(f"Error al reservar stock: {e}")
+            return False
+
+    def liberar(self, producto_id):
+        """Quita la reserva de un producto del carrito."""
+        try:
+            def trabajo(cursor):
+                cursor.execute('DELETE FROM reservas WHERE carrito = ? AND producto_id = ?', (self.clave, producto_id))
+                self._renovar(cursor, int(time.time()))
+
+            ejecutar_escritura(trabajo)
+            return True
+        except BaseDeDatosOcupada:
+            raise
+        except sqlite3.Error as e:
+            print(f"Error al liberar reserva: {e}")
+            return False
+
+    def cancelar(self):
+        """Quita todas las reservas del carrito (pedido abandonado)."""
+        try:
+            ejecutar_escritura(lambda cursor: cursor.execute('DELETE FROM reservas WHERE carrito = ?', (self.clave,)))
+            return True
+        except BaseDeDatosOcupada:
+            raise
+        except sqlite3.Error as e:
+            print(f"Error al cancelar reservas: {e}")
+            return False
+
+    def _renovar(self, cursor, ahora):
+        # Una reserva ya vencida no se renueva: sus unidades pueden estar
+        # reservadas por otro carrito. Al confirmar el pedido se vuelve a
+        # verificar el stock de esos productos
+        cursor.execute('DELETE FROM reservas WHERE carrito = ? AND vence <= ?', (self.clave, ahora))
+        cursor.execute('UPDATE reservas SET vence = ? WHERE carrito = ?', (ahora + self.duracion, self.clave))
@@ -0,0 +1,179 @@
+"""Exportación de clientes, productos y pedidos a JSON.
+
+Para objetos ya cargados, `a_json` usa el `to_dict` de los modelos. Para
+listados completos, las funciones `exportar_*` escriben el arreglo JSON
+elemento por elemento directamente desde el cursor: no crean objetos de
+los modelos ni arman la lista entera, así que la memoria usada no depende
+de la cantidad de filas. Los pedidos se exportan con sus líneas anidadas
+a partir de una sola consulta ordenada por pedido.
+
+Las claves de cada objeto son las de `CAMPOS` de su modelo, de modo que
+las dos vías producen el mismo JSON.
+
+Uso:
+    python serializacion.py clientes > clientes.json
+    python serializacion.py pedidos --detalles --desde 2024-01-01 --salida pedidos.json
+"""
+import argparse
+import json
+import sys
+
+from database import get_db_connection
+from models import Cliente, DetallePedido, Pedido, Producto
+
+# Filas que se leen del cursor por vez
+TAMANO_LOTE = 1000
+
+MODELOS = {'clientes': Cliente, 'productos': Producto, 'pedidos': Pedido}
+
+_codificador = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _a_datos(objeto, con_detalles=False):
+    if isinstance(objeto, Pedido):
+        return objeto.to_dict(con_detalles=con_detalles)
+    if hasattr(objeto, 'to_dict'):
+        return objeto.to_dict()
+    if isinstance(objeto, (list, tuple)):
+        return [_a_datos(elemento, con_detalles) for elemento in objeto]
+    return objeto
+
+
+def a_json(objeto, con_detalles=False):
+    """Serializa un modelo, una lista de modelos o cualquier valor compatible con JSON.
+
+    Con `con_detalles`, los pedidos incluyen sus líneas en "detalles", como
+    en exportar_pedidos(con_detalles=True).
+    """
+    return _codificador.encode(_a_datos(objeto, con_detalles))
+
+
+def escribir_arreglo(salida, elementos):
+    """Escribe en `salida` un arreglo JSON, un elemento por línea. Retorna la cantidad escrita."""
+    codificar = _codificador.encode
+    cantidad = 0
+    salida.write('[')
+    for elemento in elementos:
+        salida.write(',\n' if cantidad else '\n')
+        salida.write(codificar(elemento))
+        cantidad += 1
+    salida.write('\n]\n' if cantidad else ']\n')
+    return cantidad
+
+
+def _filas(cursor):
+    while True:
+        bloque = cursor.fetchmany(TAMANO_LOTE)
+        if not bloque:
+            return
+        yield from bloque
+
+
+def _condiciones_pedidos(desde, hasta, estados):
+    condiciones, parametros = [], []
+    if desde:
+        condiciones.append('p.fecha >= ?')
+        parametros.append(desde)
+    if hasta:
+        condiciones.append('p.fecha < ?')
+        parametros.append(hasta)
+    if estados is not None:
+        estados = list(estados)
+        condiciones.append(f'p.estado IN ({",".join("?" * len(estados))})' if estados else '0')
+        parametros.extend(estados)
+    return (f'WHERE {" AND ".join(condiciones)}' if condiciones else ''), parametros
+
+
+def _conectar(conn):
+    """Conexión sin row_factory: las filas como tuplas se convierten más rápido."""
+    propia = conn is None
+    if propia:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return conn, cursor, propia
+
+
+def exportar_tabla(salida, tabla, conn=None):
+    """Escribe todos los clientes o productos como arreglo JSON. Retorna la cantidad."""
+    campos = MODELOS[tabla].CAMPOS
+    conn, cursor, propia = _conectar(conn)
+    try:
+        cursor.execute(f'SELECT {", ".join(campos)} FROM {tabla} ORDER BY id')
+        return escribir_arreglo(salida, (dict(zip(campos, fila)) for fila in _filas(cursor)))
+    finally:
+        if propia:
+            conn.close()
+
+
+def _pedidos_con_detalles(cursor):
+    """Agrupa las filas consecutivas de un mismo pedido en un objeto con sus líneas."""
+    campos = Pedido.CAMPOS
+    campos_detalle = DetallePedido.CAMPOS
+    cantidad = len(campos)
+    actual = None
+    for fila in _filas(cursor):
+        if actual is None or actual['id'] != fila[0]:
+            if actual is not None:
+                yield actual
+            actual = dict(zip(campos, fila[:cantidad]))
+            actual['detalles'] = []
+        if fila[cantidad] is not None:  # Pedido sin líneas (LEFT JOIN)
+            actual['detalles'].append(dict(zip(campos_detalle, fila[cantidad:])))
+    if actual is not None:
+        yield actual
+
+
+def exportar_pedidos(salida, conn=None, desde=None, hasta=None, estados=None, con_detalles=False):
+    """Escribe los pedidos como arreglo JSON, con sus líneas en "detalles" si se pide.
+
+    Admite los mismos filtros que PedidoController.listar_resumen. Las
+    líneas salen de la misma consulta que los pedidos (ordenada por pedido
+    y línea), así que solo hay en memoria un pedido por vez.
+    """
+    where, parametros = _condiciones_pedidos(desde, hasta, estados)
+    columnas = ', '.join(f'p.{campo}' for campo in Pedido.CAMPOS)
+    conn, cursor, propia = _conectar(conn)
+    try:
+        if con_detalles:
+            columnas_detalle = ', '.join(f'd.{campo}' for campo in DetallePedido.CAMPOS)
+            cursor.execute(f'''
+                SELECT {columnas}, {columnas_detalle}
+                FROM pedidos p LEFT JOIN detalles_pedido d ON d.pedido_id = p.id
+                {where}
+                ORDER BY p.id, d.id
+            ''', parametros)
+            return escribir_arreglo(salida, _pedidos_con_detalles(cursor))
+        cursor.execute(f'SELECT {columnas} FROM pedidos p {where} ORDER BY p.id', parametros)
+        campos = Pedido.CAMPOS
+        return escribir_arreglo(salida, (dict(zip(campos, fila)) for fila in _filas(cursor)))
+    finally:
+        if propia:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta clientes, productos o pedidos a JSON.")
+    parser.add_argument("tabla", choices=sorted(MODELOS))
+    parser.add_argument("--salida", help="archivo de salida (por defecto, la salida estándar)")
+    parser.add_argument("--detalles", action="store_true", help="incluir las líneas de cada pedido")
+    parser.add_argument("--desde", help="pedidos desde esta fecha (YYYY-MM-DD)")
+    parser.add_argument("--hasta", help="pedidos anteriores a esta fecha (YYYY-MM-DD)")
+    parser.add_argument("--estado", action="append", dest="estados", help="solo pedidos en este estado (repetible)")
+    args = parser.parse_args()
+
+    salida = open(args.salida, 'w', encoding='utf-8') if args.salida else sys.stdout
+    try:
+        if args.tabla == 'pedidos':
+            cantidad = exportar_pedidos(salida, desde=args.desde, hasta=args.hasta, estados=args.estados,
+                                        con_detalles=args.detalles)
+        else:
+            cantidad = exportar_tabla(salida, args.tabla)
+    finally:
+        if args.salida:
+            salida.close()
+    print(f"{cantidad} {args.tabla} exportados.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Base común de las pruebas: cada prueba usa su propia base en un directorio temporal."""
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import database
+from database import BackendMemoria, BackendSQLite, get_db_connection, init_db
+
+
+class PruebaConBase(unittest.TestCase):
+    """Crea una base vacía y la deja como almacenamiento actual.
+
+    Por defecto la base es un archivo en un directorio temporal. Con
+    TECHLAB_BACKEND=memoria las pruebas usan una base en memoria (más
+    rápido), salvo las clases con `requiere_archivo`, que necesitan el
+    archivo (copias, otros procesos). El directorio temporal se crea igual,
+    para los demás archivos de la prueba.
+    """
+
+    requiere_archivo = False
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix="techlab-prueba-")
+        self.ruta_db = os.path.join(self.directorio, "techlab.db")
+        if os.environ.get('TECHLAB_BACKEND') == 'memoria' and not self.requiere_archivo:
+            self.backend = BackendMemoria()
+        else:
+            self.backend = BackendSQLite(self.ruta_db)
+        self._anterior = database.usar_backend(self.backend)
+        with contextlib.redirect_stdout(io.StringIO()):
+            init_db()
+
+    def tearDown(self):
+        database.usar_backend(self._anterior)
+        self.backend.cerrar()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def consultar(self, sql, parametros=()):
+        conn = get_db_connection()
+        try:
+            return [tuple(row) for row in conn.execute(sql, parametros)]
+        finally:
+            conn.close()
+
+    def crear_cliente(self, nombre="Ana Pérez", email="ana@ejemplo.com"):
+        conn = get_db_connection()
+        try:
+            with conn:
+                return conn.execute(
+                    'INSERT INTO clientes (nombre, email, telefono, direccion) VALUES (?, ?, ?, ?)',
+                    (nombre, email, "11-1234-5678", "Calle 1")
+                ).lastrowid
+        finally:
+            conn.close()
+
+    def crear_producto(self, nombre="Teclado", precio=10.0, stock=100):
+        conn = get_db_connection()
+        try:
+            with conn:
+                return conn.execute(
+                    'INSERT INTO productos (nombre, descripcion, precio, stock) VALUES (?, ?, ?, ?)',
+                    (nombre, "Producto de prueba", precio, stock)
+                ).lastrowid
+        finally:
+            conn.close()
@@ -0,0 +1,50 @@
+from cache import CacheConsultas
+from controllers import ClienteController, ProductoController
+from database import get_db_connection
+from tests.base import PruebaConBase
+
+
+class PruebaCacheConsultas(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = CacheConsultas()
+        self.addCleanup(self.cache.cerrar)
+        self.clientes = ClienteController(cache=self.cache)
+        self.productos = ProductoController(cache=self.cache)
+        self.cliente_id = self.crear_cliente("Ana Pérez", "ana@ejemplo.com")
+        self.crear_producto("Teclado")
+
+    def escribir_afuera(self, sql, parametros=()):
+        """Escritura confirmada por otra conexión, como la de otro proceso."""
+        conn = get_db_connection()
+        with conn:
+            conn.execute(sql, parametros)
+        conn.close()
+
+    def test_una_escritura_externa_invalida_listados_y_busquedas(self):
+        self.assertEqual([cliente.nombre for cliente in self.clientes.listar_todos()], ["Ana Pérez"])
+        self.assertEqual([cliente.nombre for cliente in self.clientes.buscar("ana")], ["Ana Pérez"])
+        self.clientes.listar_todos()
+        self.assertEqual(self.cache.aciertos, 1)
+
+        self.escribir_afuera(
+            "INSERT INTO clientes (nombre, email, telefono, direccion) VALUES ('Anabel Ruiz', 'anabel@ejemplo.com', '', '')"
+        )
+        self.assertEqual([cliente.nombre for cliente in self.clientes.listar_todos()], ["Ana Pérez", "Anabel Ruiz"])
+        self.assertEqual([cliente.nombre for cliente in self.clientes.buscar("ana")], ["Ana Pérez", "Anabel Ruiz"])
+
+        self.escribir_afuera("UPDATE clientes SET nombre = 'Juana Pérez' WHERE id = ?", (self.cliente_id,))
+        self.assertEqual([cliente.nombre for cliente in self.clientes.buscar("juana")], ["Juana Pérez"])
+        self.escribir_afuera("DELETE FROM clientes WHERE id = ?", (self.cliente_id,))
+        self.assertEqual([cliente.nombre for cliente in self.clientes.listar_todos()], ["Anabel Ruiz"])
+
+    def test_un_cambio_en_otra_tabla_no_invalida_el_resultado(self):
+        self.clientes.listar_todos()
+        self.productos.listar_todos()
+        self.escribir_afuera("UPDATE productos SET stock = stock - 1")
+        aciertos = self.cache.aciertos
+        self.clientes.listar_todos()
+        self.assertEqual(self.cache.aciertos, aciertos + 1)
+        self.assertEqual(self.productos.listar_todos()[0].stock, 99)
+        self.assertEqual(self.cache.aciertos, aciertos + 1)
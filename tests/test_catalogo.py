@@ -0,0 +1,53 @@
+import cdc
+from catalogo import CatalogoEnMemoria
+from controllers import PedidoController, ProductoController
+from database import get_db_connection
+from models import DetallePedido, Pedido
+from tests.base import PruebaConBase
+
+
+class PruebaCatalogoEnMemoria(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        self.cliente_id = self.crear_cliente()
+        self.teclado = self.crear_producto("Teclado", stock=10)
+        self.mouse = self.crear_producto("Mouse", stock=20)
+        self.catalogo = CatalogoEnMemoria()
+        self.addCleanup(self.catalogo.cerrar)
+
+    def escribir_afuera(self, sql, parametros=()):
+        conn = get_db_connection()
+        with conn:
+            conn.execute(sql, parametros)
+        conn.close()
+
+    def test_los_cambios_externos_se_traen_del_registro_de_cambios(self):
+        PedidoController().crear(
+            Pedido(cliente_id=self.cliente_id, fecha="2024-05-01", estado="Pendiente", total=30.0),
+            [DetallePedido(producto_id=self.teclado, cantidad=3, precio_unitario=10.0)]
+        )
+        self.escribir_afuera("INSERT INTO productos (nombre, descripcion, precio, stock) VALUES ('Monitor', '', 100, 5)")
+        self.escribir_afuera("DELETE FROM productos WHERE id = ?", (self.mouse,))
+
+        self.assertEqual(self.catalogo.obtener(self.teclado).stock, 7)
+        self.assertEqual([producto.nombre for producto in self.catalogo.listar()], ["Monitor", "Teclado"])
+        self.assertEqual([producto.nombre for producto in self.catalogo.buscar("mon")], ["Monitor"])
+        self.assertEqual(self.catalogo.recargas, 1)
+        self.assertEqual(self.catalogo.actualizaciones, 3)
+
+    def test_tras_una_purga_del_registro_se_recarga_completo(self):
+        self.escribir_afuera("UPDATE productos SET stock = 5 WHERE id = ?", (self.teclado,))
+        self.escribir_afuera("UPDATE productos SET stock = 4 WHERE id = ?", (self.teclado,))
+        # La compactación deja solo el último cambio: faltan registros para la versión
+        self.assertGreater(cdc.purgar(compactar_despues=-10)["compactados"], 0)
+
+        self.assertEqual(self.catalogo.obtener(self.teclado).stock, 4)
+        self.assertEqual(self.catalogo.recargas, 2)
+        self.assertEqual(self.catalogo.actualizaciones, 0)
+
+    def test_las_escrituras_del_controlador_se_ven_enseguida(self):
+        productos = ProductoController(catalogo=self.catalogo)
+        productos.actualizar_stock(self.mouse, -5)
+        self.assertEqual(productos.obtener_por_id(self.mouse).stock, 15)
+        self.assertEqual(self.catalogo.recargas, 1)
@@ -0,0 +1,30 @@
+from cdc import ConsumidorCambios
+from tests.base import PruebaConBase
+
+
+class PruebaConsumidorCambios(PruebaConBase):
+
+    def test_el_ultimo_lote_sin_confirmar_se_vuelve_a_leer(self):
+        for numero in range(5):
+            self.crear_cliente(f"Cliente {numero}", f"cliente{numero}@ejemplo.com")
+        total = self.consultar('SELECT COUNT(*) FROM cambios')[0][0]
+        consumidor = ConsumidorCambios("prueba")
+
+        leidos = []
+        for cambios in consumidor.lotes(lote=3):
+            leidos.extend(cambio['id'] for cambio in cambios)
+            ultimo_lote = [cambio['id'] for cambio in cambios]
+            if len(leidos) >= 6:
+                break  # El lote actual queda sin confirmar
+        self.assertEqual(consumidor.posicion(), leidos[-4])
+        self.assertEqual([cambio['id'] for cambio in consumidor.leer(lote=3)], ultimo_lote)
+
+        for cambios in consumidor.lotes(lote=3):
+            leidos.extend(cambio['id'] for cambio in cambios)
+        self.assertEqual(len(set(leidos)), total)
+        self.assertEqual(consumidor.posicion(), max(leidos))
+
+    def test_un_consumidor_nuevo_puede_empezar_desde_el_final(self):
+        self.crear_cliente()
+        self.assertEqual(ConsumidorCambios("desde-el-final", desde_inicio=False).leer(), [])
+        self.assertNotEqual(ConsumidorCambios("desde-el-inicio").leer(), [])
@@ -0,0 +1,104 @@
+import contextlib
+import io
+
+from busqueda import IndiceTrigramas
+from cache import CacheConsultas
+from catalogo import CatalogoEnMemoria
+from controllers import ClienteController, ProductoController
+from database import get_db_connection, migrar_db
+from models import Cliente
+from tests.base import PruebaConBase
+
+
+class PruebaIndiceDiferido(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        self.construcciones = 0
+
+        def crear_indice():
+            self.construcciones += 1
+            return IndiceTrigramas.desde_db()
+
+        self.controller = ClienteController(crear_indice=crear_indice)
+
+    def test_el_indice_se_construye_en_la_primera_busqueda(self):
+        self.crear_cliente("Ana Pérez", "ana@ejemplo.com")
+        self.controller.crear(Cliente(nombre="Bruno Díaz", email="bruno@ejemplo.com", telefono="", direccion=""))
+        self.assertEqual(self.construcciones, 0)
+        self.assertIsNone(self.controller.indice)
+
+        self.assertEqual([cliente.nombre for cliente in self.controller.buscar_similares("Bruno Dias")], ["Bruno Díaz"])
+        self.assertEqual(self.construcciones, 1)
+
+        # Ya construido, se mantiene con las altas y bajas del controlador
+        self.controller.crear(Cliente(nombre="Carla Gómez", email="carla@ejemplo.com", telefono="", direccion=""))
+        self.assertEqual([cliente.nombre for cliente in self.controller.buscar_similares("Karla Gomez")], ["Carla Gómez"])
+        ana = self.controller.buscar_similares("Ana Perez")[0]
+        self.controller.eliminar(ana.id)
+        self.assertEqual(self.controller.buscar_similares("Ana Perez"), [])
+        self.assertEqual(self.construcciones, 1)
+
+
+class PruebaBusqueda(PruebaConBase):
+
+    def test_primero_los_prefijos_y_despues_las_coincidencias_internas(self):
+        self.crear_cliente("Juan Pérez", "juan@ejemplo.com")
+        self.crear_cliente("Pérez Ana", "ana@ejemplo.com")
+        self.crear_cliente("Bruno Díaz", "perez.bruno@ejemplo.com")
+        self.crear_cliente("Carla Gómez", "carla@ejemplo.com")
+        cache = CacheConsultas()
+        self.addCleanup(cache.cerrar)
+        for controller in (ClienteController(), ClienteController(cache=cache)):
+            nombres = [cliente.nombre for cliente in controller.buscar("perez")]
+            self.assertEqual(nombres, ["Bruno Díaz", "Pérez Ana", "Juan Pérez"])
+
+    def test_productos_por_prefijo_nombre_y_descripcion(self):
+        self.crear_producto("Mouse inalámbrico")
+        self.crear_producto("Teclado inalámbrico")
+        self.crear_producto("Monitor")
+        self.crear_producto("Cable de monitor")
+        catalogo = CatalogoEnMemoria()
+        self.addCleanup(catalogo.cerrar)
+        for controller in (ProductoController(), ProductoController(catalogo=catalogo)):
+            productos = controller.buscar("inalambrico")
+            self.assertEqual([producto.nombre for producto in productos], ["Mouse inalámbrico", "Teclado inalámbrico"])
+            productos = controller.buscar("mo")
+            self.assertEqual([producto.nombre for producto in productos], ["Monitor", "Mouse inalámbrico", "Cable de monitor"])
+
+
+class PruebaEmailUnico(PruebaConBase):
+
+    def nuevo(self, nombre, email):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return ClienteController().crear(Cliente(nombre=nombre, email=email, telefono="", direccion=""))
+
+    def test_no_se_repite_un_email_que_solo_cambia_mayusculas(self):
+        self.assertTrue(self.nuevo("Pablo", "pa@x.com"))
+        self.assertFalse(self.nuevo("Otro Pablo", "PA@x.com"))
+        self.assertEqual(ClienteController().obtener_por_email("PA@x.com").nombre, "Pablo")
+
+    def test_la_migracion_avisa_los_emails_repetidos(self):
+        conn = get_db_connection()
+        with conn:
+            conn.execute('DROP INDEX idx_clientes_email_norm')
+        conn.close()
+        self.assertTrue(self.nuevo("Pablo", "pa@x.com"))
+        self.assertTrue(self.nuevo("Otro Pablo", "PA@x.com"))
+
+        salida = io.StringIO()
+        with contextlib.redirect_stdout(salida):
+            migrar_db()
+        self.assertIn("pa@x.com: clientes 1,2", salida.getvalue())
+        # Sin índice único, el email exacto tiene prioridad
+        controller = ClienteController()
+        self.assertEqual(controller.obtener_por_email("PA@x.com").nombre, "Otro Pablo")
+        self.assertEqual(controller.obtener_por_email("pa@x.com").nombre, "Pablo")
+
+        conn = get_db_connection()
+        with conn:
+            conn.execute("DELETE FROM clientes WHERE email = 'PA@x.com'")
+        conn.close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrar_db()
+        self.assertFalse(self.nuevo("Otro Pablo", "PA@x.com"))
@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+
+import columnar
+from columnar import InstantaneaLineas
+from controllers import PedidoController
+from models import DetallePedido, Pedido
+from tests.base import PruebaConBase
+
+
+class PruebaInstantaneaLineas(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        cliente_id = self.crear_cliente()
+        self.teclado = self.crear_producto("Teclado", 10.0)
+        self.mouse = self.crear_producto("Mouse", 5.0)
+        controller = PedidoController()
+        for estado, cantidad_teclados, cantidad_mouses in (
+            ("Pendiente", 1, 2), ("Entregado", 3, 0), ("Cancelado", 5, 7), ("Enviado", 0, 1),
+        ):
+            detalles = [
+                DetallePedido(producto_id=producto_id, cantidad=cantidad, precio_unitario=precio)
+                for producto_id, cantidad, precio in ((self.teclado, cantidad_teclados, 10.0), (self.mouse, cantidad_mouses, 5.0))
+                if cantidad
+            ]
+            total = sum(detalle.cantidad * detalle.precio_unitario for detalle in detalles)
+            controller.crear(Pedido(cliente_id=cliente_id, fecha="2024-05-01", estado=estado, total=total), detalles)
+        self.instantanea = InstantaneaLineas()
+        self.instantanea.refrescar()
+
+    def calcular(self):
+        return (
+            self.instantanea.sumar_por('producto', 'cantidad'),
+            self.instantanea.sumar_por('producto', 'cantidad', excluir_estados=()),
+            self.instantanea.contar_por('producto'),
+            self.instantanea.contar_por('producto', excluir_estados=('Cancelado', 'Enviado', 'Inexistente')),
+            self.instantanea.tamanos_canasta(),
+        )
+
+    def test_excluye_los_estados_indicados(self):
+        sumas, sin_excluir, conteos, conteos_sin_enviados, canastas = self.calcular()
+        self.assertEqual(sumas, {self.teclado: 4, self.mouse: 3})
+        self.assertEqual(sin_excluir, {self.teclado: 9, self.mouse: 10})
+        self.assertEqual(conteos, {self.teclado: 2, self.mouse: 2})
+        self.assertEqual(conteos_sin_enviados, {self.teclado: 2, self.mouse: 1})
+        self.assertEqual(canastas["pedidos"], 3)
+        self.assertEqual(canastas["maximo_lineas"], 2)
+
+    @unittest.skipIf(columnar.numpy is None, "NumPy no está instalado")
+    def test_numpy_y_listas_dan_el_mismo_resultado(self):
+        con_numpy = self.calcular()
+        self.assertIsInstance(self.instantanea._mascara(('Cancelado',)), columnar.numpy.ndarray)
+        with mock.patch.object(columnar, 'numpy', None):
+            self.assertIsInstance(self.instantanea._mascara(('Cancelado',)), list)
+            sin_numpy = self.calcular()
+        self.assertEqual(con_numpy, sin_numpy)
+        # Mismos tipos: enteros para las cantidades, float para los importes
+        for resultado in (con_numpy, sin_numpy):
+            self.assertTrue(all(type(suma) is int for suma in resultado[0].values()))
+            self.assertTrue(all(type(conteo) is int for conteo in resultado[2].values()))
+        with mock.patch.object(columnar, 'numpy', None):
+            importes_sin_numpy = self.instantanea.sumar_por('producto', 'importe')
+        importes = self.instantanea.sumar_por('producto', 'importe')
+        self.assertEqual(importes, importes_sin_numpy)
+        self.assertTrue(all(type(suma) is float for suma in [*importes.values(), *importes_sin_numpy.values()]))
@@ -0,0 +1,82 @@
+from controllers import ClienteController, ConflictoVersion, PedidoController, ProductoController
+from models import DetallePedido, Pedido
+from tests.base import PruebaConBase
+
+
+class PruebaActualizacionOptimista(PruebaConBase):
+    """Dos usuarios leen el mismo registro y lo guardan: el segundo recibe ConflictoVersion."""
+
+    def setUp(self):
+        super().setUp()
+        self.cliente_id = self.crear_cliente()
+        self.producto_id = self.crear_producto(stock=10)
+        self.clientes = ClienteController()
+        self.productos = ProductoController()
+        self.pedidos = PedidoController()
+        self.pedido_id = self.pedidos.crear(
+            Pedido(cliente_id=self.cliente_id, fecha="2024-05-01", estado="Pendiente", total=10.0),
+            [DetallePedido(producto_id=self.producto_id, cantidad=1, precio_unitario=10.0)]
+        )
+
+    def casos(self):
+        """(controller, id, cambio) de cada modelo con control de versión."""
+        def renombrar(cliente):
+            cliente.nombre += " (editado)"
+
+        def encarecer(producto):
+            producto.precio += 1
+
+        def enviar(pedido):
+            pedido.estado = "Enviado"
+
+        return [
+            (self.clientes, self.cliente_id, renombrar),
+            (self.productos, self.producto_id, encarecer),
+            (self.pedidos, self.pedido_id, enviar),
+        ]
+
+    def test_la_version_vieja_pierde_y_la_ganadora_avanza(self):
+        for controller, id, cambiar in self.casos():
+            with self.subTest(controller=type(controller).__name__):
+                primero, segundo = controller.obtener_por_id(id), controller.obtener_por_id(id)
+                version = primero.version
+                cambiar(primero)
+                self.assertTrue(controller.actualizar(primero))
+                self.assertEqual(primero.version, version + 1)
+                self.assertEqual(controller.obtener_por_id(id).version, version + 1)
+
+                cambiar(segundo)
+                with self.assertRaises(ConflictoVersion):
+                    controller.actualizar(segundo)
+                self.assertEqual(segundo.version, version)
+                self.assertEqual(controller.obtener_por_id(id).version, version + 1)
+
+                # Después de releerlo, el segundo usuario puede guardar
+                segundo = controller.obtener_por_id(id)
+                cambiar(segundo)
+                self.assertTrue(controller.actualizar(segundo))
+
+    def test_un_pedido_que_descuenta_stock_invalida_la_edicion_del_producto(self):
+        producto = self.productos.obtener_por_id(self.producto_id)
+        self.pedidos.crear(
+            Pedido(cliente_id=self.cliente_id, fecha="2024-05-02", estado="Pendiente", total=10.0),
+            [DetallePedido(producto_id=self.producto_id, cantidad=1, precio_unitario=10.0)]
+        )
+        producto.stock = 50
+        with self.assertRaises(ConflictoVersion):
+            self.productos.actualizar(producto)
+        self.assertEqual(self.productos.obtener_por_id(self.producto_id).stock, 8)
+
+    def test_actualizar_un_registro_eliminado_es_un_conflicto(self):
+        pedido = self.pedidos.obtener_por_id(self.pedido_id)
+        self.assertTrue(self.pedidos.eliminar(self.pedido_id))
+        producto = self.productos.obtener_por_id(self.producto_id)
+        cliente = self.clientes.obtener_por_id(self.cliente_id)
+        self.assertTrue(self.productos.eliminar(self.producto_id))
+        self.assertTrue(self.clientes.eliminar(self.cliente_id))
+
+        for controller, registro in ((self.pedidos, pedido), (self.productos, producto), (self.clientes, cliente)):
+            with self.subTest(controller=type(controller).__name__):
+                with self.assertRaisesRegex(ConflictoVersion, "modificado o eliminado"):
+                    controller.actualizar(registro)
+                self.assertIsNone(controller.obtener_por_id(registro.id))
@@ -0,0 +1,73 @@
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import database
+from controllers import ClienteController, PedidoController, ProductoController
+from database import BackendMemoria, init_db, migrar_db
+from models import Cliente, DetallePedido, Pedido, Producto
+from tests.base import PruebaConBase
+
+
+class PruebaVersionSQLite(PruebaConBase):
+
+    def test_init_db_y_migrar_db_rechazan_un_sqlite_antiguo(self):
+        with mock.patch.object(sqlite3, 'sqlite_version_info', (3, 34, 1)), \
+                mock.patch.object(sqlite3, 'sqlite_version', '3.34.1'):
+            for funcion in (init_db, migrar_db):
+                with self.assertRaisesRegex(RuntimeError, r"o superior y Python usa la versión 3\.34\.1"):
+                    funcion()
+
+    def test_la_base_en_memoria_necesita_memdb(self):
+        memoria = BackendMemoria()
+        database.usar_backend(memoria)
+        try:
+            with mock.patch.object(sqlite3, 'sqlite_version_info', (3, 35, 5)):
+                with self.assertRaisesRegex(RuntimeError, r"SQLite 3\.36\.0 o superior"):
+                    init_db()
+        finally:
+            memoria.cerrar()
+
+
+class PruebaBackendMemoria(unittest.TestCase):
+    """Los controladores funcionan igual sobre la base en memoria, sin escribir archivos."""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix="techlab-prueba-")
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        directorio_anterior = os.getcwd()
+        os.chdir(self.directorio)  # Cualquier archivo creado por error quedaría acá
+        self.addCleanup(os.chdir, directorio_anterior)
+        self.backend = BackendMemoria()
+        self._anterior = database.usar_backend(self.backend)
+        self.addCleanup(database.usar_backend, self._anterior)
+        self.addCleanup(self.backend.cerrar)
+        with contextlib.redirect_stdout(io.StringIO()):
+            init_db()
+
+    def test_clientes_productos_y_pedidos(self):
+        self.assertTrue(self.backend.existe())
+        clientes, productos, pedidos = ClienteController(), ProductoController(), PedidoController()
+        self.assertTrue(clientes.crear(Cliente(nombre="Ana Pérez", email="ana@ejemplo.com")))
+        self.assertTrue(productos.crear(Producto(nombre="Teclado", precio=10.0, stock=5)))
+        cliente, producto = clientes.listar_todos()[0], productos.listar_todos()[0]
+        pedido_id = pedidos.crear(
+            Pedido(cliente_id=cliente.id, fecha="2024-05-01", estado="Pendiente", total=20.0),
+            [DetallePedido(producto_id=producto.id, cantidad=2, precio_unitario=10.0)]
+        )
+        self.assertEqual(productos.obtener_por_id(producto.id).stock, 3)
+        self.assertEqual([pedido.id for pedido in pedidos.listar_todos()], [pedido_id])
+        self.assertEqual(clientes.buscar("perez")[0].id, cliente.id)
+        self.assertTrue(pedidos.eliminar(pedido_id))
+        self.assertEqual(productos.obtener_por_id(producto.id).stock, 5)
+        self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_cerrar_descarta_la_base(self):
+        self.assertTrue(ClienteController().crear(Cliente(nombre="Ana Pérez", email="ana@ejemplo.com")))
+        self.backend.cerrar()
+        self.assertFalse(self.backend.existe())
@@ -0,0 +1,65 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ingesta import EscritorPedidos, Ingesta, analizar_archivo
+from tests.base import PruebaConBase
+
+
+class PruebaIngesta(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        self.cliente_id = self.crear_cliente()
+        self.producto_id = self.crear_producto(stock=100)
+        self.spool = os.path.join(self.directorio, "spool")
+        self.ingesta = Ingesta(self.spool)
+
+    def dejar_archivo(self, nombre, cantidades):
+        with open(os.path.join(self.spool, "entrada", nombre), "w", encoding="utf-8") as archivo:
+            for cantidad in cantidades:
+                archivo.write(json.dumps({
+                    "cliente_id": self.cliente_id,
+                    "detalles": [{"producto_id": self.producto_id, "cantidad": cantidad}]
+                }) + "\n")
+
+    def procesar(self):
+        escritor = EscritorPedidos()
+        try:
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                return self.ingesta.procesar_pendientes(pool, escritor)
+        finally:
+            escritor.cerrar()
+
+    def test_archivos_con_el_mismo_nombre_se_ingieren_por_separado(self):
+        self.dejar_archivo("a.jsonl", [1, 2])
+        self.assertEqual(self.procesar(), 2)
+        self.dejar_archivo("a.jsonl", [3, 4, 5])
+        self.assertEqual(self.procesar(), 3)
+
+        self.assertEqual(self.consultar('SELECT COUNT(*) FROM pedidos'), [(5,)])
+        self.assertEqual(self.consultar('SELECT stock FROM productos'), [(100 - 15,)])
+        self.assertEqual(self.consultar('SELECT COUNT(*) FROM archivos_ingeridos'), [(2,)])
+        self.assertEqual(len(os.listdir(os.path.join(self.spool, "procesados"))), 2)
+        self.assertEqual(os.listdir(os.path.join(self.spool, "procesando")), [])
+
+    def test_archivo_ya_registrado_no_deshace_el_resto_del_lote(self):
+        self.dejar_archivo("a.jsonl", [1])
+        self.dejar_archivo("b.jsonl", [2])
+        rutas = self.ingesta._reclamar_archivos()
+        # Simula que el primer archivo se confirmó en una ejecución
+        # interrumpida antes de moverlo a "procesados"
+        escritor = EscritorPedidos()
+        try:
+            escritor.conn.execute(
+                "INSERT INTO archivos_ingeridos (nombre, fecha, pedidos, rechazados) VALUES (?, '2024-01-01', 1, 0)",
+                (os.path.basename(rutas[0]),)
+            )
+            resultados = [analizar_archivo(ruta) for ruta in rutas]
+            self.assertEqual(escritor.escribir_lote(resultados), 1)
+        finally:
+            escritor.cerrar()
+
+        self.assertTrue(resultados[0]["ya_ingerido"])
+        self.assertEqual(self.consultar('SELECT d.cantidad FROM detalles_pedido d'), [(2,)])
+        self.assertEqual(self.consultar('SELECT stock FROM productos'), [(98,)])
@@ -0,0 +1,106 @@
+import contextlib
+import io
+import time
+
+import cdc
+from database import get_db_connection
+from mantenimiento import PlanificadorMantenimiento, Tarea, tareas_por_defecto
+from tests.base import PruebaConBase
+
+
+class PruebaPurgaCambios(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        # Cinco clientes, dos de ellos modificados dos veces
+        ids = [self.crear_cliente(f"Cliente {i}", f"c{i}@ejemplo.com") for i in range(5)]
+        conn = get_db_connection()
+        with conn:
+            for id in ids[:2] * 2:
+                conn.execute("UPDATE clientes SET direccion = direccion || '!' WHERE id = ?", (id,))
+            # Cambios de hace dos horas, más antiguos que el plazo de compactación
+            conn.execute('UPDATE cambios SET momento = momento - 7200')
+        conn.close()
+        self.cambios = [row[0] for row in self.consultar("SELECT id FROM cambios ORDER BY id")]
+        self.assertGreater(len(self.cambios), 9)
+
+    def test_elimina_confirmados_y_compacta_en_tramos(self):
+        consumidor = cdc.ConsumidorCambios("bodega")
+        consumidor.confirmar(self.cambios[2])
+        pendientes = self.cambios[3:]
+        filas = self.consultar("SELECT COUNT(DISTINCT fila_id) FROM cambios WHERE id > ?", (self.cambios[2],))[0][0]
+        resultado = cdc.purgar(tamano_lote=2)
+
+        self.assertEqual(resultado["confirmados"], 3)
+        # De los pendientes queda solo el último de cada cliente
+        self.assertEqual(resultado["compactados"], len(pendientes) - filas)
+        restantes = self.consultar("SELECT fila_id, COUNT(*), MIN(id) FROM cambios GROUP BY fila_id")
+        self.assertEqual([cantidad for _, cantidad, _ in restantes], [1] * filas)
+        self.assertGreater(min(minimo for _, _, minimo in restantes), self.cambios[2])
+
+    def test_compacta_igual_que_quedarse_con_el_ultimo_de_cada_fila(self):
+        esperados = self.consultar("SELECT MAX(id) FROM cambios GROUP BY tabla, fila_id ORDER BY 1")
+        cdc.purgar(tamano_lote=3)
+        self.assertEqual(self.consultar("SELECT id FROM cambios ORDER BY id"), esperados)
+
+    def test_los_errores_llegan_al_llamador(self):
+        conn = get_db_connection()
+        conn.execute('DROP TABLE consumidores_cambios')
+        conn.close()
+        with self.assertRaises(Exception):
+            cdc.purgar()
+
+
+class PruebaPlanificador(PruebaConBase):
+
+    def ejecutar(self, planificador, tarea):
+        planificador._conn = planificador._conectar()
+        try:
+            with contextlib.redirect_stderr(io.StringIO()) as errores:
+                return planificador.ejecutar_tarea(tarea), errores.getvalue()
+        finally:
+            planificador._conn.close()
+
+    def test_una_tarea_que_falla_queda_en_el_historial_y_no_detiene_el_planificador(self):
+        falla = Tarea("falla", lambda conn: 1 / 0, 60)
+        otra = Tarea("otra", lambda conn: "ok", 60)
+        planificador = PlanificadorMantenimiento(tareas=[falla, otra])
+        planificador._conn = planificador._conectar()
+        try:
+            with contextlib.redirect_stderr(io.StringIO()) as errores:
+                planificador.ejecutar_pendientes(forzar=True)
+        finally:
+            planificador._conn.close()
+
+        self.assertIn("falla", errores.getvalue())
+        historial = dict(self.consultar('SELECT tarea, resultado FROM historial_mantenimiento'))
+        self.assertTrue(historial["falla"].startswith("error: ZeroDivisionError"))
+        self.assertEqual(historial["otra"], "ok")
+
+    def test_purgar_cambios_cede_ante_una_base_ocupada(self):
+        tarea = next(tarea for tarea in tareas_por_defecto() if tarea.nombre == "purgar_cambios")
+        bloqueo = get_db_connection()
+        bloqueo.isolation_level = None
+        bloqueo.execute('BEGIN IMMEDIATE')
+        try:
+            inicio = time.perf_counter()
+            ejecutada, _ = self.ejecutar(PlanificadorMantenimiento(), tarea)
+            segundos = time.perf_counter() - inicio
+        finally:
+            bloqueo.execute('ROLLBACK')
+            bloqueo.close()
+
+        self.assertFalse(ejecutada)
+        self.assertLess(segundos, 1)  # La espera es la del planificador (100 ms), no la de 5 s
+
+    def test_purgar_cambios_registra_los_errores(self):
+        tarea = next(tarea for tarea in tareas_por_defecto() if tarea.nombre == "purgar_cambios")
+        conn = get_db_connection()
+        conn.execute('DROP TABLE consumidores_cambios')
+        conn.close()
+        ejecutada, errores = self.ejecutar(PlanificadorMantenimiento(), tarea)
+
+        self.assertTrue(ejecutada)
+        self.assertIn("purgar_cambios", errores)
+        resultado = self.consultar("SELECT resultado FROM historial_mantenimiento WHERE tarea = 'purgar_cambios'")
+        self.assertTrue(resultado[0][0].startswith("error:"))
@@ -0,0 +1,32 @@
+import unittest
+
+import paginacion
+from paginacion import VistaPaginada
+
+
+class PruebaVistaPaginada(unittest.TestCase):
+
+    def setUp(self):
+        self.filas = list(range(1, 1001))
+        self.consultas = []
+
+        def obtener_pagina(limite, despues, filtro, saltar):
+            self.consultas.append((despues, saltar))
+            inicio = (despues if despues is not None else 0) + saltar
+            return self.filas[inicio:inicio + limite]
+
+        self.vista = VistaPaginada("Prueba", "n", str, obtener_pagina, lambda filtro: len(self.filas), tamano=10)
+
+    def test_la_memoria_no_crece_con_las_paginas_recorridas(self):
+        for _ in range(60):
+            self.vista.siguiente()
+        self.assertEqual(self.vista.pagina, 61)
+        self.assertLessEqual(len(self.vista._inicios), paginacion.PUNTOS_DE_PARTIDA)
+
+    def test_retroceder_mas_alla_de_lo_recordado_muestra_la_pagina_correcta(self):
+        for _ in range(30):
+            self.vista.siguiente()
+        for pagina in range(30, 0, -1):
+            self.vista.anterior()
+            self.assertEqual(self.vista.pagina, pagina)
+            self.assertEqual(self.vista.filas[0], (pagina - 1) * 10 + 1)
@@ -0,0 +1,139 @@
+import contextlib
+import datetime
+import io
+
+from controllers import PedidoController
+from database import get_db_connection, migrar_db
+from models import DetallePedido, Pedido
+from tests.base import PruebaConBase
+
+
+class PruebaMomentoDeCreacion(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        self.cliente_id = self.crear_cliente()
+        self.producto_id = self.crear_producto(stock=100)
+        self.controller = PedidoController()
+
+    def crear(self, fecha, creado=None):
+        return self.controller.crear(
+            Pedido(cliente_id=self.cliente_id, fecha=fecha, estado="Pendiente", total=10.0, creado=creado),
+            [DetallePedido(producto_id=self.producto_id, cantidad=1, precio_unitario=10.0)]
+        )
+
+    def test_migracion_asigna_la_medianoche_local_de_la_fecha(self):
+        self.crear("2024-03-10")
+        self.crear("2024-04-22")
+        conn = get_db_connection()
+        with conn:
+            conn.execute('DROP INDEX idx_pedidos_creado')
+            conn.execute('DROP INDEX idx_pedidos_estado_creado')
+            conn.execute('ALTER TABLE pedidos DROP COLUMN creado')
+        conn.close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrar_db()
+
+        for fecha, creado in self.consultar('SELECT fecha, creado FROM pedidos'):
+            medianoche = datetime.datetime.combine(datetime.date.fromisoformat(fecha), datetime.time())
+            self.assertEqual(creado, int(medianoche.timestamp()))
+
+    def test_pedidos_del_mismo_dia_se_ordenan_por_hora_en_ambos_listados(self):
+        dia = datetime.datetime(2024, 5, 1)
+        # Se crean en un orden distinto al de sus horas
+        for hora in (15, 9, 18, 12):
+            self.crear("2024-05-01", int((dia + datetime.timedelta(hours=hora)).timestamp()))
+        self.crear("2024-04-30")
+
+        todos = [pedido.id for pedido in self.controller.listar_todos()]
+        paginas = []
+        pagina = self.controller.listar_pagina(2)
+        while pagina:
+            paginas.extend(pedido.id for pedido in pagina)
+            pagina = self.controller.listar_pagina(2, despues=pagina[-1])
+        self.assertEqual(paginas, todos)
+        horas = [datetime.datetime.fromtimestamp(pedido.creado).hour for pedido in self.controller.listar_todos()[:4]]
+        self.assertEqual(horas, [18, 15, 12, 9])
+
+    def test_listar_intervalo_filtra_por_hora(self):
+        dia = datetime.datetime(2024, 5, 1)
+        for hora in (8, 10, 12, 14):
+            self.crear("2024-05-01", int((dia + datetime.timedelta(hours=hora)).timestamp()))
+
+        pedidos = self.controller.listar_intervalo(dia + datetime.timedelta(hours=9), dia + datetime.timedelta(hours=13))
+        self.assertEqual([datetime.datetime.fromtimestamp(pedido.creado).hour for pedido in pedidos], [12, 10])
+        self.assertEqual(self.controller.contar_intervalo(dia, dia + datetime.timedelta(days=1)), 4)
+
+
+class PruebaEliminacion(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        self.cliente_id = self.crear_cliente()
+        self.teclado = self.crear_producto("Teclado", stock=100)
+        self.mouse = self.crear_producto("Mouse", stock=50)
+        self.controller = PedidoController()
+
+    def crear(self, fecha="2024-05-01", estado="Pendiente", clave=None):
+        return self.controller.crear(
+            Pedido(cliente_id=self.cliente_id, fecha=fecha, estado=estado, total=35.0),
+            [DetallePedido(producto_id=self.teclado, cantidad=3, precio_unitario=10.0),
+             DetallePedido(producto_id=self.mouse, cantidad=1, precio_unitario=5.0)],
+            clave_idempotencia=clave
+        )
+
+    def stock(self):
+        return dict(self.consultar('SELECT id, stock FROM productos'))
+
+    def test_la_misma_clave_retorna_el_pedido_original(self):
+        pedido_id = self.crear(clave="compra-1")
+        self.assertEqual(self.crear(clave="compra-1"), pedido_id)
+        self.assertEqual(self.consultar('SELECT COUNT(*) FROM pedidos'), [(1,)])
+        self.assertEqual(self.stock(), {self.teclado: 97, self.mouse: 49})
+
+    def test_eliminar_borra_detalles_y_restaura_el_stock(self):
+        pedido_id = self.crear()
+        otro_id = self.crear()
+        self.assertTrue(self.controller.eliminar(pedido_id))
+        self.assertEqual(self.consultar('SELECT DISTINCT pedido_id FROM detalles_pedido'), [(otro_id,)])
+        self.assertEqual(self.stock(), {self.teclado: 97, self.mouse: 49})
+
+    def test_eliminar_masivo_por_estado(self):
+        for estado in ("Cancelado", "Entregado", "Cancelado"):
+            self.crear(estado=estado)
+        resultado = self.controller.eliminar_masivo(estados=["Cancelado"], tamano_lote=1)
+        self.assertEqual(resultado, {"pedidos": 2, "detalles": 4, "unidades_restauradas": 8, "lotes": 2})
+        self.assertEqual(self.consultar('SELECT estado FROM pedidos'), [("Entregado",)])
+        self.assertEqual(self.consultar('SELECT COUNT(*) FROM detalles_pedido'), [(2,)])
+        self.assertEqual(self.stock(), {self.teclado: 97, self.mouse: 49})
+
+    def test_una_clave_de_un_pedido_eliminado_crea_uno_nuevo(self):
+        pedido_id = self.crear(clave="compra-1")
+        self.controller.eliminar(pedido_id)
+        otro_id = self.crear(clave="compra-2")
+        self.controller.eliminar_masivo(ids=[otro_id])
+        self.assertEqual(self.consultar('SELECT COUNT(*) FROM claves_idempotencia'), [(0,)])
+
+        nuevo_id = self.crear(clave="compra-1")
+        self.assertNotIn(nuevo_id, (None, pedido_id))
+        self.assertEqual(self.consultar('SELECT id FROM pedidos'), [(nuevo_id,)])
+
+    def test_la_migracion_agrega_la_cascada_y_descarta_claves_huerfanas(self):
+        conn = get_db_connection()
+        with conn:
+            conn.execute('DROP TABLE claves_idempotencia')
+            conn.execute(
+                'CREATE TABLE claves_idempotencia (clave TEXT PRIMARY KEY, pedido_id INTEGER NOT NULL, '
+                'creada INTEGER NOT NULL) WITHOUT ROWID'
+            )
+        conn.close()
+        vigente_id = self.crear(clave="vigente")
+        eliminado_id = self.crear(clave="huerfana")
+        self.controller.eliminar(eliminado_id)
+        self.assertEqual(self.crear(clave="huerfana"), eliminado_id)  # El error que corrige la migración
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrar_db()
+        self.assertEqual(self.consultar('SELECT clave, pedido_id FROM claves_idempotencia'), [("vigente", vigente_id)])
+        self.controller.eliminar(vigente_id)
+        self.assertEqual(self.consultar('SELECT COUNT(*) FROM claves_idempotencia'), [(0,)])
@@ -0,0 +1,28 @@
+import contextlib
+import io
+import unittest
+
+import verificar_planes
+
+
+class PruebaPlanesDeConsulta(unittest.TestCase):
+    """La verificación de verificar_planes.py sobre una base generada chica."""
+
+    @classmethod
+    def setUpClass(cls):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            cls.planes = verificar_planes.generar_planes(clientes=2000, productos=200, pedidos=2000)
+
+    def test_sin_recorridos_ni_ordenamientos_nuevos(self):
+        problemas, _ = verificar_planes.comparar(self.planes, verificar_planes.cargar_referencia())
+        self.assertEqual(problemas, [])
+
+    def test_todas_las_consultas_estan_en_la_referencia(self):
+        faltantes = set(self.planes) - set(verificar_planes.cargar_referencia())
+        self.assertEqual(faltantes, set(), "actualice la referencia con python verificar_planes.py --actualizar")
+
+    def test_detecta_un_recorrido_nuevo(self):
+        clave, actual = next(iter(self.planes.items()))
+        empeorado = {clave: {**actual, "plan": [*actual["plan"], "SCAN pedidos", "USE TEMP B-TREE FOR ORDER BY"]}}
+        problemas, _ = verificar_planes.comparar(empeorado, self.planes)
+        self.assertEqual(len(problemas), 2)
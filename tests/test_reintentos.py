@@ -0,0 +1,56 @@
+from unittest import mock
+
+import reintentos
+from controllers import ClienteController, PedidoController, ProductoController
+from database import get_db_connection
+from models import Cliente, DetallePedido, Pedido
+from reintentos import BaseDeDatosOcupada, PoliticaReintentos
+from reservas import Carrito
+from tests.base import PruebaConBase
+
+
+class PruebaBaseOcupada(PruebaConBase):
+
+    # Con el archivo (WAL) se puede leer mientras otra conexión tiene el bloqueo de escritura
+    requiere_archivo = True
+
+    def setUp(self):
+        super().setUp()
+        self.cliente_id = self.crear_cliente()
+        self.producto_id = self.crear_producto()
+        politica = PoliticaReintentos(busy_timeout_ms=10, max_intentos=2, espera_base=0.001)
+        parche = mock.patch.object(reintentos, 'POLITICA', politica)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def bloquear(self):
+        """Otra conexión toma el bloqueo de escritura hasta el final de la prueba."""
+        conn = get_db_connection()
+        conn.isolation_level = None
+        conn.execute('BEGIN IMMEDIATE')
+        self.addCleanup(conn.close)
+        self.addCleanup(conn.rollback)
+
+    def test_las_escrituras_propagan_los_reintentos_agotados(self):
+        self.bloquear()
+        pedido = Pedido(cliente_id=self.cliente_id, fecha="2024-05-01", estado="Pendiente", total=10.0)
+        escrituras = [
+            lambda: ClienteController().crear(Cliente(nombre="Bruno", email="bruno@ejemplo.com")),
+            lambda: ProductoController().actualizar_stock(self.producto_id, 5),
+            lambda: PedidoController().crear(pedido, [DetallePedido(producto_id=self.producto_id, cantidad=1, precio_unitario=10.0)]),
+        ]
+        for escritura in escrituras:
+            with self.assertRaisesRegex(BaseDeDatosOcupada, "después de 2 intentos"):
+                escritura()
+        self.assertEqual(self.consultar('SELECT COUNT(*) FROM pedidos'), [(0,)])
+
+    def test_sin_contencion_las_escrituras_siguen_funcionando(self):
+        self.assertTrue(ClienteController().crear(Cliente(nombre="Bruno", email="bruno@ejemplo.com")))
+        self.assertEqual(len(self.consultar('SELECT id FROM clientes')), 2)
+
+    def test_las_reservas_propagan_los_reintentos_agotados(self):
+        self.bloquear()
+        carrito = Carrito()
+        for operacion in (lambda: carrito.reservar(self.producto_id, 1), lambda: carrito.liberar(self.producto_id), carrito.cancelar):
+            with self.assertRaises(BaseDeDatosOcupada):
+                operacion()
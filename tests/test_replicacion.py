@@ -0,0 +1,68 @@
+import os
+import sqlite3
+
+from cdc import TABLAS, ConsumidorCambios
+from controllers import ClienteController, PedidoController
+from models import Cliente, DetallePedido, Pedido
+from replicacion import ReplicaDesincronizada, Replicador
+from tests.base import PruebaConBase
+
+
+class PruebaReplicacion(PruebaConBase):
+
+    requiere_archivo = True  # La réplica se crea copiando el archivo de la base principal
+
+    def setUp(self):
+        super().setUp()
+        self.ruta_replica = os.path.join(self.directorio, "replica.db")
+        self.clientes = ClienteController()
+        self.pedidos = PedidoController()
+        self.cliente_id = self.crear_cliente()
+        self.producto_id = self.crear_producto(stock=100)
+
+    def crear_pedido(self, cantidad=1):
+        return self.pedidos.crear(
+            Pedido(cliente_id=self.cliente_id, fecha="2024-05-01", estado="Pendiente", total=10.0 * cantidad),
+            [DetallePedido(producto_id=self.producto_id, cantidad=cantidad, precio_unitario=10.0)]
+        )
+
+    def contenido(self, ruta):
+        conn = sqlite3.connect(ruta)
+        try:
+            return {tabla: conn.execute(f'SELECT * FROM {tabla} ORDER BY id').fetchall() for tabla in TABLAS}
+        finally:
+            conn.close()
+
+    def test_la_replica_converge_con_la_base_principal(self):
+        primero = self.crear_pedido()
+        replicador = Replicador(self.ruta_replica, tamano_lote=4)
+        replicador.inicializar()
+        self.assertEqual(self.contenido(self.ruta_replica), self.contenido(self.ruta_db))
+
+        # Altas, modificaciones y bajas (con cascada) después de la instantánea
+        segundo = self.crear_pedido(3)
+        self.pedidos.actualizar_estado(segundo, "Enviado")
+        self.pedidos.eliminar(primero)
+        self.clientes.crear(Cliente(nombre="Bruno Díaz", email="bruno@ejemplo.com", telefono="", direccion=""))
+        self.assertGreater(replicador.sincronizar(), 1)
+        self.assertEqual(self.contenido(self.ruta_replica), self.contenido(self.ruta_db))
+        self.assertEqual(replicador.atraso()["cambios"], 0)
+        self.assertEqual(replicador.sincronizar(), 0)
+
+    def test_aplicar_dos_veces_el_mismo_lote_no_tiene_efecto(self):
+        replicador = Replicador(self.ruta_replica)
+        posicion = replicador.inicializar()
+        self.crear_pedido()
+        lote = replicador._leer_lote(posicion)
+        self.assertEqual(replicador.destino.aplicar(lote), lote["hasta"])
+        self.assertEqual(replicador.destino.aplicar(lote), lote["hasta"])
+        self.assertEqual(len(self.contenido(self.ruta_replica)["pedidos"]), 1)
+
+    def test_sin_inicializar_o_dada_de_baja_hay_que_reinicializar(self):
+        replicador = Replicador(self.ruta_replica)
+        with self.assertRaises(ReplicaDesincronizada):
+            replicador.sincronizar()
+        replicador.inicializar()
+        ConsumidorCambios(replicador.nombre_consumidor).eliminar()
+        with self.assertRaises(ReplicaDesincronizada):
+            replicador.sincronizar()
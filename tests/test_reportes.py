@@ -0,0 +1,80 @@
+import datetime
+from unittest import mock
+
+import reportes
+from controllers import PedidoController
+from models import DetallePedido, Pedido
+from tests.base import PruebaConBase
+
+
+class PruebaReportes(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        clientes = [self.crear_cliente(f"Cliente {numero}", f"cliente{numero}@ejemplo.com") for numero in range(4)]
+        productos = [self.crear_producto(f"Producto {numero}", 1.5 + numero, stock=10000) for numero in range(5)]
+        controller = PedidoController()
+        estados = ("Pendiente", "Enviado", "Entregado", "Cancelado")
+        inicio = datetime.date(2024, 1, 1)
+        for numero in range(60):
+            # Fechas repetidas y meses con distinta cantidad de pedidos
+            fecha = inicio + datetime.timedelta(days=(numero * numero) % 97)
+            detalles = [
+                DetallePedido(producto_id=productos[(numero + linea) % 5], cantidad=1 + (numero + linea) % 3,
+                              precio_unitario=1.5 + (numero + linea) % 5)
+                for linea in range(1 + numero % 3)
+            ]
+            controller.crear(Pedido(
+                cliente_id=clientes[numero % 4], fecha=fecha.isoformat(), estado=estados[numero % 4],
+                total=sum(detalle.subtotal() for detalle in detalles)
+            ), detalles)
+
+    def sin_particiones(self, reporte):
+        return {clave: valor for clave, valor in reporte.items() if clave != 'particiones'}
+
+    def test_particionado_y_en_procesos_coincide_con_una_sola_particion(self):
+        with mock.patch.object(reportes, 'PARTICIONES_POR_PROCESO', 1):
+            una = reportes.generar_reporte(procesos=1)
+        self.assertEqual(una['particiones'], 1)
+        self.assertEqual(una['pedidos'], 60)
+
+        particionado = reportes.generar_reporte(procesos=1)
+        self.assertGreater(particionado['particiones'], 1)
+        self.assertEqual(self.sin_particiones(particionado), self.sin_particiones(una))
+        self.assertEqual(self.sin_particiones(reportes.generar_reporte(procesos=2)), self.sin_particiones(una))
+
+        filtrado = reportes.generar_reporte('2024-02-01', '2024-04-01', ['Enviado', 'Entregado'], procesos=2)
+        with mock.patch.object(reportes, 'PARTICIONES_POR_PROCESO', 1):
+            filtrado_una = reportes.generar_reporte('2024-02-01', '2024-04-01', ['Enviado', 'Entregado'], procesos=1)
+        self.assertEqual(self.sin_particiones(filtrado), self.sin_particiones(filtrado_una))
+        self.assertEqual(set(filtrado['estados']), {'Enviado', 'Entregado'})
+
+    def test_particiones_cubren_el_rango_sin_cortar_fechas(self):
+        rangos = reportes.particiones('2024-01-01', '2024-05-01', 8)
+        self.assertEqual(rangos[0][0], '2024-01-01')
+        self.assertEqual(rangos[-1][1], '2024-05-01')
+        for (_, fin), (inicio, _) in zip(rangos, rangos[1:]):
+            self.assertEqual(fin, inicio)
+        fechas = [fecha for fecha, in self.consultar('SELECT DISTINCT fecha FROM pedidos')]
+        for fecha in fechas:
+            self.assertEqual(sum(inicio <= fecha < fin for inicio, fin in rangos), 1)
+
+    def test_casos_borde_de_las_particiones(self):
+        # Rango vacío, rango sin pedidos, una sola fecha y ningún estado
+        self.assertEqual(reportes.particiones('2024-03-01', '2024-03-01', 4), [('2024-03-01', '2024-03-01')])
+        self.assertEqual(reportes.particiones('2030-01-01', '2031-01-01', 4), [('2030-01-01', '2031-01-01')])
+        self.assertEqual(reportes.particiones('2024-01-01', '2024-01-02', 4), [('2024-01-01', '2024-01-02')])
+        self.assertEqual(reportes.particiones('2024-01-01', '2025-01-01', 4, estados=[]), [('2024-01-01', '2025-01-01')])
+
+        vacio = reportes.generar_reporte(estados=[], procesos=1)
+        self.assertEqual((vacio['pedidos'], vacio['total'], vacio['productos']), (0, 0, []))
+        un_dia = reportes.generar_reporte('2024-01-01', '2024-01-02', procesos=2)
+        self.assertEqual(un_dia['particiones'], 1)
+        self.assertEqual(un_dia['pedidos'], self.consultar("SELECT COUNT(*) FROM pedidos WHERE fecha = '2024-01-01'")[0][0])
+
+
+class PruebaReportesSinPedidos(PruebaConBase):
+
+    def test_base_vacia(self):
+        reporte = reportes.generar_reporte(procesos=2)
+        self.assertEqual((reporte['pedidos'], reporte['meses'], reporte['particiones']), (0, {}, 1))
@@ -0,0 +1,82 @@
+import contextlib
+import io
+
+import reservas
+from controllers import PedidoController
+from database import get_db_connection
+from models import DetallePedido, Pedido
+from reservas import Carrito
+from tests.base import PruebaConBase
+
+
+class PruebaReservas(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        self.cliente_id = self.crear_cliente()
+        self.producto_id = self.crear_producto(stock=10)
+        self.controller = PedidoController()
+
+    def crear_pedido(self, cantidad, carrito=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.controller.crear(
+                Pedido(cliente_id=self.cliente_id, fecha="2024-05-01", estado="Pendiente", total=10.0 * cantidad),
+                [DetallePedido(producto_id=self.producto_id, cantidad=cantidad, precio_unitario=10.0)],
+                carrito=carrito
+            )
+
+    def stock(self):
+        return self.consultar('SELECT stock FROM productos WHERE id = ?', (self.producto_id,))[0][0]
+
+    def test_las_reservas_de_otros_carritos_no_se_pueden_vender(self):
+        primero, segundo = Carrito(), Carrito()
+        self.assertTrue(primero.reservar(self.producto_id, 7))
+        self.assertEqual(primero.disponible(self.producto_id), 10)
+        self.assertEqual(segundo.disponible(self.producto_id), 3)
+        self.assertFalse(segundo.reservar(self.producto_id, 4))
+        self.assertTrue(segundo.reservar(self.producto_id, 3))
+
+        # Un pedido sin carrito tampoco puede usar las unidades reservadas
+        self.assertIsNone(self.crear_pedido(1))
+        self.assertEqual(self.stock(), 10)
+
+    def test_reservar_de_nuevo_reemplaza_la_cantidad(self):
+        carrito = Carrito()
+        carrito.reservar(self.producto_id, 4)
+        self.assertTrue(carrito.reservar(self.producto_id, 9))
+        self.assertEqual(reservas.disponibles([self.producto_id]), {self.producto_id: 1})
+        carrito.liberar(self.producto_id)
+        self.assertEqual(reservas.disponibles([self.producto_id]), {self.producto_id: 10})
+
+    def test_confirmar_el_pedido_convierte_la_reserva_en_descuento(self):
+        carrito, otro = Carrito(), Carrito()
+        carrito.reservar(self.producto_id, 6)
+        otro.reservar(self.producto_id, 4)
+        self.assertIsNotNone(self.crear_pedido(6, carrito=carrito.clave))
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(self.consultar('SELECT carrito, cantidad FROM reservas'), [(otro.clave, 4)])
+        self.assertEqual(otro.disponible(self.producto_id), 4)
+
+    def test_las_reservas_vencidas_no_cuentan_y_se_purgan(self):
+        vencido = Carrito()
+        self.assertTrue(vencido.reservar(self.producto_id, 10))
+        conn = get_db_connection()
+        with conn:
+            conn.execute('UPDATE reservas SET vence = vence - ?', (vencido.duracion + 1,))
+        conn.close()
+        self.assertEqual(reservas.disponibles([self.producto_id]), {self.producto_id: 10})
+        self.assertIsNotNone(self.crear_pedido(10))
+
+        conn = get_db_connection()
+        with conn:
+            self.assertEqual(reservas.purgar_vencidas(conn), 1)
+        conn.close()
+        self.assertEqual(self.consultar('SELECT COUNT(*) FROM reservas'), [(0,)])
+
+    def test_cancelar_libera_todo_el_carrito(self):
+        carrito = Carrito()
+        otro_producto = self.crear_producto("Mouse", stock=5)
+        carrito.reservar(self.producto_id, 10)
+        carrito.reservar(otro_producto, 5)
+        self.assertTrue(carrito.cancelar())
+        self.assertEqual(reservas.disponibles([self.producto_id, otro_producto]), {self.producto_id: 10, otro_producto: 5})
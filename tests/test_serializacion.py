@@ -0,0 +1,39 @@
+import io
+import json
+
+from controllers import ClienteController, PedidoController, ProductoController
+from models import DetallePedido, Pedido
+from serializacion import a_json, exportar_pedidos, exportar_tabla
+from tests.base import PruebaConBase
+
+
+class PruebaSerializacion(PruebaConBase):
+
+    def setUp(self):
+        super().setUp()
+        cliente_id = self.crear_cliente()
+        teclado = self.crear_producto("Teclado", 10.0)
+        mouse = self.crear_producto("Mouse", 5.5)
+        self.pedidos = PedidoController()
+        for lineas in ([(teclado, 2, 10.0), (mouse, 1, 5.5)], [(mouse, 3, 5.5)]):
+            detalles = [DetallePedido(producto_id=producto_id, cantidad=cantidad, precio_unitario=precio)
+                        for producto_id, cantidad, precio in lineas]
+            total = sum(detalle.subtotal() for detalle in detalles)
+            self.pedidos.crear(Pedido(cliente_id=cliente_id, fecha="2024-05-01", estado="Pendiente", total=total), detalles)
+
+    def exportado(self, **opciones):
+        salida = io.StringIO()
+        exportar_pedidos(salida, **opciones)
+        return json.loads(salida.getvalue())
+
+    def test_a_json_y_la_exportacion_producen_el_mismo_json(self):
+        cargados = [self.pedidos.obtener_por_id(id) for id, in self.consultar('SELECT id FROM pedidos ORDER BY id')]
+        self.assertEqual(json.loads(a_json(cargados, con_detalles=True)), self.exportado(con_detalles=True))
+        self.assertEqual(json.loads(a_json(cargados)), self.exportado())
+        self.assertEqual(len(json.loads(a_json(cargados[0], con_detalles=True))["detalles"]), 2)
+
+        for tabla, controller in (("clientes", ClienteController()), ("productos", ProductoController())):
+            salida = io.StringIO()
+            exportar_tabla(salida, tabla)
+            cargados = sorted(controller.listar_todos(), key=lambda objeto: objeto.id)
+            self.assertEqual(json.loads(a_json(cargados)), json.loads(salida.getvalue()))
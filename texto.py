@@ -0,0 +1,13 @@
+import unicodedata
+
+
+def normalizar(texto):
+    """Normaliza un texto para comparaciones: sin acentos y en minúsculas.
+    
+    Retorna una cadena vacía si el texto es None.
+    """
+    if texto is None:
+        return ""
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return sin_acentos.casefold()
@@ -0,0 +1,346 @@
+"""Verificación de los planes de consulta de los controladores.
+
+Genera una base de datos de tamaño realista en un directorio temporal,
+ejecuta cada método de los controladores registrando las sentencias SQL
+que emiten (database.registrar_traza) y obtiene el EXPLAIN QUERY PLAN de
+cada una. Los planes se comparan con planes_referencia.json:
+
+- falla si una consulta recorre una tabla o un índice completo (SCAN) o
+  necesita un ordenamiento temporal (USE TEMP B-TREE) que no tenía en la
+  referencia;
+- falla si una consulta de uso frecuente (búsquedas por clave, listados
+  por cliente, detalles de pedidos, actualizaciones de stock) recorre una
+  tabla completa u ordena con un B-tree temporal, esté o no en la referencia.
+
+Termina con código 1 si encuentra algún problema, así que puede usarse en
+integración continua.
+
+Uso:
+    python verificar_planes.py               # compara con la referencia
+    python verificar_planes.py --actualizar  # acepta los planes actuales como referencia
+    python verificar_planes.py --mostrar     # imprime el plan de cada consulta
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import re
+import sys
+import tempfile
+
+import carga
+import database
+import reportes
+import reservas
+from controllers import ClienteController, PedidoController, ProductoController
+from models import Cliente, DetallePedido, Pedido, Producto
+
+REFERENCIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'planes_referencia.json')
+
+# Métodos cuyo costo no puede crecer con el tamaño de las tablas
+FRECUENTES = {
+    "ClienteController.obtener_por_id",
+    "ClienteController.obtener_por_email",
+    "ClienteController.obtener_resumen",
+    "ClienteController.listar_pagina",
+    "ClienteController.actualizar",
+    "ClienteController.eliminar",
+    "ProductoController.obtener_por_id",
+    "ProductoController.listar_pagina",
+    "ProductoController.listar_a_reponer",
+    "ProductoController.actualizar",
+    "ProductoController.actualizar_stock",
+    "ProductoController.eliminar",
+    "PedidoController.crear",
+    "PedidoController.obtener_por_id",
+    "PedidoController.detalles",
+    "PedidoController.listar_por_cliente",
+    "PedidoController.listar_pagina",
+    "PedidoController.listar_intervalo",
+    "PedidoController.contar_intervalo",
+    "PedidoController.actualizar_estado",
+    "PedidoController.eliminar",
+    "Carrito.reservar",
+    "Carrito.liberar",
+    "reservas.disponibles",
+}
+
+# Sentencias sin plan de consulta
+SIN_PLAN = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA', 'CREATE', 'ANALYZE', '--')
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMERO = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_LISTA = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalizar_sql(sql):
+    """Reemplaza los valores literales por ? para identificar la sentencia."""
+    sql = _LITERAL_TEXTO.sub('?', sql)
+    sql = _LITERAL_NUMERO.sub('?', sql)
+    sql = _LISTA.sub('?', sql)
+    return ' '.join(sql.split())
+
+
+class Registro:
+    """Sentencias emitidas por cada método de los controladores."""
+
+    def __init__(self):
+        self.etiqueta = None
+        self.sentencias = {}  # sql normalizado -> (etiqueta, sql con valores)
+
+    def __call__(self, sql):
+        if self.etiqueta is None or sql.lstrip().upper().startswith(SIN_PLAN):
+            return
+        self.sentencias.setdefault(normalizar_sql(sql), (self.etiqueta, sql))
+
+    @contextlib.contextmanager
+    def metodo(self, etiqueta):
+        self.etiqueta = etiqueta
+        try:
+            yield
+        finally:
+            self.etiqueta = None
+
+
+def ejercitar(registro):
+    """Ejecuta cada método de los controladores sobre la base generada."""
+    clientes = ClienteController()
+    productos = ProductoController()
+    pedidos = PedidoController()
+
+    with registro.metodo("ClienteController.crear"):
+        clientes.crear(Cliente(nombre="Verónica Planes", email="planes@ejemplo.com", telefono="11-5555-0000"))
+    with registro.metodo("ClienteController.obtener_por_email"):
+        cliente = clientes.obtener_por_email("planes@ejemplo.com")
+        clientes.obtener_por_email("PLANES@ejemplo.com")  # Sin coincidencia exacta: por email normalizado
+    with registro.metodo("ClienteController.obtener_por_id"):
+        clientes.obtener_por_id(cliente.id)
+    with registro.metodo("ClienteController.obtener_resumen"):
+        clientes.obtener_resumen(1)
+    with registro.metodo("ClienteController.listar_todos"):
+        clientes.listar_todos()
+    with registro.metodo("ClienteController.listar_pagina"):
+        pagina = clientes.listar_pagina(20)
+        clientes.listar_pagina(20, despues=pagina[-1])
+        clientes.listar_pagina(20, filtro="mar")
+    with registro.metodo("ClienteController.contar"):
+        clientes.contar()
+        clientes.contar("mar")
+    with registro.metodo("ClienteController.buscar"):
+        clientes.buscar("mar")
+        clientes.buscar("11-5555")
+    with registro.metodo("ClienteController.buscar_contenido"):
+        clientes.buscar("zzz-no-existe")
+    with registro.metodo("ClienteController.buscar_similares"):
+        clientes.buscar_similares("Veronica")
+    with registro.metodo("ClienteController.actualizar"):
+        cliente.direccion = "Calle Nueva 1"
+        clientes.actualizar(cliente)
+    with registro.metodo("ClienteController.eliminar"):
+        clientes.eliminar(cliente.id)
+
+    with registro.metodo("ProductoController.crear"):
+        productos.crear(Producto(nombre="Producto de planes", descripcion="Verificación", precio=10.0, stock=5))
+    with registro.metodo("ProductoController.buscar"):
+        producto = productos.buscar("producto de planes")[0]
+    with registro.metodo("ProductoController.buscar_contenido"):
+        productos.buscar("verificacion")
+    with registro.metodo("ProductoController.obtener_por_id"):
+        productos.obtener_por_id(producto.id)
+    with registro.metodo("ProductoController.listar_todos"):
+        productos.listar_todos()
+    with registro.metodo("ProductoController.listar_pagina"):
+        pagina = productos.listar_pagina(20)
+        productos.listar_pagina(20, despues=pagina[-1], filtro="teclado")
+    with registro.metodo("ProductoController.contar"):
+        productos.contar("teclado")
+    with registro.metodo("ProductoController.listar_a_reponer"):
+        productos.listar_a_reponer()
+    with registro.metodo("ProductoController.actualizar"):
+        producto.precio = 12.0
+        productos.actualizar(producto)
+    with registro.metodo("ProductoController.actualizar_stock"):
+        productos.actualizar_stock(producto.id, 3)
+
+    carrito = reservas.Carrito()
+    with registro.metodo("reservas.disponibles"):
+        reservas.disponibles([producto.id, 1, 2], carrito.clave)
+    with registro.metodo("Carrito.reservar"):
+        carrito.reservar(1, 1)
+        carrito.reservar(producto.id, 2)
+    with registro.metodo("Carrito.liberar"):
+        carrito.liberar(1)
+    with registro.metodo("PedidoController.crear"):
+        pedido_id = pedidos.crear(
+            Pedido(cliente_id=1, fecha="2024-06-01", estado="Pendiente", total=24.0),
+            [DetallePedido(producto_id=producto.id, cantidad=2, precio_unitario=12.0)],
+            clave_idempotencia="verificar-planes", carrito=carrito.clave
+        )
+    with registro.metodo("PedidoController.obtener_por_id"):
+        pedido = pedidos.obtener_por_id(pedido_id)
+    with registro.metodo("PedidoController.detalles"):
+        [detalle.producto for detalle in pedido.detalles]
+        pedido.cliente
+    with registro.metodo("PedidoController.listar_todos"):
+        pedidos.listar_todos()
+    with registro.metodo("PedidoController.listar_por_cliente"):
+        pedidos.listar_por_cliente(1)
+        pedidos.listar_por_cliente(1, limite=20)
+    with registro.metodo("PedidoController.listar_pagina"):
+        pagina = pedidos.listar_pagina(20)
+        [pedido.cliente for pedido in pagina]
+        pedidos.listar_pagina(20, despues=pagina[-1], filtro="pend")
+    with registro.metodo("PedidoController.listar_resumen"):
+        pedidos.listar_resumen(limite=20)
+        pedidos.listar_resumen(cliente_id=1)
+        pedidos.listar_resumen(desde="2024-01-01", hasta="2024-02-01")
+        pedidos.listar_resumen(desde="2024-01-01", estados=["Pendiente"])
+    with registro.metodo("PedidoController.listar_intervalo"):
+        pagina = pedidos.listar_intervalo(datetime.date(2024, 3, 1), datetime.date(2024, 4, 1), limite=20)
+        pedidos.listar_intervalo(datetime.date(2024, 3, 1), datetime.date(2024, 4, 1), limite=20, despues=pagina[-1])
+        pedidos.listar_intervalo(desde=datetime.datetime(2024, 6, 1, 9, 30), limite=20)
+    with registro.metodo("PedidoController.contar_intervalo"):
+        pedidos.contar_intervalo(datetime.date(2024, 3, 1), datetime.date(2024, 4, 1))
+    with registro.metodo("reportes.generar_reporte"):
+        reportes.generar_reporte(procesos=1)
+        reportes.generar_reporte(desde="2024-01-01", hasta="2024-07-01", estados=["Entregado"], procesos=1)
+    with registro.metodo("PedidoController.contar"):
+        pedidos.contar("pend")
+    with registro.metodo("PedidoController.actualizar"):
+        pedidos.actualizar(pedido)
+    with registro.metodo("PedidoController.actualizar_estado"):
+        pedidos.actualizar_estado(pedido_id, "Enviado")
+    with registro.metodo("PedidoController.eliminar"):
+        pedidos.eliminar(pedido_id)
+    with registro.metodo("PedidoController.eliminar_masivo"):
+        pedidos.eliminar_masivo(ids=[pedido_id, pedido_id + 1])
+        pedidos.eliminar_masivo(hasta="2020-01-01", estados=["Cancelado"])
+
+    with registro.metodo("ProductoController.eliminar"):
+        productos.eliminar(producto.id)
+
+
+def obtener_planes(registro):
+    """EXPLAIN QUERY PLAN de cada sentencia registrada: {sql: {"metodo", "plan"}}."""
+    conn = database.get_db_connection()
+    planes = {}
+    for clave, (etiqueta, sql) in sorted(registro.sentencias.items()):
+        detalles = [row['detail'] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+        planes[clave] = {"metodo": etiqueta, "plan": detalles}
+    conn.close()
+    return planes
+
+
+def _costosos(plan, solo_tablas=False):
+    """Pasos del plan que recorren una tabla o un índice entero, u ordenan con un B-tree temporal.
+
+    Con `solo_tablas` no cuenta los recorridos de índices (por ejemplo, la
+    primera página de un listado, que se corta con LIMIT). Recorrer el
+    resultado de una subconsulta materializada no cuenta: su costo es el
+    de la subconsulta, que tiene sus propios pasos en el plan.
+    """
+    subconsultas = {
+        paso.split()[1] for paso in plan if paso.startswith(('MATERIALIZE ', 'CO-ROUTINE '))
+    }
+    return {
+        paso for paso in plan
+        if (paso.startswith('SCAN ') and 'CONSTANT ROW' not in paso and paso.split()[1] not in subconsultas
+            and not (solo_tablas and ' USING ' in paso))
+        or 'USE TEMP B-TREE' in paso
+    }
+
+
+def comparar(planes, referencia):
+    """Retorna (problemas, avisos) de comparar los planes actuales con la referencia."""
+    problemas, avisos = [], []
+    for clave, actual in planes.items():
+        costosos = _costosos(actual["plan"])
+        anterior = referencia.get(clave)
+        regresiones = set()
+        if anterior is None:
+            avisos.append(f"[{actual['metodo']}] consulta nueva: {clave}")
+        else:
+            regresiones = costosos - _costosos(anterior["plan"])
+        for paso in sorted(regresiones):
+            problemas.append(f"[{actual['metodo']}] {paso} (antes no lo hacía)\n    {clave}")
+        if actual["metodo"] in FRECUENTES:
+            for paso in sorted(_costosos(actual["plan"], solo_tablas=True) - regresiones):
+                problemas.append(f"[{actual['metodo']}] consulta frecuente con {paso}\n    {clave}")
+    for clave, anterior in referencia.items():
+        if clave not in planes:
+            avisos.append(f"[{anterior['metodo']}] ya no se ejecuta: {clave}")
+    return problemas, avisos
+
+
+def generar_planes(clientes=20000, productos=2000, pedidos=20000):
+    """Genera una base de prueba en un directorio temporal y retorna los planes de cada consulta.
+
+    La base generada se elige explícitamente (TECHLAB_DB no se toca) y el
+    almacenamiento anterior se restaura al terminar.
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        anterior = database.usar_backend(database.BackendSQLite(os.path.join(directorio, 'techlab.db')))
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                carga.generar(clientes, productos, pedidos)
+            conn = database.get_db_connection()
+            conn.execute('ANALYZE')  # Estadísticas como las que deja el mantenimiento
+            conn.close()
+
+            registro = Registro()
+            database.registrar_traza(registro)
+            try:
+                ejercitar(registro)
+            finally:
+                database.registrar_traza(None)
+            return obtener_planes(registro)
+        finally:
+            database.usar_backend(anterior)
+
+
+def cargar_referencia():
+    """Planes de planes_referencia.json ({} si todavía no hay referencia)."""
+    if not os.path.exists(REFERENCIA):
+        return {}
+    with open(REFERENCIA, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica los planes de consulta de los controladores.")
+    parser.add_argument("--actualizar", action="store_true", help="guardar los planes actuales como referencia")
+    parser.add_argument("--mostrar", action="store_true", help="imprimir el plan de cada consulta")
+    parser.add_argument("--clientes", type=int, default=20000)
+    parser.add_argument("--productos", type=int, default=2000)
+    parser.add_argument("--pedidos", type=int, default=20000)
+    args = parser.parse_args()
+
+    planes = generar_planes(args.clientes, args.productos, args.pedidos)
+
+    if args.mostrar:
+        for clave, actual in planes.items():
+            print(f"[{actual['metodo']}] {clave}")
+            for paso in actual["plan"]:
+                print(f"    {paso}")
+
+    if args.actualizar:
+        with open(REFERENCIA, 'w', encoding='utf-8') as archivo:
+            json.dump(planes, archivo, indent=2, ensure_ascii=False, sort_keys=True)
+            archivo.write('\n')
+        print(f"Referencia actualizada con {len(planes)} consultas.")
+        return
+
+    problemas, avisos = comparar(planes, cargar_referencia())
+    for aviso in avisos:
+        print(f"Aviso: {aviso}")
+    if problemas:
+        print(f"\n{len(problemas)} problemas en los planes de consulta:")
+        for problema in problemas:
+            print(f"  - {problema}")
+        sys.exit(1)
+    print(f"{len(planes)} consultas verificadas sin recorridos completos ni ordenamientos nuevos.")
+
+
+if __name__ == "__main__":
+    main()